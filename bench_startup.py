@@ -0,0 +1,110 @@
+"""
+Startup benchmark for the backend (zen_ai/backend/app.py). Each run uses a
+fresh interpreter, so nothing is already imported.
+
+- Import cost. `python -X importtime` for `import zen_ai.backend.app`:
+  total time and the heaviest top-level packages, by the self time of
+  their modules. It also checks that the SDKs loaded on first use
+  (boto3, google.generativeai) were not imported.
+- Time to serve and to ready. It runs the FastAPI lifespan and polls
+  GET /ready until it returns 200. This uses LLM_PROVIDER=fake, temporary
+  state directories and no segment audio prewarm, so no network is
+  touched.
+
+Medians over the runs are printed. Track them across changes that add
+imports or startup work.
+
+    python bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+APP_MODULE = "zen_ai.backend.app"
+LAZY_MODULES = ["boto3", "botocore", "google.generativeai"]
+
+STARTUP_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {APP_MODULE} as module
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(module.app) as client:
+    serving = time.perf_counter()
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.005)
+    ready = time.perf_counter()
+    steps = client.get("/ready").json()["steps"]
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "serving_ms": (serving - start) * 1000,
+    "ready_ms": (ready - start) * 1000,
+    "steps": {{name: step["ms"] for name, step in steps.items()}},
+    "lazy_loaded": [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+def import_times() -> dict:
+    """Import time (ms) per top-level package: the self time of its modules, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {APP_MODULE}"],
+                            capture_output=True, text=True, check=True, env=probe_env())
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # Header line
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+    return packages
+
+def probe_env() -> dict:
+    state = tempfile.mkdtemp(prefix="zen-startup-")
+    return {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "TEMPLATE_PREWARM_VOICES": "",
+        "VOICE_OUTPUT_DIR": os.path.join(state, "voice"),
+        "MIX_OUTPUT_DIR": os.path.join(state, "mix"),
+        "JOB_DB_PATH": os.path.join(state, "jobs.sqlite3"),
+        "MEMORY_DB_PATH": os.path.join(state, "memory.sqlite3"),
+        "FEEDBACK_DB_PATH": os.path.join(state, "feedback.sqlite3"),
+        "PREFERENCE_SNAPSHOT_PATH": os.path.join(state, "preferences.json"),
+    }
+
+def startup_times() -> dict:
+    result = subprocess.run([sys.executable, "-c", STARTUP_PROBE], capture_output=True, text=True, check=True, env=probe_env())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    packages = defaultdict(list)
+    for _ in range(runs):
+        for name, ms in import_times().items():
+            packages[name].append(ms)
+    medians = {name: statistics.median(times) for name, times in packages.items()}
+    print(f"import {APP_MODULE}: {sum(medians.values()):.0f} ms (median of {runs}, by -X importtime)")
+    for name, ms in sorted(medians.items(), key=lambda item: -item[1])[:10]:
+        print(f"{name:>24} {ms:8.1f} ms")
+
+    samples = [startup_times() for _ in range(runs)]
+    print(f"\n{'ms from process start':>24} {'median':>8} {'max':>8}")
+    for key, label in (("import_ms", "app imported"), ("serving_ms", "lifespan started"), ("ready_ms", "/ready is 200")):
+        values = [sample[key] for sample in samples]
+        print(f"{label:>24} {statistics.median(values):8.0f} {max(values):8.0f}")
+    for step in samples[0]["steps"]:
+        values = [sample["steps"][step] for sample in samples if sample["steps"][step] is not None]
+        if values:
+            print(f"{'warm-up ' + step:>24} {statistics.median(values):8.0f} {max(values):8.0f}")
+
+    lazy_loaded = sorted({name for sample in samples for name in sample["lazy_loaded"]})
+    if lazy_loaded:
+        print(f"\nImported at startup but meant to load on first use: {', '.join(lazy_loaded)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
 import requests
 import json
 
+from zen_ai.backend.agents.analyzer_agent import perform_analysis_logic
+
+# Inflected forms must match their base keywords ("worry", "happy"); runs without the server
+print("--- Checking inflected keywords ---")
+for answer, mood in [("I keep worrying about work", "anxious"), ("I worried all week", "anxious"),
+                     ("Full of happiness today", "happy"), ("I'm happy", "happy")]:
+    tags = perform_analysis_logic([answer])["mood_tags"]
+    assert mood in tags, f"{answer!r} tagged {tags}, expected {mood}"
+print("Inflected keywords OK")
+
 # The URL of the running backend server
 url = "http://127.0.0.1:8000/analyze"
 
@@ -1,5 +1,6 @@
 import requests
 import json
+import time
 
 BASE_URL = "http://127.0.0.1:8000"
 
@@ -47,6 +48,67 @@ def test_meditate_endpoint():
         print(f"An unexpected error occurred in test_meditate_endpoint:")
         traceback.print_exc()
 
+def parse_sse(body):
+    """Split a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        events.append((fields.get("event"), json.loads(fields.get("data", "null"))))
+    return events
+
+def test_meditate_stream_endpoint():
+    print("\nTesting /meditate/stream endpoint...")
+    try:
+        payload = {
+            "quiz_answers": ["Yes", "A little"],
+            "user_input": "I feel stressed and anxious about my upcoming exams.",
+            "voice_pref": "Rachel",
+            "music_pref": "Calm"
+        }
+        response = requests.post(f"{BASE_URL}/meditate/stream", json=payload, timeout=60)
+        print(f"Received response with status code: {response.status_code}")
+        events = parse_sse(response.text)
+        names = [name for name, _ in events]
+        assert names[0] == "analysis", f"first event is {names[0]}, expected analysis"
+        if names[-1] == "error":
+            print("Stream ended with an error:", events[-1][1])
+            return
+        # analysis, then one or more tokens, then done with the joined text
+        assert names[-1] == "done", f"last event is {names[-1]}, expected done"
+        assert names[1:-1] and set(names[1:-1]) == {"token"}, f"unexpected events: {names}"
+        text = "".join(data["text"] for name, data in events if name == "token").strip()
+        assert events[-1][1]["meditation_text"] == text, "done text does not match the streamed tokens"
+        print(f"POST /meditate/stream successful: {len(names) - 2} tokens, {len(text)} characters")
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred during request: {e}")
+
+def test_meditate_job_endpoint():
+    print("\nTesting /meditate/jobs endpoint...")
+    try:
+        payload = {
+            "quiz_answers": ["Yes", "A little"],
+            "user_input": "I feel stressed and anxious about my upcoming exams.",
+            "voice_pref": "Rachel",
+            "music_pref": "Calm"
+        }
+        response = requests.post(f"{BASE_URL}/meditate/jobs", json=payload, timeout=10)
+        print(f"Received response with status code: {response.status_code}")
+        if response.status_code != 202:
+            print("Response:", response.text)
+            return
+        job = response.json()
+        print("Job queued:", job["job_id"])
+        # Poll with short requests instead of holding one connection for the whole pipeline
+        for _ in range(120):
+            status = requests.get(f"{BASE_URL}{job['status_url']}", timeout=10).json()
+            print(f"Status: {status['status']}, stages: {list(status['stages'])}")
+            if status["status"] in ("succeeded", "failed"):
+                print("Result:", status["result"] or status["error"])
+                break
+            time.sleep(1)
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred during request: {e}")
+
 def test_visualization_endpoint():
     print("\nTesting /generate-visualization endpoint...")
     try:
@@ -100,5 +162,7 @@ if __name__ == "__main__":
     test_root_endpoint()
     # test_quiz_endpoint() # Commenting out to focus on the new endpoint
     # test_meditate_endpoint()
+    # test_meditate_stream_endpoint()
+    # test_meditate_job_endpoint()
     test_visualization_endpoint() # Testing our new endpoint
     # test_feedback_endpoint()
@@ -0,0 +1,78 @@
+"""
+AudioStore atomic commits and LRU eviction, in a temporary directory.
+
+Run from the repository root: python -m pytest -q tests
+"""
+import asyncio
+
+from zen_ai.backend.utils.audio_store import INDEX_FILENAME, AudioStore
+
+def key(n: int) -> str:
+    return f"{n:064x}"
+
+def make_store(tmp_path, max_bytes: int = 250) -> AudioStore:
+    store = AudioStore(str(tmp_path / "voice"), max_bytes)
+    store.load()
+    return store
+
+def put(store: AudioStore, n: int, size: int = 100) -> None:
+    tmp = store.temp_path(key(n))
+    tmp.write_bytes(bytes(size))
+    asyncio.run(store.commit(key(n), tmp))
+
+def test_commit_moves_the_part_file_into_place(tmp_path):
+    store = make_store(tmp_path)
+    tmp = store.temp_path(key(1))
+    tmp.write_bytes(b"audio")
+    assert key(1) not in store
+
+    path = asyncio.run(store.commit(key(1), tmp))
+    assert path == store.path_for(key(1))
+    assert path.read_bytes() == b"audio"
+    assert not tmp.exists()
+    assert store.get(key(1)) == path
+    assert not list(store.directory.glob("*.part"))
+    # The index is saved with the commit, so a new process sees the clip
+    assert (store.directory / INDEX_FILENAME).exists()
+    assert key(1) in make_store(tmp_path)
+
+def test_least_recently_used_clip_is_evicted(tmp_path):
+    store = make_store(tmp_path, max_bytes=250)
+    put(store, 1)
+    put(store, 2)
+    # Reading clip 1 makes clip 2 the least recently used
+    assert store.get(key(1)) is not None
+    put(store, 3)
+
+    assert key(2) not in store
+    assert not store.path_for(key(2)).exists()
+    assert key(1) in store and key(3) in store
+    assert store.stats()["bytes"] == 200
+    assert store.stats()["evictions"] == 1
+
+def test_a_clip_larger_than_the_store_is_kept(tmp_path):
+    store = make_store(tmp_path, max_bytes=250)
+    put(store, 1)
+    put(store, 2, size=400)
+    # Everything older goes, but the clip just committed stays for its caller
+    assert key(1) not in store
+    assert store.get(key(2)) == store.path_for(key(2))
+
+def test_recommitting_a_key_counts_its_size_once(tmp_path):
+    store = make_store(tmp_path)
+    put(store, 1, size=100)
+    put(store, 1, size=150)
+    assert store.stats()["clips"] == 1
+    assert store.stats()["bytes"] == 150
+
+def test_index_is_rebuilt_from_the_directory(tmp_path):
+    store = make_store(tmp_path)
+    put(store, 1)
+    put(store, 2)
+    (store.directory / INDEX_FILENAME).write_text("not json")
+    (store.directory / "notes.mp3").write_bytes(b"not a clip")
+
+    reloaded = make_store(tmp_path)
+    assert reloaded.stats()["clips"] == 2
+    assert reloaded.stats()["bytes"] == 200
+    assert (store.directory / "notes.mp3").exists()
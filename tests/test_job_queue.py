@@ -0,0 +1,122 @@
+"""
+JobQueue leases, in process against a temporary SQLite file.
+
+Run from the repository root: python -m pytest -q tests
+"""
+import asyncio
+import time
+
+from zen_ai.backend.utils.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+async def succeed(payload, on_stage):
+    await on_stage("work", "completed", {})
+    return {"echo": payload["n"]}
+
+def make_queue(tmp_path, handler=succeed, **kwargs) -> JobQueue:
+    kwargs.setdefault("workers", 0)
+    kwargs.setdefault("poll_interval", 0.05)
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), handler, **kwargs)
+
+async def wait_for_status(queue: JobQueue, job_id: str, statuses, timeout: float = 5.0) -> dict:
+    end = time.monotonic() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if job["status"] in statuses or time.monotonic() > end:
+            return job
+        await asyncio.sleep(0.02)
+
+def test_expired_lease_is_requeued_and_run_by_another_worker(tmp_path):
+    async def main():
+        # A worker that claims the job and then goes away without finishing it
+        dead = make_queue(tmp_path, lease_seconds=0.1)
+        await dead.start()
+        job_id = await dead.submit({"n": 1})
+        claim = await dead._claim()
+        assert claim["id"] == job_id
+        assert (await dead.get(job_id))["status"] == RUNNING
+
+        await asyncio.sleep(0.15)
+        assert await dead.recover_expired() == 1
+        assert (await dead.get(job_id))["status"] == QUEUED
+        await dead.close()
+
+        live = make_queue(tmp_path, workers=1)
+        await live.start()
+        job = await wait_for_status(live, job_id, (SUCCEEDED, FAILED))
+        await live.close()
+        assert job["status"] == SUCCEEDED
+        assert job["result"] == {"echo": 1}
+        assert job["attempts"] == 2
+
+    asyncio.run(main())
+
+def test_job_fails_after_max_attempts(tmp_path):
+    async def main():
+        queue = make_queue(tmp_path, lease_seconds=0.05, max_attempts=2)
+        await queue.start()
+        job_id = await queue.submit({"n": 1})
+        for _ in range(2):
+            assert (await queue._claim())["id"] == job_id
+            await asyncio.sleep(0.08)
+            await queue.recover_expired()
+        job = await queue.get(job_id)
+        await queue.close()
+        assert job["status"] == FAILED
+        assert job["attempts"] == 2
+
+    asyncio.run(main())
+
+def test_heartbeat_keeps_a_long_job_leased(tmp_path):
+    async def slow(payload, on_stage):
+        await asyncio.sleep(0.6)
+        return {"done": True}
+
+    async def main():
+        # The job runs for several lease periods; heartbeats must keep it ours
+        worker = make_queue(tmp_path, slow, workers=1, lease_seconds=0.15)
+        other = make_queue(tmp_path, lease_seconds=0.15)
+        await worker.start()
+        await other.start()
+        job_id = await worker.submit({})
+        await wait_for_status(worker, job_id, (RUNNING,))
+        for _ in range(5):
+            await asyncio.sleep(0.1)
+            assert await other.recover_expired() == 0
+            assert await other._claim() is None
+        job = await wait_for_status(worker, job_id, (SUCCEEDED, FAILED))
+        await worker.close()
+        await other.close()
+        assert job["status"] == SUCCEEDED
+        assert job["attempts"] == 1
+
+    asyncio.run(main())
+
+def test_lost_lease_stops_the_job_and_discards_its_result(tmp_path):
+    cancelled = []
+
+    async def main():
+        running = asyncio.Event()
+
+        async def slow(payload, on_stage):
+            running.set()
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return {"done": True}
+
+        queue = make_queue(tmp_path, slow, workers=1, lease_seconds=0.15)
+        await queue.start()
+        job_id = await queue.submit({})
+        await asyncio.wait_for(running.wait(), 5)
+        # Another worker took the job over (e.g. our heartbeats were held up)
+        await queue._db("UPDATE jobs SET lease_owner = ?, lease_expires = ? WHERE id = ?", ("someone-else", time.time() + 60, job_id))
+        await asyncio.sleep(0.2)
+        job = await queue.get(job_id)
+        await queue.close()
+        assert cancelled == [True]
+        assert job["status"] == RUNNING
+        assert job["result"] is None
+
+    asyncio.run(main())
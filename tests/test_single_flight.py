@@ -0,0 +1,116 @@
+"""
+SingleFlight coalescing and error propagation.
+
+Run from the repository root: python -m pytest -q tests
+"""
+import asyncio
+
+import pytest
+
+from zen_ai.backend.utils.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    async def main():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.ensure_future(group.do("key", fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        return group, calls, results
+
+    group, calls, results = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert group.stats() == {"upstream_calls": 1, "coalesced": 4, "in_flight": 0}
+
+def test_different_keys_do_not_coalesce():
+    async def main():
+        group = SingleFlight("test")
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        return group, await asyncio.gather(group.do("a", lambda: fetch("a")), group.do("b", lambda: fetch("b")))
+
+    group, results = asyncio.run(main())
+    assert results == ["a", "b"]
+    assert group.stats()["upstream_calls"] == 2
+
+def test_every_waiter_gets_the_error_and_the_next_call_retries():
+    async def main():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await release.wait()
+            raise ValueError("upstream down")
+
+        waiters = [asyncio.ensure_future(group.do("key", fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        outcomes = await asyncio.gather(*waiters, return_exceptions=True)
+
+        async def succeed():
+            return "recovered"
+
+        # The failed call is not remembered: the next caller starts a new one
+        return calls, outcomes, await group.do("key", succeed)
+
+    calls, outcomes, retry = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(outcome, ValueError) and str(outcome) == "upstream down" for outcome in outcomes)
+    assert retry == "recovered"
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def main():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(group.do("key", fetch))
+        second = asyncio.ensure_future(group.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+def test_join_waits_for_the_call_in_flight_without_starting_one():
+    async def main():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fail():
+            await release.wait()
+            raise ValueError("upstream down")
+
+        assert await group.join("key") is False
+        call = asyncio.ensure_future(group.do("key", fail))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(group.join("key"))
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(ValueError):
+            await joiner
+        with pytest.raises(ValueError):
+            await call
+        return group.stats()
+
+    assert asyncio.run(main())["upstream_calls"] == 1
@@ -1,18 +1,94 @@
-import asyncio
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+from zen_ai.backend.utils.lexicon_model import LexiconModel
 
 logging.basicConfig(level=logging.INFO)
 
-async def run_analysis(quiz_answers: List[str], user_input: str) -> Dict[str, Any]:
+# Keyword lists used to tag quiz answers. Matching is on stemmed words
+# ("stressed" matches "stress", "worrying" matches "worried"); two-word
+# entries match word pairs.
+MOOD_KEYWORDS = {
+    "anxious": ["anxious", "anxiety", "worried", "nervous", "panic"],
+    "stressed": ["stress", "stressed", "overwhelmed", "pressure", "deadline"],
+    "tired": ["tired", "exhausted", "sleepy", "drained", "fatigue"],
+    "sad": ["sad", "down", "lonely", "upset", "grief"],
+    "happy": ["happy", "good", "great", "joy", "grateful"],
+    "angry": ["angry", "frustrated", "irritated", "annoyed"],
+}
+
+NEED_KEYWORDS = {
+    "calm": ["calm", "peace", "relax", "relaxation", "quiet"],
+    "focus": ["focus", "clarity", "concentrate", "unfocused", "productive"],
+    "rest": ["rest", "sleep", "recharge", "tired"],
+    "energy": ["energy", "motivation", "motivated", "energized"],
+}
+
+SESSION_KEYWORDS = {
+    "visualization": ["visualization", "visualize", "imagine"],
+    "breathing": ["breathing", "breath", "breathe"],
+    "affirmation": ["affirmation", "affirmations"],
+}
+
+ANALYZER_LEXICONS = {
+    "mood_tags": MOOD_KEYWORDS,
+    "needs": NEED_KEYWORDS,
+    "preferred_session": SESSION_KEYWORDS,
+}
+
+_model: Optional[LexiconModel] = None
+
+def get_analyzer_model() -> LexiconModel:
+    """The compiled keyword model; built on first use (or at startup via load_analyzer)."""
+    global _model
+    if _model is None:
+        _model = LexiconModel(ANALYZER_LEXICONS)
+    return _model
+
+def load_analyzer() -> None:
+    """Compile the model up front so the first request does not pay for it."""
+    get_analyzer_model()
+
+def analyze_batch(answer_sets: Sequence[Sequence[str]], user_inputs: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Map many sets of quiz answers (plus optional free text, one per set) to
+    mood tags, needs and a preferred session type in one pass. Matching is
+    on stemmed words and word pairs, and ignores negated mentions
+    ("not tired"). The session type is the one mentioned most, ties going
+    to the earlier entry of SESSION_KEYWORDS.
     """
-    A simplified, non-blocking dummy version of the analysis flow.
-    This prevents the server from crashing on startup.
+    model = get_analyzer_model()
+    texts = [" . ".join(answers) for answers in answer_sets]
+    if user_inputs is not None:
+        texts = [f"{text} . {extra}" for text, extra in zip(texts, user_inputs)]
+    scores = model.score_batch(texts)
+    mood_span = model.group_slices["mood_tags"]
+    need_span = model.group_slices["needs"]
+    session_span = model.group_slices["preferred_session"]
+    session_scores = scores[:, session_span]
+    session_best = session_scores.argmax(axis=1)
+    session_found = session_scores.max(axis=1, initial=0) > 0
+    hits = scores > 0
+
+    results = []
+    for i, row in enumerate(hits):
+        mood_tags = [model.labels[j] for j in np.flatnonzero(row[mood_span]) + mood_span.start]
+        needs = [model.labels[j] for j in np.flatnonzero(row[need_span]) + need_span.start]
+        results.append({
+            "mood_tags": mood_tags or ["neutral"],
+            "needs": needs or ["calm"],
+            "preferred_session": model.labels[session_span.start + session_best[i]] if session_found[i] else "meditation",
+        })
+    return results
+
+def perform_analysis_logic(quiz_answers: List[str], user_input: str = "") -> Dict[str, Any]:
     """
-    logging.info("Executing DUMMY run_analysis...")
-    await asyncio.sleep(0.5) # Simulate non-blocking work
-    return {
-        "coach_response": "This is a dummy coach response from the dummy analyzer.",
-        "voice_id": "dummy_voice_id",
-        "music_style": "calm"
-    }
\ No newline at end of file
+    Map quiz answers (and optional free text) to mood tags, needs and a
+    preferred session type with the local keyword model; no network call.
+    """
+    return analyze_batch([quiz_answers], [user_input] if user_input else None)[0]
+
+async def run_analysis(quiz_answers: List[str], user_input: str) -> Dict[str, Any]:
+    """Async entry point for callers that expect one; the analysis itself is local and fast."""
+    return perform_analysis_logic(quiz_answers, user_input)
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import List
 from .analyzer_agent import perform_analysis_logic
+from zen_ai.backend.utils.rule_engine import route
 
 router = APIRouter()
 
@@ -15,18 +16,12 @@ class CoachInput(BaseModel):
 
 @router.post("/generate_plan")
 def generate_plan(data: AnalyzeInput):
+    # Steps come from the "plan_steps" routing table
     plan = {
         "session": data.preferred_session,
-        "steps": []
+        "steps": list(route("plan_steps", data.needs))
     }
 
-    if "calm" in data.needs:
-        plan["steps"].append("Begin with 5 minutes of mindful breathing.")
-    if "rest" in data.needs:
-        plan["steps"].append("Do a 10-minute body scan meditation.")
-    if "focus" in data.needs:
-        plan["steps"].append("Try 5-minute visualization of your goal.")
-
     return {
         "plan": plan,
         "message": "Your meditation plan is ready!"
@@ -38,23 +33,12 @@ def generate_visualization_plan(data: CoachInput):
     analyzed_data = perform_analysis_logic(data.quiz_answers)
     
     # Step 2: Generate a plan based on the analysis
+    # (steps come from the "visualization_plan_steps" routing table)
     plan = {
         "session": analyzed_data.get("preferred_session", "visualization"),
-        "steps": []
+        "steps": list(route("visualization_plan_steps", analyzed_data.get("needs", [])))
     }
-    
-    needs = analyzed_data.get("needs", [])
-    if "calm" in needs:
-        plan["steps"].append("Begin with 5 minutes of mindful breathing.")
-    if "rest" in needs:
-        plan["steps"].append("Do a 10-minute body scan meditation.")
-    if "focus" in needs:
-        plan["steps"].append("Try a 5-minute visualization of your goal.")
 
-    # Add a default step if no other steps are generated
-    if not plan["steps"]:
-        plan["steps"].append("Take a moment to focus on your breath and the feeling you want to cultivate.")
-        
     return {
         "plan": plan,
         "message": "Your visualization plan is ready!"
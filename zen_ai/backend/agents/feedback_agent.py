@@ -1,4 +1,76 @@
-def collect_feedback(session_id: str, user_input: str):
-    # This function would collect and store user feedback.
-    # For now, it just prints a message.
-    print(f"Collecting feedback for session {session_id}: {user_input}") 
\ No newline at end of file
+import logging
+from typing import Optional
+
+from zen_ai.backend.utils.feedback_buffer import get_feedback_buffer
+from zen_ai.backend.utils.preference_model import DIMENSIONS, get_preference_model
+
+logger = logging.getLogger(__name__)
+
+class FeedbackRejected(Exception):
+    """Feedback for another user's session, or a second rating of one session."""
+
+def feedback_record(session_id: str, user_input: str = "", rating: Optional[int] = None, user_id: Optional[str] = None, **details) -> dict:
+    return {"session_id": session_id, "user_id": user_id, "rating": rating, "comment": user_input, **details}
+
+def claim_session(session_id: str, rating: Optional[int], user_id: Optional[str]) -> Optional[str]:
+    """
+    The session's user, from the record kept when it was generated (None if
+    unknown). Raises FeedbackRejected if `user_id` names someone else, or if
+    a rating was already taken for the session; otherwise a rating claims it.
+    """
+    model = get_preference_model()
+    if model is None:
+        return None
+    owner = model.session_user(session_id)
+    if user_id and owner and user_id != owner:
+        raise FeedbackRejected(f"Session {session_id} belongs to another user.")
+    if rating is not None and not model.claim_rating(session_id):
+        raise FeedbackRejected(f"Session {session_id} has already been rated.")
+    return owner
+
+def learn_from_feedback(session_id: str, rating: Optional[int], details: dict) -> None:
+    """Update the session user's preference profile from a rating; O(1), no history is read."""
+    model = get_preference_model()
+    if model is None or rating is None:
+        return
+    choices = {dimension: details[dimension] for dimension in DIMENSIONS if details.get(dimension)}
+    model.observe(session_id, rating, choices)
+
+def _settle(session_id: str, rating: Optional[int], accepted: bool, details: dict) -> None:
+    model = get_preference_model()
+    if accepted:
+        learn_from_feedback(session_id, rating, details)
+    elif rating is not None and model is not None:
+        model.release_rating(session_id)
+
+def collect_feedback(session_id: str, user_input: str = "", rating: Optional[int] = None, user_id: Optional[str] = None, **details) -> bool:
+    """
+    Queue feedback for a session; it is written to the database in the
+    background, and a rating updates the user's preferences. Never waits.
+    Returns False if the feedback buffer is full
+    (or not running) and the feedback was not accepted; raises
+    FeedbackRejected (see claim_session).
+    """
+    buffer = get_feedback_buffer()
+    if buffer is None:
+        logger.warning(f"Feedback buffer is not running; dropping feedback for session {session_id}")
+        return False
+    owner = claim_session(session_id, rating, user_id)
+    accepted = buffer.offer(feedback_record(session_id, user_input, rating, owner, **details))
+    _settle(session_id, rating, accepted, details)
+    return accepted
+
+async def submit_feedback(session_id: str, user_input: str = "", rating: Optional[int] = None, user_id: Optional[str] = None, **details) -> bool:
+    """Like `collect_feedback`, but applies the "block" overflow policy by waiting for room."""
+    buffer = get_feedback_buffer()
+    if buffer is None:
+        logger.warning(f"Feedback buffer is not running; dropping feedback for session {session_id}")
+        return False
+    # Claimed before waiting, so a concurrent second rating is rejected
+    owner = claim_session(session_id, rating, user_id)
+    accepted = False
+    try:
+        accepted = await buffer.put(feedback_record(session_id, user_input, rating, owner, **details))
+    finally:
+        _settle(session_id, rating, accepted, details)
+    return accepted
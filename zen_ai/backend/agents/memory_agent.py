@@ -1,40 +1,42 @@
-import json
-from pathlib import Path
+import logging
+import sqlite3
+from typing import List, Optional
 
-MEMORY_LOG_FILE = "memory_log.json"
+from zen_ai.backend.settings import MEMORY_CONFIG
+from zen_ai.backend.utils.memory_store import get_memory_store
 
-def write_memory(entry: dict) -> None:
+logger = logging.getLogger(__name__)
+
+async def write_memory(entry: dict) -> None:
     """
-    Write a memory entry to memory_log.json.
-    Each entry is written as a new line for easy appending.
+    Record a memory entry. `user_id` and `session_id` in the entry index it
+    (an entry without a session id is a session of its own); `timestamp`
+    (epoch seconds or ISO 8601) defaults to now.
     """
-    try:
-        # Create the file if it doesn't exist
-        if not Path(MEMORY_LOG_FILE).exists():
-            with open(MEMORY_LOG_FILE, "w") as f:
-                f.write("")  # Initialize empty file
+    await write_memories([entry])
 
-        # Append the new entry
-        with open(MEMORY_LOG_FILE, "a") as f:
-            f.write(json.dumps(entry) + "\n")
+async def write_memories(entries: List[dict]) -> None:
+    """Record several entries in one batch."""
+    store = get_memory_store()
+    if store is None:
+        logger.warning("Memory store is not initialized; dropping memory entries")
+        return
+    try:
+        await store.append_many(entries)
     except Exception as e:
-        print(f"Warning: Failed to write to memory log: {str(e)}")
+        logger.warning(f"Failed to write memory entries: {e}")
 
-def read_memory() -> list:
+async def read_memory(user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
     """
-    Read all memory entries from memory_log.json.
-    Returns a list of dictionaries.
+    A page of the user's most recent sessions, newest first, each with its
+    entries. Returns {"sessions": [...], "next_cursor": str | None}.
+    Raises ValueError for a malformed cursor.
     """
+    store = get_memory_store()
+    if store is None:
+        return {"sessions": [], "next_cursor": None}
     try:
-        if not Path(MEMORY_LOG_FILE).exists():
-            return []
-
-        entries = []
-        with open(MEMORY_LOG_FILE, "r") as f:
-            for line in f:
-                if line.strip():  # Skip empty lines
-                    entries.append(json.loads(line))
-        return entries
-    except Exception as e:
-        print(f"Warning: Failed to read memory log: {str(e)}")
-        return [] 
\ No newline at end of file
+        return await store.recent_sessions(user_id, limit or MEMORY_CONFIG["page_size"], cursor)
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to read memory: {e}")
+        return {"sessions": [], "next_cursor": None}
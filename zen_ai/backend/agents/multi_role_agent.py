@@ -1,95 +1,247 @@
-import boto3
-import json
+import logging
+from typing import AsyncIterator, Tuple
 from zen_ai.backend.settings import (
     LLM_CONFIG,
     AWS_REGION,
     AWS_ACCESS_KEY_ID,
     AWS_SECRET_ACCESS_KEY,
 )
+from zen_ai.backend.utils.llm_client import LLMOverloadedError
+from zen_ai.backend.utils.llm_router import get_llm_router
+from zen_ai.backend.utils.prompt_budget import count_words, estimate_tokens, script_budget
+from zen_ai.backend.utils.script_cache import get_script_cache, get_recent_scripts, make_cache_key
+from zen_ai.backend.utils.single_flight import get_single_flight
+from zen_ai.backend.utils.preference_model import preferred_choice
+from zen_ai.backend.utils.rule_engine import get_rule_table
+from zen_ai.backend.utils.script_templates import get_segment_library
+from zen_ai.backend.utils.token_usage import get_token_usage
+
+logger = logging.getLogger(__name__)
 
 def get_bedrock_client():
-    """Initializes and returns a Bedrock runtime client."""
+    """
+    Initializes and returns a Bedrock runtime client.
+    Use get_llm_client() instead of calling this per request; the shared
+    client owns the only instance.
+    """
     if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION]):
         raise ValueError("AWS credentials and region must be set in environment variables.")
-    
+
+    # Imported here: boto3 takes a noticeable part of a second to import, and
+    # the client is only built once, off the event loop (LLMClient.start).
+    import boto3
+    from botocore.config import Config
+
     return boto3.client(
         service_name='bedrock-runtime',
         region_name=AWS_REGION,
         aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        # One pooled connection per concurrent call allowed by the shared client
+        config=Config(max_pool_connections=LLM_CONFIG["max_concurrency"]),
     )
 
-def run_dynamic_meditation(advice_input: dict) -> str:
+def coach_role(advice_input: dict) -> str:
     """
-    Generates a dynamic meditation script using the configured Bedrock LLM.
+    The persona for the meditation coach, from the "coach_role" routing
+    table. When no particular session was asked for (plain "meditation"),
+    the role advice_input["user_id"] rated best is used instead, if any.
     """
-    try:
-        client = get_bedrock_client()
-    except ValueError as e:
-        print(f"Error creating Bedrock client: {e}")
-        return "There was an error setting up the meditation service. Please check your AWS credentials."
+    table = get_rule_table("coach_role")
+    preferred_session = advice_input.get("preferred_session", "meditation")
+    if preferred_session == "meditation":
+        learned = preferred_choice(advice_input.get("user_id"), "role")
+        if learned and (learned in table.outcomes or learned == table.default):
+            return learned
+    needs = sorted(set(advice_input.get("needs", [])))
+    return table.evaluate(needs + [f"session:{preferred_session}"])
 
-    # Extract user inputs
-    mood_tags = advice_input.get("mood_tags", [])
+def build_meditation_prompt(advice_input: dict) -> Tuple[str, str, str]:
+    """
+    Build the (role, system_prompt, user_prompt) triple for a meditation request.
+    The script length asked for follows the session length
+    (advice_input["duration_minutes"], see script_budget).
+    """
+    # Extract user inputs (sorted so equivalent requests build the same prompt)
+    mood_tags = sorted(set(advice_input.get("mood_tags", [])))
     preferred_session = advice_input.get("preferred_session", "meditation")
-    needs = advice_input.get("needs", [])
+    needs = sorted(set(advice_input.get("needs", [])))
+    budget = script_budget(advice_input.get("duration_minutes"))
 
-    # Determine the persona for the meditation coach
-    role = "Meditation Coach"
-    if preferred_session == "visualization":
-        role = "Visualization Coach"
-    elif "focus" in needs or "calm" in needs:
-        role = "Therapist"
-    elif "energy" in needs:
-        role = "Motivational Coach"
+    role = coach_role(advice_input)
 
     # Create a detailed, high-quality prompt for the LLM
     system_prompt = (
         f"You are a compassionate and experienced {role}. Your task is to create a personalized, guided meditation script. "
-        f"The script should be approximately 3-4 paragraphs long. It should be soothing, easy to follow, and directly address the user's feelings and needs. "
+        f"The script is read aloud over a {budget['minutes']}-minute session, so it should be about {budget['words']} words in {budget['paragraphs']} paragraphs. It should be soothing, easy to follow, and directly address the user's feelings and needs. "
         f"Start with a welcoming introduction, guide them through the main exercise, and end with a gentle, positive conclusion. "
         f"Do not include any sign-offs or introductory phrases like 'Here is the script'. Just provide the meditation text itself."
     )
-    
+
     user_prompt = (
         f"The user is feeling {', '.join(mood_tags)} and has expressed needs for {', '.join(needs)}. "
         f"Please create a guided {preferred_session} for them."
     )
+    return role, system_prompt, user_prompt
 
-    # Generate the meditation script using Bedrock
+async def record_token_usage(advice_input: dict, system_prompt: str, user_prompt: str, script: str, usage: dict) -> None:
+    """Log the prompt builder's estimates next to the provider's reported usage (utils/token_usage.py)."""
+    budget = script_budget(advice_input.get("duration_minutes"))
+    await get_token_usage().record({
+        **usage,
+        "minutes": budget["minutes"],
+        "max_tokens": budget["max_tokens"],
+        "estimated_input_tokens": estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+        "estimated_output_tokens": budget["tokens"],
+        "target_words": budget["words"],
+        "output_words": count_words(script),
+    })
+
+def script_cache_key(system_prompt: str, user_prompt: str, max_tokens: int, provider: str, model_id: str) -> str:
+    """Cache key of a script: the prompts plus the provider, model and max_tokens that wrote it."""
+    model_kwargs = {"max_tokens": max_tokens, "temperature": LLM_CONFIG["model_kwargs"]["temperature"]}
+    return make_cache_key(system_prompt, user_prompt, f"{provider}:{model_id}", model_kwargs)
+
+def leading_cache_key(system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+    """The cache key for the provider currently ranked first, the one expected to answer."""
+    provider = get_llm_router().ranked()[0]
+    return script_cache_key(system_prompt, user_prompt, max_tokens, provider.name, provider.model_id)
+
+def answered_cache_key(system_prompt: str, user_prompt: str, max_tokens: int, usage: dict) -> str:
+    """The cache key for the provider that actually answered (the router's `usage`)."""
+    return script_cache_key(system_prompt, user_prompt, max_tokens, usage.get("provider", ""), usage.get("model_id", ""))
+
+def template_script(advice_input: dict) -> dict:
+    """
+    Assemble a script from the segment library (utils/script_templates.py)
+    without calling the LLM. The same request always gets the same script,
+    whose segments' audio is synthesized ahead of time (see assemble_voice).
+    """
+    return get_segment_library().compose(advice_input, coach_role(advice_input))
+
+def fallback_script(advice_input: dict, role: str) -> str:
+    """The script to use when the LLM fails: a template script, or one line if the library is unusable."""
     try:
-        body = json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": LLM_CONFIG["model_kwargs"]["max_tokens"],
-            "temperature": LLM_CONFIG["model_kwargs"]["temperature"],
-            "system": system_prompt,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"type": "text", "text": user_prompt}]
-                }
-            ]
-        })
-
-        response = client.invoke_model(
-            body=body,
-            modelId=LLM_CONFIG["model_id"],
-            accept='application/json',
-            contentType='application/json'
+        return template_script(advice_input)["text"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error loading script segments: {e}")
+        return f"As your {role}, I invite you to take a moment for yourself. Breathe in, and out. Let this time be for you."
+
+def recent_script(advice_input: dict) -> str:
+    """The latest script generated for the same mood tags and needs; LookupError if there is none."""
+    script = get_recent_scripts().latest(advice_input.get("mood_tags", []), advice_input.get("needs", []))
+    if script is None:
+        raise LookupError("No recent script for this mood and needs")
+    return script
+
+async def run_dynamic_meditation(advice_input: dict, fast: bool = False, fallback: bool = True) -> str:
+    """
+    Generates a dynamic meditation script using the configured LLM providers
+    (utils/llm_router.py): the fastest one, hedged with a backup when it is
+    slow to answer. Raises LLMOverloadedError when the only provider sheds load.
+    With `fast`, or when the LLM cannot be used, the script is assembled
+    from reusable segments instead (see template_script); without
+    `fallback`, LLM errors are raised so the caller can pick its own.
+    """
+    if fast:
+        return template_script(advice_input)["text"]
+
+    role, system_prompt, user_prompt = build_meditation_prompt(advice_input)
+    max_tokens = script_budget(advice_input.get("duration_minutes"))["max_tokens"]
+    recent = get_recent_scripts()
+    mood_tags, needs = advice_input.get("mood_tags", []), advice_input.get("needs", [])
+
+    # Serve repeat requests from the script cache
+    cache = get_script_cache()
+    cache_key = leading_cache_key(system_prompt, user_prompt, max_tokens)
+    if cache is not None:
+        cached = await cache.get(cache_key)
+        if cached:
+            recent.remember(mood_tags, needs, cached)
+            return cached
+
+    async def generate() -> str:
+        usage = {}
+        meditation_advice = await get_llm_router().complete(
+            system_prompt, user_prompt,
+            max_tokens, LLM_CONFIG["model_kwargs"]["temperature"],
+            usage=usage,
         )
 
-        response_body = json.loads(response.get('body').read())
-        
-        if not response_body.get("content"):
-            raise ValueError("LLM response is empty or invalid.")
-            
-        meditation_advice = response_body.get("content")[0].get("text", "").strip()
-        
         if not meditation_advice:
              raise ValueError("LLM returned an empty script.")
 
+        await record_token_usage(advice_input, system_prompt, user_prompt, meditation_advice, usage)
+
+        # Recorded even if the caller gave up waiting, for the next request's fallback
+        recent.remember(mood_tags, needs, meditation_advice)
+        if cache is not None:
+            await cache.put(answered_cache_key(system_prompt, user_prompt, max_tokens, usage), meditation_advice)
+        return meditation_advice
+
+    # Generate the meditation script on the fastest provider (hedged, see
+    # utils/llm_router.py); identical requests that arrive while one is in
+    # flight share its result.
+    try:
+        return await get_single_flight("llm").do(cache_key, generate)
+    except LLMOverloadedError:
+        raise
     except Exception as e:
-        print(f"Error generating content from Bedrock: {e}")
-        meditation_advice = f"As your {role}, I invite you to take a moment for yourself. Breathe in, and out. Let this time be for you."
+        logger.error(f"Error generating meditation script: {e}")
+        if not fallback:
+            raise
+        return fallback_script(advice_input, role)
 
-    return meditation_advice
\ No newline at end of file
+async def stream_dynamic_meditation(advice_input: dict, fast: bool = False) -> AsyncIterator[str]:
+    """
+    Streaming variant of run_dynamic_meditation.
+    Yields the script as text deltas as soon as the LLM produces them.
+    If the stream fails before any text was sent, the fallback (template) script is yielded instead;
+    a failure after that is raised, since the text already sent is incomplete.
+    With `fast`, the template script is yielded in one piece.
+    """
+    if fast:
+        yield template_script(advice_input)["text"]
+        return
+
+    role, system_prompt, user_prompt = build_meditation_prompt(advice_input)
+    max_tokens = script_budget(advice_input.get("duration_minutes"))["max_tokens"]
+
+    cache = get_script_cache()
+    if cache is not None:
+        cached = await cache.get(leading_cache_key(system_prompt, user_prompt, max_tokens))
+        if cached:
+            yield cached
+            return
+
+    sent_any = False
+    parts = []
+    usage = {}
+    try:
+        events = get_llm_router().stream(
+            system_prompt, user_prompt,
+            max_tokens, LLM_CONFIG["model_kwargs"]["temperature"],
+            usage=usage,
+        )
+        async for text in events:
+            sent_any = True
+            parts.append(text)
+            yield text
+
+        if not sent_any:
+            raise ValueError("LLM stream returned an empty script.")
+
+        script = "".join(parts).strip()
+        await record_token_usage(advice_input, system_prompt, user_prompt, script, usage)
+        get_recent_scripts().remember(advice_input.get("mood_tags", []), advice_input.get("needs", []), script)
+        if cache is not None:
+            await cache.put(answered_cache_key(system_prompt, user_prompt, max_tokens, usage), script)
+
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming meditation script: {e}")
+        if sent_any:
+            # Part of the script is already out: let the caller report a cut-off stream
+            raise
+        yield fallback_script(advice_input, role)
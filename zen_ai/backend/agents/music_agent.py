@@ -1,18 +1,27 @@
+import aiofiles
+import asyncio
 import os
 import uuid
 from datetime import datetime
 from pathlib import Path
 from pydantic import BaseModel
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
 import logging
 from zen_ai.backend.settings import MUSIC_CONFIG
+from zen_ai.backend.utils.single_flight import get_single_flight
+from zen_ai.backend.utils.music_synth import stream_wav
+from zen_ai.backend.utils.music_bank import get_music_bank
+from zen_ai.backend.utils.mixer import make_mix_key, stream_mix_wav
+from zen_ai.backend.utils.audio_store import get_audio_store
+from zen_ai.backend.utils.preference_model import preferred_choice
+from zen_ai.backend.utils.rule_engine import route
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Ensure output directory exists
-MUSIC_OUTPUT_DIR = Path("zen_ai/music_output")
+MUSIC_OUTPUT_DIR = Path(MUSIC_CONFIG["output_dir"])
 MUSIC_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 class MusicRequest(BaseModel):
@@ -25,46 +34,94 @@ class MusicResponse(BaseModel):
     style: str
     duration: int
     timestamp: str
+    # Set when music_path is a seamless loop to repeat for `duration` seconds
+    loop: bool = False
+    loop_start: float = 0.0
+    loop_end: float = 0.0
 
-async def generate_music(music_style: str) -> MusicResponse:
+def canonical_style(music_style: str) -> str:
+    """Map a mood or style name onto one of the styles the synth renders."""
+    return MUSIC_CONFIG["styles"].get(music_style.lower(), MUSIC_CONFIG["default_style"])
+
+async def generate_music(music_style: str, duration: int = None) -> MusicResponse:
     """
     Generate music based on style.
-    TODO: Integrate with Suno API for actual music generation.
-    Currently simulates by creating a placeholder file.
+    Styles in the pre-rendered loop bank are answered with a loop descriptor
+    pointing at the shared asset; nothing is rendered or written per request.
+    Otherwise a track is rendered, and concurrent requests for the same
+    style and duration share one rendering.
+    """
+    duration = duration or MUSIC_CONFIG["default_duration"]
+    banked = _bank_loop(canonical_style(music_style), duration)
+    if banked is not None:
+        return banked
+
+    key = (music_style.lower(), duration)
+    return await get_single_flight("music").do(key, lambda: _render_music(music_style, duration))
+
+def _bank_loop(style: str, duration: int) -> Optional[MusicResponse]:
+    asset = get_music_bank().get(style)
+    if asset is None:
+        return None
+    return MusicResponse(
+        music_path=asset["path"],
+        style=style,
+        duration=duration,
+        timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+        loop=True,
+        loop_start=asset["loop_start"],
+        loop_end=asset["loop_end"]
+    )
+
+def banked_music(music_style: str, duration: int = None) -> MusicResponse:
+    """
+    A loop from the bank without rendering anything: the style's own, else
+    the default style's. Raises LookupError if neither is in the bank.
+    """
+    duration = duration or MUSIC_CONFIG["default_duration"]
+    for style in (canonical_style(music_style), MUSIC_CONFIG["default_style"]):
+        banked = _bank_loop(style, duration)
+        if banked is not None:
+            return banked
+    raise LookupError(f"No banked loop for {music_style!r}")
+
+def _write_track(style: str, duration: int, output_path: Path) -> None:
+    """Render a track block by block straight into a WAV file."""
+    tmp_path = output_path.with_suffix(".part")
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in stream_wav(style, duration, MUSIC_CONFIG["sample_rate"]):
+                f.write(chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+async def _render_music(music_style: str, duration: int) -> MusicResponse:
+    """
+    Synthesize a track locally with the procedural engine in utils.music_synth.
+    Rendering is CPU-bound, so it runs in a worker thread.
     """
     try:
         logger.info(f"Generating music for style: {music_style}")
-        
+
         # Get music style from config
-        style = MUSIC_CONFIG["styles"].get(music_style.lower(), MUSIC_CONFIG["default_style"])
-        
+        style = canonical_style(music_style)
+
         # Generate unique filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         unique_id = str(uuid.uuid4())[:8]
-        filename = f"music_{timestamp}_{unique_id}.mp3"
+        filename = f"music_{timestamp}_{unique_id}.wav"
         output_path = MUSIC_OUTPUT_DIR / filename
 
-        # TODO: Replace with actual Suno API integration
-        # For now, create a placeholder file
-        with open(output_path, "wb") as f:
-            f.write(b"Placeholder music file") # Simulating file creation
-
-        logger.info(f"Placeholder music file created at: {output_path}")
-
-        # Create and return the MusicResponse object
-        return MusicResponse(
-            music_path=str(output_path),
-            style=music_style,
-            duration=300,  # Default duration
-            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        )
+        await asyncio.to_thread(_write_track, style, duration, output_path)
 
         logger.info(f"Music generated successfully: {output_path}")
-        
+
         return MusicResponse(
             music_path=str(output_path),
             style=style,
-            duration=300, # Default duration
+            duration=duration,
             timestamp=timestamp
         )
 
@@ -72,20 +129,66 @@ async def generate_music(music_style: str) -> MusicResponse:
         logger.error(f"Error generating music: {str(e)}")
         raise Exception(f"Music generation failed: {str(e)}")
 
+async def open_mix_stream(voice_key: str, voice_pcm_path: str, music_style: str) -> Tuple[Path, AsyncIterator[bytes]]:
+    """
+    Mix a PCM voice clip over a music bed of the same length, through the
+    "mix" audio store. Returns the mix's final path and an iterator over its
+    WAV bytes: read from disk on a store hit, otherwise encoded block by
+    block (in a worker thread) while being written to a temporary file that
+    is committed once the mix completes.
+    """
+    style = canonical_style(music_style)
+    store = get_audio_store("mix")
+    key = make_mix_key(voice_key, style)
+
+    if store.get(key) is not None:
+        return store.path_for(key), store.read_chunks(key)
+
+    async def mix() -> AsyncIterator[bytes]:
+        tmp_path = store.temp_path(key)
+        chunks = stream_mix_wav(Path(voice_pcm_path), style)
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        break
+                    await f.write(chunk)
+                    yield chunk
+            await store.commit(key, tmp_path)
+        finally:
+            chunks.close()
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    return store.path_for(key), mix()
+
+async def mix_voice_over_music(voice_result: dict, music_style: str) -> str:
+    """Mixdown for a synthesize_voice(..., audio_format="pcm") result. Returns the WAV path."""
+    key = make_mix_key(voice_result["audio_key"], canonical_style(music_style))
+
+    async def produce() -> str:
+        output_path, chunks = await open_mix_stream(voice_result["audio_key"], voice_result["file_path"], music_style)
+        async for _ in chunks:
+            pass
+        return str(output_path)
+
+    return await get_single_flight("mix").do(key, produce)
+
 async def get_music_for_mood(mood: str) -> str:
     """Get appropriate music style for the given mood."""
     return MUSIC_CONFIG["styles"].get(mood.lower(), MUSIC_CONFIG["default_style"])
 
-def select_music_style(preferred_style: str, needs: list) -> str:
+def select_music_style(preferred_style: str, needs: list, user_id: Optional[str] = None) -> str:
     if preferred_style:
         return preferred_style
-    
-    # If preferred_style is not provided, infer from needs
-    if "focus" in needs or "energy" in needs:
-        return "binaural beats"
-    elif "calm" in needs or "anxious" in needs:
-        return "nature sounds"
-    else:
-        return "instrumental"
+
+    # Otherwise the style this user has rated best, if there is a clear favourite
+    learned = preferred_choice(user_id, "music_style")
+    if learned:
+        return learned
+
+    # If neither is available, infer from needs ("music_style" routing table)
+    return route("music_style", needs)
 
     # --- Suno AI integration point: The chosen style will be passed to Suno AI for music generation --- 
\ No newline at end of file
@@ -1,18 +1,17 @@
-def select_roles(emotion_tags: list) -> list:
-    # Simple logic to select roles based on emotion tags
-    selected_roles = []
+from typing import Optional
 
-    if "anxious" in emotion_tags or "stressed" in emotion_tags:
-        selected_roles.append("Calm_Guide")
-    if "tired" in emotion_tags:
-        selected_roles.append("Energy_Coach")
-    if "happy" in emotion_tags:
-        selected_roles.append("Joy_Amplifier")
-    if "sad" in emotion_tags:
-        selected_roles.append("Comfort_Provider")
+from zen_ai.backend.settings import PREFERENCE_CONFIG
+from zen_ai.backend.utils.preference_model import choice_scores
+from zen_ai.backend.utils.rule_engine import route
 
-    # Default role if no specific emotion tag matches
-    if not selected_roles:
-        selected_roles.append("General_Zen_Master")
+def select_roles(emotion_tags: list, user_id: Optional[str] = None) -> list:
+    # Rules are the "roles" table in settings.ROUTING_RULES
+    selected_roles = list(route("roles", emotion_tags))
 
-    return selected_roles 
\ No newline at end of file
+    # Roles this user rated higher go first; an unrated role scores the prior,
+    # and the sort is stable, so ties keep the rule order
+    scores = choice_scores(user_id, "role")
+    if scores:
+        selected_roles.sort(key=lambda role: -scores.get(role, PREFERENCE_CONFIG["prior"]))
+
+    return selected_roles
@@ -2,142 +2,216 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
 import httpx
+import logging
+import asyncio
+import aiofiles
 from pathlib import Path
-import uuid
 from datetime import datetime
-from zen_ai.backend.settings import VOICE_CONFIG
+from typing import AsyncIterator, List, Optional, Tuple
+from zen_ai.backend.settings import TEMPLATE_CONFIG, VOICE_CONFIG
+from zen_ai.backend.utils.http_client import request_with_retry, stream_with_retry
+from zen_ai.backend.utils.audio import Mp3Joiner, split_script
+from zen_ai.backend.utils.audio_store import get_audio_store, make_audio_key
+from zen_ai.backend.utils.single_flight import get_single_flight
+from zen_ai.backend.utils.preference_model import preferred_choice
+from zen_ai.backend.utils.voice_catalog import get_voice_catalog
+from zen_ai.backend.utils.script_templates import segment_texts
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 class VoiceInput(BaseModel):
     text: str
     voice: str = "Rachel"
+    chunked: bool = False
 
 @router.post("/generate_voice")
 async def generate_voice(input_data: VoiceInput):
-    # Use the API key from environment variables
+    try:
+        # Content-addressed output: concurrent users never overwrite each other's files
+        output_path, chunks = await open_voice_stream(input_data.text, input_data.voice, input_data.chunked)
+        async for _ in chunks:
+            pass
+
+        return {"file_path": str(output_path)}
+
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Error calling ElevenLabs API: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+async def get_voice_id(voice_name: str) -> str:
+    """Get ElevenLabs voice ID for a voice name, alias or ID (unknown names get the default voice)."""
+    return get_voice_catalog().voice_id(voice_name)
+
+# Synthesis parameters; they are part of every audio store key.
+TTS_MODEL_ID = "eleven_monolingual_v1"
+TTS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.5
+}
+
+# Audio formats we request from ElevenLabs. Each one has its own audio store,
+# so the same content key can exist once per format.
+VOICE_FORMATS = {
+    "mp3": {"output_format": None, "store": "voice", "media_type": "audio/mpeg"},
+    "pcm": {"output_format": VOICE_CONFIG["pcm_format"], "store": "voice_pcm", "media_type": "audio/pcm"},
+}
+
+def build_tts_request(text: str, voice_id: str, audio_format: str = "mp3") -> Tuple[str, dict, dict]:
+    """Build the (url, headers, json body) for an ElevenLabs text-to-speech call."""
+    # Get API key from environment
     api_key = os.getenv("ELEVENLABS_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY not found")
 
-    # Create voice_output directory if it doesn't exist
-    output_dir = Path("voice_output")
-    output_dir.mkdir(exist_ok=True)
-
-    # Prepare the API request
-    url = "https://api.elevenlabs.io/v1/text-to-speech"
+    fmt = VOICE_FORMATS[audio_format]
+    url = f"{VOICE_CONFIG['api_url']}/text-to-speech/{voice_id}"
+    if fmt["output_format"]:
+        url = f"{url}?output_format={fmt['output_format']}"
     headers = {
-        "Accept": "audio/mpeg",
+        "Accept": fmt["media_type"],
         "Content-Type": "application/json",
         "xi-api-key": api_key
     }
-    
-    # Get voice ID based on the voice name
-    voice_id = await get_voice_id(input_data.voice)
-    
     data = {
-        "text": input_data.text,
-        "model_id": "eleven_monolingual_v1",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.5
-        }
+        "text": text,
+        "model_id": TTS_MODEL_ID,
+        "voice_settings": TTS_VOICE_SETTINGS
     }
+    return url, headers, data
 
-    try:
-        # Make request to ElevenLabs API
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{url}/{voice_id}", json=data, headers=headers)
-            response.raise_for_status()
-            audio_content = response.content
+async def stream_voice_to_file(text: str, voice_id: str, output_path: Path, audio_format: str = "mp3") -> AsyncIterator[bytes]:
+    """
+    Stream synthesized speech from ElevenLabs into `output_path`, yielding
+    each chunk as soon as it has been written. Audio is never held in memory
+    as a whole.
+    """
+    url, headers, data = build_tts_request(text, voice_id, audio_format)
+    async with stream_with_retry("POST", url, "elevenlabs", json=data, headers=headers) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"ElevenLabs API error: {response.text}"
+            )
+        async with aiofiles.open(output_path, "wb") as f:
+            async for chunk in response.aiter_bytes(VOICE_CONFIG["stream_chunk_size"]):
+                await f.write(chunk)
+                yield chunk
 
-            # Save the audio file
-            output_path = output_dir / f"{input_data.voice}.mp3"
-            with open(output_path, "wb") as f:
-                f.write(audio_content)
+async def stream_chunked_voice_to_file(text: str, voice_id: str, output_path: Path, audio_format: str = "mp3") -> AsyncIterator[bytes]:
+    """
+    Chunked synthesis: split the script at paragraph/sentence boundaries,
+    synthesize the pieces concurrently (at most VOICE_CONFIG["chunk_concurrency"]
+    at a time) and stitch their MP3 frames (or raw PCM) together in order.
 
-            return {"file_path": str(output_path)}
+    Each piece is yielded, and appended to `output_path`, as soon as it and
+    every piece before it are ready, so the first sentence is playable
+    while the rest is still being synthesized. For MP3 the yielded bytes
+    are bare audio frames; the file also gets one Info header for the
+    joined stream (see Mp3Joiner), written once the last piece is in.
+    """
+    pieces = split_script(text, VOICE_CONFIG["chunk_max_chars"]) or [text]
+    fan_out = asyncio.Semaphore(VOICE_CONFIG["chunk_concurrency"])
 
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=500, detail=f"Error calling ElevenLabs API: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    async def synthesize_piece(piece: str) -> bytes:
+        url, headers, data = build_tts_request(piece, voice_id, audio_format)
+        async with fan_out:
+            response = await request_with_retry("POST", url, "elevenlabs", json=data, headers=headers)
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"ElevenLabs API error: {response.text}"
+            )
+        return response.content
 
-async def get_voice_id(voice_name: str) -> str:
-    """Get ElevenLabs voice ID for a given voice name."""
+    joiner = Mp3Joiner() if audio_format == "mp3" else None
+    tasks = [asyncio.create_task(synthesize_piece(piece)) for piece in pieces]
     try:
-        # Map voice names to their IDs
-        voice_map = {
-            "Rachel": "21m00Tcm4TlvDq8ikWAM",
-            "Domi": "AZnzlk1XvdvUeBnXmlld",
-            "Bella": "EXAVITQu4vr4xnSDxMaL",
-            "Antoni": "ErXwobaYiN019PkySvjV",
-            "Elli": "MF3mGyEYCl7XYWbV9V6O",
-            "Josh": "TxGEqnHWrfWFTfGW9XjX",
-            "Arnold": "VR6AewLTigWG4xSOukaG",
-            "Adam": "pNInz6obpgDQGcFmaJgB",
-            "Sam": "yoZ06aMxZJJ28mfd3POQ"
-        }
-        return voice_map.get(voice_name, voice_map["Rachel"])
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting voice ID: {str(e)}")
+        async with aiofiles.open(output_path, "wb") as f:
+            for index, task in enumerate(tasks):
+                audio = await task
+                if joiner is not None:
+                    audio = joiner.add(audio)
+                    if index == 0:
+                        # Room for the joined stream's header, filled in at the end
+                        await f.write(bytes(joiner.header_size))
+                await f.write(audio)
+                yield audio
+            if joiner is not None and joiner.header_size:
+                await f.seek(0)
+                await f.write(joiner.header())
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def open_voice_stream(text: str, voice_name: str, chunked: bool = False, join_in_flight: bool = True, audio_format: str = "mp3") -> Tuple[Path, AsyncIterator[bytes]]:
+    """
+    Resolve the audio for (text, voice) through the content-addressed store
+    for `audio_format` ("mp3", or "pcm" for mixdown input).
 
-async def synthesize_voice(text: str, voice_name: str = "Rachel") -> dict:
+    Returns the clip's final path and an iterator over its bytes. On a store
+    hit the bytes are read from disk and no TTS call is made; otherwise they
+    are streamed from ElevenLabs while being written to a temporary file,
+    which is committed to the store once the stream completes.
+    With `join_in_flight`, a synthesis of the same clip already running in
+    synthesize_voice is awaited instead of starting a second one.
+    """
+    voice_id = await get_voice_id(voice_name)
+    store = get_audio_store(VOICE_FORMATS[audio_format]["store"])
+    key = make_audio_key(text, voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS)
+
+    if join_in_flight:
+        await get_single_flight("tts").join((audio_format, key))
+
+    if store.get(key) is not None:
+        return store.path_for(key), store.read_chunks(key, VOICE_CONFIG["stream_chunk_size"])
+
+    async def synthesize() -> AsyncIterator[bytes]:
+        tmp_path = store.temp_path(key)
+        writer = stream_chunked_voice_to_file if chunked else stream_voice_to_file
+        try:
+            async for chunk in writer(text, voice_id, tmp_path, audio_format):
+                yield chunk
+            await store.commit(key, tmp_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    return store.path_for(key), synthesize()
+
+async def synthesize_voice(text: str, voice_name: str = "Rachel", chunked: bool = None, audio_format: str = "mp3") -> dict:
     """
     Synthesize voice using ElevenLabs API.
-    Returns a dictionary with the file path of the generated audio.
+    Returns a dictionary with the file path of the generated audio and its store key.
+    Identical (text, voice) requests are served from the audio store.
+    `chunked` selects parallel per-sentence synthesis (defaults to VOICE_CONFIG["chunked"]).
     """
+    if chunked is None:
+        chunked = VOICE_CONFIG["chunked"]
+
+    async def produce() -> Path:
+        output_path, chunks = await open_voice_stream(text, voice_name, chunked, join_in_flight=False, audio_format=audio_format)
+        async for _ in chunks:
+            pass
+        return output_path
+
     try:
-        # Get voice ID
-        voice_id = await get_voice_id(voice_name)
-        
-        # Generate unique filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"voice_{timestamp}_{unique_id}.mp3"
-        output_path = Path("zen_ai/voice_output") / filename
-
-        # ElevenLabs API endpoint
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-        
-        # Get API key from environment
-        api_key = os.getenv("ELEVENLABS_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY not found")
-
-        # Prepare request headers and data
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": api_key
-        }
-        
-        data = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
-        }
-
-        # Make API request
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=data, headers=headers)
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"ElevenLabs API error: {response.text}"
-                )
-            
-            # Save audio file
-            audio_data = response.content
-            with open(output_path, "wb") as f:
-                f.write(audio_data)
+        # Concurrent identical requests share one synthesis
+        voice_id = await get_voice_id(voice_name)
+        key = make_audio_key(text, voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS)
+        output_path = await get_single_flight("tts").do((audio_format, key), produce)
 
         return {
             "file_path": str(output_path),
             "voice_name": voice_name,
+            "audio_key": key,
+            "audio_format": audio_format,
             "timestamp": timestamp
         }
 
@@ -146,39 +220,92 @@ async def synthesize_voice(text: str, voice_name: str = "Rachel") -> dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Voice synthesis error: {str(e)}")
 
-async def get_voice_for_mood(mood: str) -> str:
-    """Get appropriate voice for the given mood."""
-    return VOICE_CONFIG["voices"].get(mood.lower(), VOICE_CONFIG["default_voice"])
-
-def select_voice(user_preference: str) -> str:
+async def assemble_voice(texts: List[str], voice_name: str = "Rachel", audio_format: str = "mp3", stored_only: bool = False) -> dict:
     """
-    Select a voice ID based on user preference.
-    Only uses free voices available in ElevenLabs.
+    Voice for a script made of reusable pieces (template scripts): each
+    piece's clip comes from the audio store, synthesized only if missing,
+    and the clips are joined into one. The result is stored under the key
+    of the whole script ("\n\n".join(texts)), so it is what synthesize_voice
+    would return for that text. Returns the same dictionary as synthesize_voice.
+    With `stored_only`, raises LookupError instead of calling TTS for a missing piece.
     """
-    # Map of free ElevenLabs voices
-    voice_map = {
-        "rachel": "21m00Tcm4TlvDq8ikWAM",  # Female voice, clear and professional
-        "domi": "AZnzlk1XvdvUeBnXmlld",    # Female voice, warm and friendly
-        "bella": "EXAVITQu4vr4xnSDxMaL",   # Female voice, calm and soothing
-        "antoni": "ErXwobaYiN019PkySvjV",   # Male voice, deep and authoritative
-        "elli": "MF3mGyEYCl7XYWbV9V6O",    # Female voice, young and energetic
-        "josh": "TxGEqnHWrfWFTfGW9XjX",    # Male voice, natural and conversational
-        "arnold": "VR6AewLTigWG4xSOukaG",   # Male voice, deep and powerful
-        "adam": "pNInz6obpgDQGcFmaJgB",    # Male voice, clear and professional
-        "sam": "yoZ06aMxZJJ28mfd3POQ"      # Male voice, natural and friendly
+    voice_id = await get_voice_id(voice_name)
+    store = get_audio_store(VOICE_FORMATS[audio_format]["store"])
+    key = make_audio_key("\n\n".join(texts), voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS)
+    if stored_only and key not in store:
+        missing = [text for text in texts if make_audio_key(text, voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS) not in store]
+        if missing:
+            raise LookupError(f"{len(missing)} of {len(texts)} segment clips are not synthesized yet")
+
+    async def produce() -> Path:
+        if store.get(key) is not None:
+            return store.path_for(key)
+        pieces = await asyncio.gather(*(synthesize_voice(text, voice_name, False, audio_format) for text in texts))
+
+        def join(tmp_path: Path) -> None:
+            joiner = Mp3Joiner() if audio_format == "mp3" else None
+            with open(tmp_path, "wb") as out:
+                for index, piece in enumerate(pieces):
+                    audio = Path(piece["file_path"]).read_bytes()
+                    if joiner is not None:
+                        audio = joiner.add(audio)
+                        if index == 0:
+                            out.write(bytes(joiner.header_size))
+                    out.write(audio)
+                if joiner is not None and joiner.header_size:
+                    out.seek(0)
+                    out.write(joiner.header())
+
+        tmp_path = store.temp_path(key)
+        try:
+            await asyncio.to_thread(join, tmp_path)
+            return await store.commit(key, tmp_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    output_path = await get_single_flight("tts").do((audio_format, key), produce)
+    return {
+        "file_path": str(output_path),
+        "voice_name": voice_name,
+        "audio_key": key,
+        "audio_format": audio_format,
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
     }
 
-    # Normalize user preference for matching
-    normalized_preference = user_preference.lower().strip()
+async def prewarm_segment_audio() -> None:
+    """
+    Synthesize every template segment, as MP3, for each voice in
+    TEMPLATE_CONFIG["prewarm_voices"], so fast-path sessions never wait on
+    TTS. Clips already in the store cost nothing. Run in the background
+    from the FastAPI lifespan.
+    """
+    texts = segment_texts()
+    fan_out = asyncio.Semaphore(TEMPLATE_CONFIG["prewarm_concurrency"])
+
+    async def synthesize_segment(text: str, voice_name: str) -> None:
+        async with fan_out:
+            await synthesize_voice(text, voice_name, False)
 
-    # Try to find an exact match first
-    if normalized_preference in voice_map:
-        return voice_map[normalized_preference]
+    for voice_name in TEMPLATE_CONFIG["prewarm_voices"]:
+        results = await asyncio.gather(*(synthesize_segment(text, voice_name) for text in texts), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"Segment prewarm for {voice_name}: {len(failures)}/{len(texts)} clips failed, first error: {failures[0]}")
+        else:
+            logger.info(f"Segment prewarm for {voice_name}: {len(texts)} clips ready")
 
-    # If no exact match, try to find a partial match
-    for voice_name, voice_id in voice_map.items():
-        if voice_name in normalized_preference or normalized_preference in voice_name:
-            return voice_id
+async def get_voice_for_mood(mood: str) -> str:
+    """Get appropriate voice for the given mood."""
+    return VOICE_CONFIG["voices"].get(mood.lower(), VOICE_CONFIG["default_voice"])
 
-    # Default to Rachel if no match is found
-    return voice_map["rachel"] 
\ No newline at end of file
+def select_voice(user_preference: str, user_id: Optional[str] = None) -> str:
+    """
+    Select a voice ID based on user preference: a catalog voice name, alias,
+    ID or near spelling (see utils/voice_catalog.py).
+    Without a preference, the voice this user has rated best is used.
+    """
+    catalog = get_voice_catalog()
+    if not (user_preference or "").strip():
+        return preferred_choice(user_id, "voice") or catalog.default["voice_id"]
+    return catalog.voice_id(user_preference) 
\ No newline at end of file
@@ -1,19 +1,81 @@
 import os
+import json
 import logging
 import asyncio
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 # --- Agent Imports (Starting with Meditation) ---
-from zen_ai.backend.agents.meditation_agent import run_full_meditation_flow
+from zen_ai.backend.settings import DEGRADATION_CONFIG
+from zen_ai.backend.session.meditation_flow import run_full_meditation_flow
+from zen_ai.backend.agents.analyzer_agent import perform_analysis_logic, load_analyzer
+from zen_ai.backend.agents.multi_role_agent import stream_dynamic_meditation
+from zen_ai.backend.agents.voice_agent import VoiceInput, open_voice_stream, synthesize_voice, prewarm_segment_audio
+from zen_ai.backend.agents.music_agent import open_mix_stream
+from zen_ai.backend.utils.llm_client import close_llm_client, get_llm_client, LLMOverloadedError
+from zen_ai.backend.utils.llm_router import init_llm_router, close_llm_router, get_llm_router
+from zen_ai.backend.utils.script_cache import get_script_cache
+from zen_ai.backend.utils.prompt_budget import session_minutes
+from zen_ai.backend.utils.token_usage import get_token_usage
+from zen_ai.backend.utils.warmup import get_warmup
+from zen_ai.backend.utils.http_client import init_http_client, close_http_client
+from zen_ai.backend.utils.audio_store import init_audio_store, close_audio_store, audio_store_stats
+from zen_ai.backend.utils.single_flight import single_flight_stats
+from zen_ai.backend.utils.music_bank import init_music_bank, get_music_bank
+from zen_ai.backend.utils.media import media_response, media_url
+from zen_ai.backend.utils.rule_engine import load_rules
+from zen_ai.backend.utils.voice_catalog import get_voice_catalog
+from zen_ai.backend.utils.script_templates import get_segment_library
+from zen_ai.backend.utils.job_queue import init_job_queue, close_job_queue, get_job_queue
+from zen_ai.backend.utils.memory_store import init_memory_store, close_memory_store, get_memory_store
+from zen_ai.backend.agents.memory_agent import read_memory
+from zen_ai.backend.agents.feedback_agent import FeedbackRejected, submit_feedback
+from zen_ai.backend.utils.feedback_buffer import init_feedback_buffer, close_feedback_buffer, get_feedback_buffer
+from zen_ai.backend.utils.preference_model import init_preference_model, close_preference_model, get_preference_model
 
 # --- Configure Logging ---
 logging.basicConfig(level=logging.INFO)
 
+# --- Application Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients are created once per worker and reused by every request.
+    load_rules()
+    get_voice_catalog()
+    get_segment_library()
+    await init_http_client()
+    await init_audio_store()
+    await init_memory_store()
+    await init_preference_model()
+    await init_feedback_buffer()
+    await init_job_queue(run_meditation_job)
+    # The slow parts warm in the background so the server answers at once;
+    # each also loads on first use. GET /ready turns 200 when the required
+    # ones are done. Template segment audio is not required: fast-path
+    # requests that arrive first synthesize whatever is still missing.
+    warmup = get_warmup()
+    warmup.add("analyzer", load_analyzer)
+    warmup.add("llm", init_llm_router)
+    warmup.add("music_bank", init_music_bank)
+    warmup.add("segment_audio", prewarm_segment_audio, required=False)
+    warmup.start()
+    yield
+    await warmup.close()
+    await close_job_queue()
+    await close_feedback_buffer()
+    await close_preference_model()
+    await close_memory_store()
+    await close_audio_store()
+    await close_http_client()
+    await close_llm_router()
+    await close_llm_client()
+
 # --- FastAPI App Initialization ---
-app = FastAPI(title="Zen AI Coach API (Minimal Test)")
+app = FastAPI(title="Zen AI Coach API (Minimal Test)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,11 +91,52 @@ class MeditationRequest(BaseModel):
     quiz_answers: List[str]
     voice_pref: str
     music_pref: str
+    # Return one voice-over-music track (mixed_output) instead of separate files
+    mix: bool = False
+    # Identifies the user across sessions: enables session memory and
+    # learned voice / music preferences (used when voice_pref / music_pref are empty)
+    user_id: Optional[str] = None
+    # Assemble the script from pre-written segments with pre-synthesized
+    # audio (no LLM call): a full session in milliseconds
+    fast_path: bool = False
+    # End-to-end budget for this request; slow stages degrade to faster
+    # tiers to meet it (defaults to MEDITATE_DEADLINE)
+    deadline_ms: Optional[int] = Field(default=None, ge=100, le=600000)
+    # Session length; sizes the script (and its max_tokens) and the music
+    # track (defaults to PROMPT_CONFIG["default_minutes"])
+    duration_minutes: Optional[int] = Field(default=None, ge=5, le=15)
 
 class MeditationResponse(BaseModel):
+    session_id: str = ""
     meditation_text: str
     voice_output: str
     music_output: str
+    music_loop: bool = False
+    mixed_output: str = ""
+    duration_minutes: int = 5
+    # Same files as above, served by GET /media/...
+    voice_url: str = ""
+    music_url: str = ""
+    mixed_url: str = ""
+    # Segment ids when the script is a template one (fast path or fallback)
+    script_segments: List[str] = []
+    # Tier that produced each degradable stage (e.g. {"script": "llm",
+    # "voice": "tts"}) and the stages that fell back from their primary tier
+    tiers: Dict[str, str] = {}
+    degraded: List[str] = []
+    timings: Dict[str, float] = {}
+
+class MixRequest(BaseModel):
+    text: str
+    voice: str = "Rachel"
+    music_style: str = "calm"
+    chunked: bool = False
+
+class FeedbackRequest(BaseModel):
+    session_id: str
+    user_input: str = ""
+    rating: Optional[int] = Field(default=None, ge=1, le=5)
+    user_id: Optional[str] = None
 
 class VisualizationRequest(BaseModel):
     user_goal: str
@@ -47,38 +150,299 @@ class VisualizationResponse(BaseModel):
 def read_root():
     return {"message": "Welcome to the Zen AI Coach API (Minimal Test)"}
 
+@app.get("/ready")
+def read_ready():
+    """Readiness probe: 200 once background warm-up is done, 503 (with per-step status) until then."""
+    status = get_warmup().status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+async def read_metrics():
+    script_cache = get_script_cache()
+    return {
+        "llm": get_llm_client().stats(),
+        "llm_providers": get_llm_router().stats(),
+        "token_usage": {**get_token_usage().stats(), "recent": get_token_usage().recent()},
+        "script_cache": script_cache.stats() if script_cache else None,
+        "audio_stores": audio_store_stats(),
+        "single_flight": single_flight_stats(),
+        "music_bank": get_music_bank().stats(),
+        "jobs": await get_job_queue().stats() if get_job_queue() else None,
+        "memory": get_memory_store().stats() if get_memory_store() else None,
+        "feedback": get_feedback_buffer().stats() if get_feedback_buffer() else None,
+        "preferences": get_preference_model().stats() if get_preference_model() else None,
+        "voice_catalog": get_voice_catalog().stats(),
+    }
+
+async def run_meditation(input_data: MeditationRequest, on_stage=None) -> MeditationResponse:
+    """Run the meditation flow for one request and build the API response."""
+    logging.info("Calling run_full_meditation_flow...")
+    flow_result = await run_full_meditation_flow(
+        user_input=input_data.user_input,
+        quiz_answers=input_data.quiz_answers,
+        voice_pref=input_data.voice_pref,
+        music_pref=input_data.music_pref,
+        on_stage=on_stage,
+        mix=input_data.mix,
+        user_id=input_data.user_id,
+        fast=input_data.fast_path,
+        deadline=input_data.deadline_ms / 1000 if input_data.deadline_ms else DEGRADATION_CONFIG["deadline"],
+        duration_minutes=input_data.duration_minutes,
+    )
+    timings = flow_result.get("timings", {})
+    logging.info(f"Meditation flow completed. Stage timings (ms): {timings}, tiers: {flow_result.get('tiers', {})}")
+    meditation_text = flow_result.get("coach_response")
+
+    if not meditation_text:
+        raise HTTPException(status_code=500, detail="Core agent flow did not return meditation text.")
+
+    return MeditationResponse(
+        session_id=flow_result.get("session_id", ""),
+        meditation_text=meditation_text,
+        voice_output=flow_result.get("voice_output", ""),
+        music_output=flow_result.get("music_output", ""),
+        music_loop=flow_result.get("music_loop", False),
+        mixed_output=flow_result.get("mixed_output", ""),
+        duration_minutes=flow_result.get("duration_minutes", 5),
+        voice_url=media_url(flow_result.get("voice_output", "")),
+        music_url=media_url(flow_result.get("music_output", "")),
+        mixed_url=media_url(flow_result.get("mixed_output", "")),
+        script_segments=flow_result.get("script_segments", []),
+        tiers=flow_result.get("tiers", {}),
+        degraded=flow_result.get("degraded", []),
+        timings=timings,
+    )
+
+async def run_meditation_job(payload: dict, on_stage) -> dict:
+    """Job queue handler: the same work as POST /meditate, with per-stage progress."""
+    response = await run_meditation(MeditationRequest(**payload), on_stage)
+    return response.model_dump()
+
 @app.post("/meditate", response_model=MeditationResponse)
 async def handle_meditation_request(input_data: MeditationRequest):
     logging.info(f"Received meditation request for user input: {input_data.user_input[:50]}...")
     try:
-        # Step 1: Run the core meditation agent
-        logging.info("Calling run_full_meditation_flow...")
-        flow_result = await run_full_meditation_flow(
-            user_input=input_data.user_input,
-            quiz_answers=input_data.quiz_answers,
-            voice_pref=input_data.voice_pref,
-            music_pref=input_data.music_pref,
-        )
-        logging.info(f"Meditation flow completed.")
-        meditation_text = flow_result.get("coach_response")
-
-        if not meditation_text:
-            raise HTTPException(status_code=500, detail="Core agent flow did not return meditation text.")
-
-        # Step 2 & 3: Use dummy paths for now to isolate testing
-        voice_output_path = "dummy/voice.mp3"
-        music_output_path = "dummy/music.mp3"
-        logging.info("Using dummy paths for voice and music.")
-
-        return MeditationResponse(
-            meditation_text=meditation_text,
-            voice_output=voice_output_path,
-            music_output=music_output_path,
-        )
+        return await run_meditation(input_data)
+    except HTTPException:
+        raise
+    except LLMOverloadedError as e:
+        logging.warning(f"Rejecting meditation request, LLM is overloaded: {e}")
+        raise HTTPException(status_code=503, detail="The meditation service is busy, please retry shortly.", headers={"Retry-After": "5"})
     except Exception as e:
         logging.error(f"An unexpected error occurred in meditation flow: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected internal server error occurred.")
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/meditate/stream")
+async def handle_meditation_stream(input_data: MeditationRequest):
+    """
+    Server-Sent Events version of /meditate that streams the script as it is generated.
+    Events: `analysis` (once), `token` (per text delta), `done` (full text), `error`.
+    """
+    logging.info(f"Received streaming meditation request for user input: {input_data.user_input[:50]}...")
+    analyzed_data = {
+        **perform_analysis_logic(input_data.quiz_answers, input_data.user_input),
+        "duration_minutes": session_minutes(input_data.duration_minutes),
+    }
+
+    async def event_stream():
+        yield sse_event("analysis", analyzed_data)
+        parts = []
+        try:
+            async for text in stream_dynamic_meditation(analyzed_data, fast=input_data.fast_path):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except LLMOverloadedError:
+            yield sse_event("error", {"detail": "The meditation service is busy, please retry shortly."})
+            return
+        except Exception as e:
+            logging.error(f"Error while streaming meditation: {e}", exc_info=True)
+            yield sse_event("error", {"detail": "Meditation stream was interrupted."})
+            return
+        yield sse_event("done", {"meditation_text": "".join(parts).strip()})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Background jobs ---
+
+def require_job_queue():
+    queue = get_job_queue()
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Background jobs are unavailable.")
+    return queue
+
+@app.post("/meditate/jobs", status_code=202)
+async def submit_meditation_job(input_data: MeditationRequest):
+    """
+    Queue a meditation for background generation and return immediately.
+    Poll `status_url`, or follow `events_url` (SSE) for per-stage progress.
+    """
+    job_id = await require_job_queue().submit(input_data.model_dump())
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/meditate/jobs/{job_id}",
+        "events_url": f"/meditate/jobs/{job_id}/events",
+    }
+
+@app.get("/meditate/jobs/{job_id}")
+async def get_meditation_job(job_id: str):
+    job = await require_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/meditate/jobs/{job_id}/events")
+async def stream_meditation_job(job_id: str):
+    """
+    Server-Sent Events for one job. Events: `status` (queued/running, on
+    change), `stage` (a stage started/completed/failed), then `done` (the
+    /meditate response) or `error`.
+    """
+    queue = require_job_queue()
+    if await queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        sent_status, sent_stages = None, {}
+        while True:
+            job = await queue.get(job_id)
+            if job["status"] != sent_status:
+                sent_status = job["status"]
+                yield sse_event("status", {"status": sent_status, "attempts": job["attempts"]})
+            for name, info in job["stages"].items():
+                if sent_stages.get(name) != info:
+                    sent_stages[name] = info
+                    yield sse_event("stage", {"stage": name, **info})
+            if job["status"] == "succeeded":
+                yield sse_event("done", job["result"])
+                return
+            if job["status"] == "failed":
+                yield sse_event("error", {"detail": job["error"]})
+                return
+            await queue.wait_for_change(job_id, timeout=1.0)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Feedback ---
+
+@app.post("/feedback")
+async def handle_feedback(input_data: FeedbackRequest):
+    """
+    Accept feedback for a session. It is buffered in memory and written to
+    the database in batches. 409 if the session belongs to another user or
+    has already been rated.
+    """
+    try:
+        accepted = await submit_feedback(input_data.session_id, input_data.user_input, input_data.rating, input_data.user_id)
+    except FeedbackRejected as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not accepted:
+        raise HTTPException(status_code=503, detail="Too much feedback right now, please retry shortly.", headers={"Retry-After": "1"})
+    return {"status": "success", "message": "Thank you for your feedback!"}
+
+# --- Session memory ---
+
+@app.get("/users/{user_id}/sessions")
+async def list_user_sessions(user_id: str, limit: int = Query(default=10, ge=1, le=100), cursor: Optional[str] = None):
+    """The user's most recent sessions, newest first. Pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        return await read_memory(user_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/users/{user_id}/preferences")
+async def get_user_preferences(user_id: str):
+    """What has been learned from this user's ratings: per voice, music style and role, the rating count and score (0-1)."""
+    model = get_preference_model()
+    return model.profile(user_id) if model else {}
+
+@app.get("/voices")
+def list_voices():
+    """The voice catalog, in display order; any `name` (or alias) is a valid voice_pref."""
+    catalog = get_voice_catalog()
+    catalog.reload_if_changed()
+    return {
+        "default": catalog.default["name"],
+        "voices": [{"name": voice["name"], "description": voice.get("description", "")} for voice in catalog.voices],
+    }
+
+@app.post("/voice/stream")
+async def handle_voice_stream(input_data: VoiceInput):
+    """
+    Stream synthesized speech to the client while it is being written to disk,
+    so playback can start before synthesis finishes. The saved file's path is
+    returned in the X-Voice-File header and its /media URL in X-Voice-URL.
+    With `chunked`, sentences are synthesized in parallel and streamed in
+    order. Previously synthesized clips are streamed straight from the
+    audio store.
+    """
+    # Pull the first chunk before answering so upstream errors become a proper status code.
+    try:
+        output_path, chunks = await open_voice_stream(input_data.text, input_data.voice, input_data.chunked)
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Voice stream failed to start: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="Voice synthesis is unavailable.")
+
+    async def audio_stream():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/mpeg",
+        headers={"X-Voice-File": str(output_path), "X-Voice-URL": media_url(str(output_path)), "Cache-Control": "no-cache"},
+    )
+
+@app.post("/mix/stream")
+async def handle_mix_stream(input_data: MixRequest):
+    """
+    Stream one WAV track with the voice ducked over a music bed of the same
+    length. The voice is synthesized (or read from the store) first, since
+    its loudness is measured before mixing; the mix itself is encoded and
+    sent block by block. The saved file's path is returned in X-Mix-File
+    and its /media URL in X-Mix-URL.
+    """
+    try:
+        voice_result = await synthesize_voice(input_data.text, input_data.voice, input_data.chunked, audio_format="pcm")
+        output_path, chunks = await open_mix_stream(voice_result["audio_key"], voice_result["file_path"], input_data.music_style)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Mix stream failed to start: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="Voice synthesis is unavailable.")
+
+    return StreamingResponse(
+        chunks,
+        media_type="audio/wav",
+        headers={"X-Mix-File": str(output_path), "X-Mix-URL": media_url(str(output_path)), "Cache-Control": "no-cache"},
+    )
+
+@app.api_route("/media/{kind}/{filename}", methods=["GET", "HEAD"])
+def serve_media(kind: str, filename: str, request: Request):
+    """
+    Generated audio by URL (kind: voice, mix, music, tracks). Supports byte
+    ranges for seeking/resuming and conditional GETs; file names are
+    content-addressed, so responses are cacheable forever.
+    """
+    return media_response(request, kind, filename)
+
 @app.post("/visualize", response_model=VisualizationResponse)
 async def handle_visualization_request(input_data: VisualizationRequest):
     logging.info("Received /visualize request")
@@ -1,39 +1,178 @@
 from zen_ai.backend.agents.analyzer_agent import perform_analysis_logic
-from zen_ai.backend.agents.multi_role_agent import run_dynamic_meditation
-from zen_ai.backend.agents.voice_agent import select_voice
-from zen_ai.backend.agents.music_agent import select_music_style
+from zen_ai.backend.agents.multi_role_agent import run_dynamic_meditation, template_script, recent_script
+from zen_ai.backend.agents.voice_agent import select_voice, synthesize_voice, assemble_voice
+from zen_ai.backend.agents.music_agent import select_music_style, generate_music, banked_music, mix_voice_over_music, canonical_style
+from zen_ai.backend.agents.memory_agent import write_memory
+from zen_ai.backend.session.pipeline import Stage, run_stage_graph
+from zen_ai.backend.utils.preference_model import get_preference_model
+from zen_ai.backend.utils.prompt_budget import session_minutes
+from zen_ai.backend.settings import DEGRADATION_CONFIG
 import json
+import logging
+import time
+import uuid
 
-async def run_full_meditation_flow(user_input: str, quiz_answers: list, voice_pref: str, music_pref: str) -> dict:
-    print("--- Starting Meditation Flow ---")
-    print(f"Initial inputs: user_input='{user_input}', quiz_answers={quiz_answers}, voice_pref='{voice_pref}', music_pref='{music_pref}'")
+logger = logging.getLogger(__name__)
 
-    # Step 1: Analyze quiz answers to get mood, preferred session, and needs
-    print("\n[Step 1] Analyzing quiz answers...")
-    analyzed_data = perform_analysis_logic(quiz_answers)
-    print(f"[Step 1] Analysis complete. Result: {json.dumps(analyzed_data, indent=2)}")
+def build_meditation_stages(user_input: str, quiz_answers: list, voice_pref: str, music_pref: str, mix: bool = False, user_id: str = None, fast: bool = False, deadline: float = None, duration_minutes: int = None) -> list:
+    """
+    Describe the meditation flow as a dependency graph.
 
-    # Step 2: Generate dynamic meditation text based on analyzed data
-    print("\n[Step 2] Generating dynamic meditation text...")
-    meditation_text = run_dynamic_meditation(analyzed_data)
-    print(f"[Step 2] Meditation text generated. Length: {len(meditation_text) if meditation_text else 0} characters.")
+    analysis ──┬── template ── script ──┐
+               └── music_style ── music  │
+    voice_selection ──────────────────── voice (needs script + template + voice_selection)
 
-    # Step 3: Select voice ID based on user preference
-    print(f"\n[Step 3] Selecting voice for preference: '{voice_pref}'...")
-    selected_voice_id = select_voice(voice_pref)
-    print(f"[Step 3] Voice selected. ID: {selected_voice_id}")
+    With `mix`, the voice is synthesized as PCM and a `mixdown` stage
+    (voice + music_style) replaces the separate `music` track. With a
+    `user_id`, voice, music style and coach role fall back to what that
+    user rated best.
+    With `fast`, the script is the template one (reusable segments, no LLM
+    call) and the voice is joined from their pre-synthesized clips.
+    `duration_minutes` (clamped to PROMPT_CONFIG's range) sizes the LLM
+    script and the music track.
 
-    # Step 4: Select music style based on user preference and needs
-    print(f"\n[Step 4] Selecting music style for preference: '{music_pref}' and needs: {analyzed_data.get('needs', [])}...")
-    selected_music_style = select_music_style(music_pref, analyzed_data.get("needs", []))
-    print(f"[Step 4] Music style selected: {selected_music_style}")
+    With a `deadline` (seconds for the whole request), the script, voice,
+    music and mixdown stages get DEGRADATION_CONFIG["budgets"] shares of it
+    and, past their budget or on error, fall back to faster tiers:
+
+        script   llm -> recent_script -> template
+        voice    tts -> template_audio (switches the script to the template) -> text_only
+        music    generated -> bank_loop -> none
+        mixdown  mixed -> none
+    """
+    audio_format = "pcm" if mix else "mp3"
+    budgets = {name: share * deadline for name, share in DEGRADATION_CONFIG["budgets"].items()} if deadline else {}
+    minutes = session_minutes(duration_minutes)
+
+    def analysis(_):
+        return {**perform_analysis_logic(quiz_answers, user_input), "duration_minutes": minutes, "user_id": user_id}
+
+    def template(deps):
+        return template_script(deps["analysis"])
+
+    async def script(deps):
+        return await run_dynamic_meditation(deps["analysis"], fallback=False)
+
+    def template_text(deps):
+        return deps["template"]["text"]
+
+    def voice_selection(_):
+        return select_voice(voice_pref, user_id)
+
+    def music_style(deps):
+        return select_music_style(music_pref, deps["analysis"].get("needs", []), user_id)
+
+    async def music(deps):
+        return await generate_music(deps["music_style"], duration=minutes * 60)
+
+    async def voice(deps):
+        # Template scripts are joined from their pre-synthesized segment clips
+        if deps["script"] == deps["template"]["text"]:
+            return await assemble_voice(deps["template"]["texts"], deps["voice_selection"], audio_format)
+        return await synthesize_voice(deps["script"], deps["voice_selection"], audio_format=audio_format)
+
+    async def template_audio(deps):
+        return await assemble_voice(deps["template"]["texts"], deps["voice_selection"], audio_format, stored_only=True)
+
+    async def mixdown(deps):
+        return await mix_voice_over_music(deps["voice"], deps["music_style"])
+
+    def nothing(_):
+        return None
+
+    stages = [
+        Stage("analysis", analysis),
+        Stage("template", template, deps=["analysis"]),
+        Stage("voice_selection", voice_selection),
+        Stage("music_style", music_style, deps=["analysis"]),
+        Stage("voice", voice, deps=["script", "template", "voice_selection"], optional=True,
+              budget=budgets.get("voice"), tier="tts",
+              fallbacks=[("template_audio", template_audio), ("text_only", nothing)]),
+    ]
+    if fast:
+        stages.append(Stage("script", template_text, deps=["template"], tier="template"))
+    else:
+        stages.append(Stage("script", script, deps=["analysis", "template"],
+                            budget=budgets.get("script"), tier="llm",
+                            fallbacks=[("recent_script", lambda deps: recent_script(deps["analysis"])), ("template", template_text)]))
+    if mix:
+        stages.append(Stage("mixdown", mixdown, deps=["voice", "music_style"], optional=True,
+                            budget=budgets.get("mixdown"), tier="mixed", fallbacks=[("none", nothing)]))
+    else:
+        stages.append(Stage("music", music, deps=["music_style"], optional=True,
+                            budget=budgets.get("music"), tier="generated",
+                            fallbacks=[("bank_loop", lambda deps: banked_music(deps["music_style"], duration=minutes * 60)), ("none", nothing)]))
+    return stages
+
+async def remember_session(session_id: str, user_id: str, analysis: dict, choices: dict) -> None:
+    """Record what the session used, so later feedback on it can be learned from."""
+    model = get_preference_model()
+    if model is not None:
+        model.remember_session(session_id, user_id, choices)
+    await write_memory({
+        "user_id": user_id,
+        "session_id": session_id,
+        "timestamp": time.time(),
+        "type": "meditation",
+        "mood_tags": analysis.get("mood_tags", []),
+        "needs": analysis.get("needs", []),
+        **choices,
+    })
+
+async def run_full_meditation_flow(user_input: str, quiz_answers: list, voice_pref: str, music_pref: str, on_stage=None, mix: bool = False, user_id: str = None, fast: bool = False, deadline: float = None, duration_minutes: int = None) -> dict:
+    """
+    Run the meditation flow. `deadline` is the seconds the whole flow may
+    take; see build_meditation_stages for how stages degrade to meet it.
+    The output's `tiers` say which tier produced each degradable stage and
+    `degraded` lists the stages that did not use their primary tier.
+    """
+    logger.info("Starting meditation flow")
+    logger.debug(f"Initial inputs: user_input='{user_input}', quiz_answers={quiz_answers}, voice_pref='{voice_pref}', music_pref='{music_pref}'")
+
+    session_id = uuid.uuid4().hex
+    stages = build_meditation_stages(user_input, quiz_answers, voice_pref, music_pref, mix, user_id, fast, deadline, duration_minutes)
+    outcome = await run_stage_graph(stages, on_stage=on_stage, deadline=time.monotonic() + deadline if deadline else None)
+    results = outcome["results"]
+    tiers = outcome["tiers"]
+    degraded = sorted(stage.name for stage in stages if stage.name in tiers and tiers[stage.name] != stage.tier)
+    if degraded:
+        logger.warning(f"Degraded stages: { {name: tiers[name] for name in degraded} }")
+
+    for stage, error in outcome["errors"].items():
+        logger.warning(f"[{stage}] Optional stage did not complete: {error}")
+
+    voice_result = results.get("voice") or {}
+    music_result = results.get("music")
+
+    if user_id:
+        await remember_session(session_id, user_id, results["analysis"], {
+            "voice": results["voice_selection"],
+            "music_style": canonical_style(results["music_style"]),
+            # The persona the script was written for (LLM or template alike)
+            "role": results["template"]["role"],
+        })
+
+    script = results["script"]
+    if tiers.get("voice") == "template_audio":
+        # The voice is the template script's, so the text must be too
+        script = results["template"]["text"]
 
     final_output = {
-        "coach_response": meditation_text,
-        "voice_id": selected_voice_id,
-        "music_style": selected_music_style
+        "session_id": session_id,
+        "coach_response": script,
+        "voice_id": results["voice_selection"],
+        "music_style": results["music_style"],
+        "duration_minutes": results["analysis"]["duration_minutes"],
+        "voice_output": voice_result.get("file_path", ""),
+        "music_output": music_result.music_path if music_result else "",
+        "music_loop": music_result.loop if music_result else False,
+        "mixed_output": results.get("mixdown") or "",
+        "script_segments": results["template"]["segments"] if script == results["template"]["text"] else [],
+        "tiers": tiers,
+        "degraded": degraded,
+        "timings": outcome["timings"],
     }
-    print("\n--- Meditation Flow Complete ---")
-    print(f"Final output: {json.dumps(final_output, indent=2)}")
+    logger.info("Meditation flow complete")
+    logger.debug(f"Final output: {json.dumps({k: v for k, v in final_output.items() if k != 'coach_response'}, indent=2)}")
 
-    return final_output
\ No newline at end of file
+    return final_output
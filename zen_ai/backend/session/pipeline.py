@@ -0,0 +1,185 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """
+    A single step of a pipeline.
+
+    `func` receives a dict with the results of the stages listed in `deps`
+    and may be a plain function or a coroutine function. Optional stages
+    do not fail the pipeline; their result becomes None and every stage
+    that depends on them is skipped.
+
+    A stage with a `budget` (seconds) is cancelled when it runs longer, or
+    past the graph's deadline. It then, or when it fails, falls back to
+    its `fallbacks`: (tier name, func) pairs with the same signature as
+    `func`, tried in order until one returns without raising. Each
+    fallback is cancelled past the graph's deadline, or without one past
+    the stage's budget. `tier` names the primary path; the tier that
+    produced the result is reported.
+    """
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (), optional: bool = False,
+                 budget: Optional[float] = None, tier: Optional[str] = None,
+                 fallbacks: Sequence[Tuple[str, Callable[[Dict[str, Any]], Any]]] = ()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.optional = optional
+        self.budget = budget
+        self.tier = tier
+        self.fallbacks = list(fallbacks)
+
+class StageSkipped(Exception):
+    """Raised internally when a stage cannot run because a dependency failed."""
+
+StageCallback = Callable[[str, str, Dict[str, Any]], Optional[Awaitable[None]]]
+
+async def _call(func: Callable[[Dict[str, Any]], Any], deps: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+    result = func(deps)
+    if inspect.isawaitable(result):
+        if timeout is None:
+            return await result
+        return await asyncio.wait_for(result, timeout)
+    return result
+
+async def run_stage_graph(stages: List[Stage], on_stage: Optional[StageCallback] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run `stages` as a dependency graph. Every stage starts as soon as all of
+    its dependencies have finished, so independent stages run concurrently.
+    `deadline` (a time.monotonic() value) caps every stage's budget.
+
+    Returns a dict with the stage `results`, per-stage `timings` in
+    milliseconds, the `errors` of optional stages that failed and the
+    `tiers` that produced the result of every stage with a named tier.
+    `on_stage(name, status, info)` is called when a stage starts and ends.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    tiers: Dict[str, str] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    graph_start = time.perf_counter()
+
+    async def notify(name: str, status: str, info: Dict[str, Any]) -> None:
+        if on_stage is None:
+            return
+        outcome = on_stage(name, status, info)
+        if inspect.isawaitable(outcome):
+            await outcome
+
+    async def run(stage: Stage) -> Any:
+        dep_results = {}
+        for dep in stage.deps:
+            try:
+                dep_results[dep] = await tasks[dep]
+            except StageSkipped:
+                raise
+            except Exception:
+                if by_name[dep].optional:
+                    raise StageSkipped(dep)
+                raise
+
+        await notify(stage.name, "started", {})
+        start = time.perf_counter()
+        try:
+            tier, result = await run_tiers(stage, dep_results)
+        except Exception as e:
+            timings[stage.name] = round((time.perf_counter() - start) * 1000, 2)
+            await notify(stage.name, "failed", {"error": str(e), "duration_ms": timings[stage.name]})
+            raise
+        timings[stage.name] = round((time.perf_counter() - start) * 1000, 2)
+        results[stage.name] = result
+        info = {"duration_ms": timings[stage.name]}
+        if tier is not None:
+            tiers[stage.name] = info["tier"] = tier
+        await notify(stage.name, "completed", info)
+        return result
+
+    async def run_tiers(stage: Stage, dep_results: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+        timeout = stage.budget
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if not stage.fallbacks:
+            return stage.tier, await _call(stage.func, dep_results, timeout)
+
+        error: Optional[Exception] = None
+        if timeout is None or timeout > 0:
+            try:
+                return stage.tier, await _call(stage.func, dep_results, timeout)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"over its {timeout:.2f}s budget")
+            except Exception as e:
+                error = e
+        else:
+            error = TimeoutError("no time left before the deadline")
+        for tier, func in stage.fallbacks:
+            logger.warning(f"Stage '{stage.name}' falling back to '{tier}': {error}")
+            # The primary used up the budget; fallbacks get what is left before the deadline
+            timeout = stage.budget if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                return tier, await _call(func, dep_results, timeout)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"'{tier}' over its {timeout:.2f}s limit")
+            except Exception as e:
+                error = e
+        raise error
+
+    # Tasks are created in declaration order; a stage awaiting a dependency
+    # just waits on that dependency's task.
+    for stage in _topological_order(stages):
+        tasks[stage.name] = asyncio.create_task(run(stage), name=f"stage:{stage.name}")
+
+    try:
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    for stage, outcome in zip(tasks.keys(), outcomes):
+        if isinstance(outcome, StageSkipped):
+            if not by_name[stage].optional:
+                raise RuntimeError(f"Required stage '{stage}' skipped: dependency '{outcome.args[0]}' failed")
+            results[stage] = None
+            errors[stage] = f"skipped: dependency '{outcome.args[0]}' failed"
+        elif isinstance(outcome, BaseException):
+            if not by_name[stage].optional:
+                raise outcome
+            logger.warning(f"Optional stage '{stage}' failed: {outcome}")
+            results[stage] = None
+            errors[stage] = str(outcome)
+
+    timings["total"] = round((time.perf_counter() - graph_start) * 1000, 2)
+    return {"results": results, "timings": timings, "errors": errors, "tiers": tiers}
+
+def _topological_order(stages: List[Stage]) -> List[Stage]:
+    by_name = {stage.name: stage for stage in stages}
+    ordered: List[Stage] = []
+    state: Dict[str, int] = {}
+
+    def visit(stage: Stage) -> None:
+        if state.get(stage.name) == 2:
+            return
+        if state.get(stage.name) == 1:
+            raise ValueError(f"Stage graph has a cycle at '{stage.name}'")
+        state[stage.name] = 1
+        for dep in stage.deps:
+            visit(by_name[dep])
+        state[stage.name] = 2
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
@@ -5,9 +5,99 @@ class Settings(BaseSettings):
     Manages application settings and secrets using Pydantic.
     It automatically reads variables from a .env file.
     """
-    AWS_ACCESS_KEY_ID: str
-    AWS_SECRET_ACCESS_KEY: str
-    AWS_REGION: str
+    # Only needed by the bedrock provider, which checks them when its client
+    # is first built, so the app still starts (e.g. on LLM_PROVIDER=fake)
+    # without them.
+    AWS_ACCESS_KEY_ID: str = ""
+    AWS_SECRET_ACCESS_KEY: str = ""
+    AWS_REGION: str = ""
+    BEDROCK_MODEL_ID: str = "anthropic.claude-3-sonnet-20240229-v1:0"
+    # Primary LLM provider: "bedrock", "gemini" or "fake" (local streaming
+    # stand-in, no network), plus comma-separated backups used for hedging
+    # and failover (see utils/llm_router.py).
+    LLM_PROVIDER: str = "bedrock"
+    LLM_BACKUP_PROVIDERS: str = ""
+    LLM_HEDGE_ENABLED: bool = True
+    GOOGLE_API_KEY: str = ""
+    GEMINI_MODEL_ID: str = "gemini-1.5-pro"
+    # Shared LLM client: calls in flight, callers allowed to queue, and how
+    # long a queued caller waits (seconds) before getting a 503.
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUE: int = 32
+    LLM_QUEUE_TIMEOUT: float = 10.0
+    # Generated-script cache. SCRIPT_CACHE_DIR enables the on-disk tier;
+    # SCRIPT_CACHE_VARIETY is how many different scripts to keep per key:
+    # a key only starts hitting after that many LLM calls, so the default
+    # of 1 serves the first script to every repeat request.
+    SCRIPT_CACHE_ENABLED: bool = True
+    SCRIPT_CACHE_MAX_ENTRIES: int = 256
+    SCRIPT_CACHE_TTL: float = 86400
+    SCRIPT_CACHE_DIR: str = ""
+    SCRIPT_CACHE_DISK_TTL: float = 7 * 86400
+    SCRIPT_CACHE_VARIETY: int = 1
+    # Shared outbound HTTP client (timeouts in seconds). Point
+    # ELEVENLABS_API_URL at utils/mock_tts_server.py to test offline.
+    ELEVENLABS_API_URL: str = "https://api.elevenlabs.io/v1"
+    ELEVENLABS_MAX_CONCURRENCY: int = 4
+    # Chunked TTS: synthesize sentence groups of up to TTS_CHUNK_MAX_CHARS
+    # in parallel (TTS_CHUNK_CONCURRENCY at a time) and stitch the MP3s.
+    TTS_CHUNKED: bool = False
+    TTS_CHUNK_MAX_CHARS: int = 400
+    TTS_CHUNK_CONCURRENCY: int = 4
+    # Content-addressed voice clip store (LRU-evicted above the byte limit)
+    VOICE_OUTPUT_DIR: str = "zen_ai/voice_output"
+    AUDIO_STORE_MAX_BYTES: int = 500 * 1024 * 1024
+    # Voice-over-music mixdown: voice is requested from ElevenLabs as raw
+    # PCM at MIX_SAMPLE_RATE and mixed with a bed rendered at the same rate.
+    MIX_OUTPUT_DIR: str = "zen_ai/mix_output"
+    MIX_SAMPLE_RATE: int = 22050
+    # Durable background jobs (POST /meditate/jobs): SQLite queue file,
+    # workers per process, and the lease after which a job whose worker
+    # died is run again (at most JOB_MAX_ATTEMPTS runs in total).
+    JOB_DB_PATH: str = "zen_ai/jobs.sqlite3"
+    JOB_WORKERS: int = 2
+    JOB_LEASE_SECONDS: float = 30.0
+    JOB_MAX_ATTEMPTS: int = 3
+    # Session memory (SQLite, WAL). Appends that arrive while a commit is in
+    # flight are written together, at most MEMORY_BATCH_SIZE per transaction.
+    MEMORY_DB_PATH: str = "zen_ai/memory.sqlite3"
+    MEMORY_BATCH_SIZE: int = 64
+    # Feedback is accepted into a bounded in-memory buffer and written to
+    # SQLite in batches. FEEDBACK_OVERFLOW decides what happens when the
+    # buffer is full: "reject" (503), "drop_oldest" or "block" (wait up to
+    # FEEDBACK_BLOCK_TIMEOUT seconds for room).
+    FEEDBACK_DB_PATH: str = "zen_ai/feedback.sqlite3"
+    FEEDBACK_BUFFER_SIZE: int = 10000
+    FEEDBACK_BATCH_SIZE: int = 500
+    FEEDBACK_FLUSH_INTERVAL: float = 1.0
+    FEEDBACK_OVERFLOW: str = "reject"
+    FEEDBACK_BLOCK_TIMEOUT: float = 2.0
+    # Per-user preferences learned from feedback ratings, snapshotted to
+    # PREFERENCE_SNAPSHOT_PATH every PREFERENCE_SNAPSHOT_INTERVAL seconds.
+    PREFERENCE_SNAPSHOT_PATH: str = "zen_ai/preferences.json"
+    PREFERENCE_SNAPSHOT_INTERVAL: float = 30.0
+    # Voices offered (names, ElevenLabs ids, aliases); edits are picked up
+    # without a restart.
+    VOICE_CATALOG_PATH: str = "zen_ai/backend/voices.json"
+    # Per-request LLM token usage, appended as JSON lines when set
+    TOKEN_USAGE_LOG_PATH: str = ""
+    # End-to-end deadline of a /meditate request (seconds) when the request
+    # does not set one; stages that would overrun it degrade to faster tiers.
+    MEDITATE_DEADLINE: float = 30.0
+    # Reusable script segments for the template (no LLM) script path, and
+    # the voices whose segment audio is synthesized at startup (comma-separated).
+    TEMPLATE_SEGMENTS_PATH: str = "zen_ai/backend/script_segments.json"
+    TEMPLATE_PREWARM_VOICES: str = "Rachel"
+    # Optional JSON file of routing tables replacing those in ROUTING_RULES
+    ROUTING_RULES_FILE: str = ""
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 60.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_BASE: float = 0.5
+    HTTP_BACKOFF_MAX: float = 8.0
 
     # This tells Pydantic where to find the .env file.
     # The path is relative to where the application is run.
@@ -16,3 +106,294 @@ class Settings(BaseSettings):
 # Create a single, reusable instance of the settings object.
 # Other parts of the application will import this object.
 settings = Settings()
+
+# --- Module-level shortcuts used by the agents ---
+AWS_ACCESS_KEY_ID = settings.AWS_ACCESS_KEY_ID
+AWS_SECRET_ACCESS_KEY = settings.AWS_SECRET_ACCESS_KEY
+AWS_REGION = settings.AWS_REGION
+
+LLM_CONFIG = {
+    "provider": settings.LLM_PROVIDER,
+    # Primary first, then backups, without repeats
+    "providers": list(dict.fromkeys(
+        name.strip() for name in [settings.LLM_PROVIDER, *settings.LLM_BACKUP_PROVIDERS.split(",")] if name.strip()
+    )),
+    "model_id": settings.BEDROCK_MODEL_ID,
+    "gemini_model_id": settings.GEMINI_MODEL_ID,
+    "google_api_key": settings.GOOGLE_API_KEY,
+    "model_kwargs": {
+        # Ceiling only: each request's max_tokens comes from its session
+        # length (see PROMPT_CONFIG and utils/prompt_budget.py)
+        "max_tokens": 4096,
+        "temperature": 0.7,
+    },
+    "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+    "max_queue": settings.LLM_MAX_QUEUE,
+    "queue_timeout": settings.LLM_QUEUE_TIMEOUT,
+    # Providers are ranked by EWMA time to first token (seconds) plus
+    # error_penalty x EWMA error rate; every explore_every-th request tries
+    # the runner-up first so its latency stays measured
+    "routing": {
+        "ewma_alpha": 0.2,
+        "error_penalty": 10.0,
+        "explore_every": 20,
+    },
+    # A backup is asked too once the primary is past its p95 first-token
+    # latency over the last `window` requests (default_delay until
+    # min_samples are in, never below min_delay)
+    "hedge": {
+        "enabled": settings.LLM_HEDGE_ENABLED,
+        "percentile": 0.95,
+        "window": 200,
+        "min_samples": 20,
+        "default_delay": 2.0,
+        "min_delay": 0.2,
+    },
+    "fake": {
+        "first_token_delay": 0.3,
+        "token_delay": 0.02,
+    },
+}
+
+PROMPT_CONFIG = {
+    # Session lengths offered (minutes); requests are clamped to the range
+    "default_minutes": 5,
+    "min_minutes": 5,
+    "max_minutes": 15,
+    # Guided meditation pace, pauses included; sets the script's word count
+    "words_per_minute": 80,
+    "words_per_paragraph": 90,
+    # Local token estimates (utils/prompt_budget.py)
+    "chars_per_token": 4.0,
+    "tokens_per_word": 1.35,
+    # max_tokens = target words x tokens_per_word x headroom
+    "completion_headroom": 1.25,
+    "min_completion_tokens": 256,
+    # Per-request usage records kept for /metrics
+    "usage_records": 500,
+    "usage_log_path": settings.TOKEN_USAGE_LOG_PATH,
+}
+
+SCRIPT_CACHE_CONFIG = {
+    "enabled": settings.SCRIPT_CACHE_ENABLED,
+    "max_entries": settings.SCRIPT_CACHE_MAX_ENTRIES,
+    "ttl": settings.SCRIPT_CACHE_TTL,
+    "disk_dir": settings.SCRIPT_CACHE_DIR,
+    "disk_ttl": settings.SCRIPT_CACHE_DISK_TTL,
+    "variety": settings.SCRIPT_CACHE_VARIETY,
+}
+
+AUDIO_STORE_CONFIG = {
+    "voice_dir": settings.VOICE_OUTPUT_DIR,
+    "mix_dir": settings.MIX_OUTPUT_DIR,
+    "max_bytes": settings.AUDIO_STORE_MAX_BYTES,
+}
+
+HTTP_CONFIG = {
+    "max_connections": settings.HTTP_MAX_CONNECTIONS,
+    "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    "keepalive_expiry": settings.HTTP_KEEPALIVE_EXPIRY,
+    "timeout": settings.HTTP_TIMEOUT,
+    "connect_timeout": settings.HTTP_CONNECT_TIMEOUT,
+    "max_retries": settings.HTTP_MAX_RETRIES,
+    "backoff_base": settings.HTTP_BACKOFF_BASE,
+    "backoff_max": settings.HTTP_BACKOFF_MAX,
+    "provider_limits": {
+        "elevenlabs": settings.ELEVENLABS_MAX_CONCURRENCY,
+    },
+}
+
+VOICE_CONFIG = {
+    "default_voice": "Rachel",
+    # See utils/voice_catalog.py
+    "catalog_path": settings.VOICE_CATALOG_PATH,
+    "catalog_cache_size": 1024,
+    "catalog_reload_interval": 5.0,
+    "voices": {
+        "happy": "Rachel",
+        "sad": "Bella",
+        "angry": "Josh",
+        "anxious": "Elli",
+    },
+    "api_url": settings.ELEVENLABS_API_URL,
+    # Bytes per chunk when streaming synthesized audio to disk and clients
+    "stream_chunk_size": 16384,
+    "chunked": settings.TTS_CHUNKED,
+    "chunk_max_chars": settings.TTS_CHUNK_MAX_CHARS,
+    "chunk_concurrency": settings.TTS_CHUNK_CONCURRENCY,
+    # Raw 16-bit mono PCM, used as mixdown input
+    "pcm_format": f"pcm_{settings.MIX_SAMPLE_RATE}",
+}
+
+MUSIC_CONFIG = {
+    "default_style": "instrumental",
+    "styles": {
+        "calm": "instrumental",
+        "instrumental": "instrumental",
+        "nature sounds": "nature sounds",
+        "binaural beats": "binaural beats",
+        "happy": "instrumental",
+        "sad": "nature sounds",
+        "anxious": "nature sounds",
+        "angry": "nature sounds",
+        "tired": "binaural beats",
+    },
+    "default_duration": 300,
+    "sample_rate": 22050,
+    # Per-request renders, used when a style is not in the loop bank
+    "output_dir": "zen_ai/music_output",
+    # Pre-rendered loop bank (see utils/music_bank.py)
+    "bank_dir": "zen_ai/music_bank",
+    "loop_seconds": 60,
+    "loop_crossfade": 2.0,
+}
+
+MIX_CONFIG = {
+    "sample_rate": settings.MIX_SAMPLE_RATE,
+    # Samples per analysis/gain frame (~46 ms at 22.05 kHz)
+    "frame": 1024,
+    # Loudness targets as RMS dBFS: speech (gated), and the music bed between phrases
+    "voice_dbfs": -18.0,
+    "bed_dbfs": -30.0,
+    # Ducking: extra bed attenuation while speech is present
+    "duck_db": -9.0,
+    "gate_dbfs": -45.0,
+    "attack_ms": 60,
+    "release_ms": 600,
+    # Music keeps playing (and fades out) after the last word
+    "tail_seconds": 4.0,
+}
+
+JOB_CONFIG = {
+    "db_path": settings.JOB_DB_PATH,
+    "workers": settings.JOB_WORKERS,
+    "lease_seconds": settings.JOB_LEASE_SECONDS,
+    "max_attempts": settings.JOB_MAX_ATTEMPTS,
+}
+
+MEMORY_CONFIG = {
+    "db_path": settings.MEMORY_DB_PATH,
+    "batch_size": settings.MEMORY_BATCH_SIZE,
+    # The old JSON-lines log; imported once on startup, then renamed to *.imported
+    "legacy_log": "memory_log.json",
+    "page_size": 10,
+}
+
+FEEDBACK_CONFIG = {
+    "db_path": settings.FEEDBACK_DB_PATH,
+    "capacity": settings.FEEDBACK_BUFFER_SIZE,
+    "batch_size": settings.FEEDBACK_BATCH_SIZE,
+    "flush_interval": settings.FEEDBACK_FLUSH_INTERVAL,
+    "overflow": settings.FEEDBACK_OVERFLOW,
+    "block_timeout": settings.FEEDBACK_BLOCK_TIMEOUT,
+}
+
+PREFERENCE_CONFIG = {
+    "snapshot_path": settings.PREFERENCE_SNAPSHOT_PATH,
+    "snapshot_interval": settings.PREFERENCE_SNAPSHOT_INTERVAL,
+    # Scores are (reward sum + prior * prior_weight) / (ratings + prior_weight),
+    # rewards being ratings mapped from 1-5 onto 0-1.
+    "prior": 0.5,
+    "prior_weight": 2.0,
+    # A learned favourite is used only above this score (0.6 ~ a 3.4/5 average)
+    "min_score": 0.6,
+    # Share of lookups that ignore the favourite and use the rule-based
+    # pick, so other options keep getting rated
+    "explore_rate": 0.1,
+    # Generated sessions remembered so that feedback can be attributed
+    "max_sessions": 10000,
+}
+
+DEGRADATION_CONFIG = {
+    "deadline": settings.MEDITATE_DEADLINE,
+    # Each stage's budget as a share of the request deadline; stages are
+    # also cut off at the deadline itself. Past its budget a stage falls
+    # back to a faster tier (see session/meditation_flow.py).
+    "budgets": {
+        "script": 0.5,
+        "voice": 0.6,
+        "music": 0.3,
+        "mixdown": 0.4,
+    },
+    # (mood tags, needs) combinations whose latest script is kept as a fallback
+    "recent_scripts": 256,
+}
+
+TEMPLATE_CONFIG = {
+    # See utils/script_templates.py
+    "library_path": settings.TEMPLATE_SEGMENTS_PATH,
+    "prewarm_voices": [voice.strip() for voice in settings.TEMPLATE_PREWARM_VOICES.split(",") if voice.strip()],
+    # Segment clips synthesized at once while prewarming
+    "prewarm_concurrency": 2,
+}
+
+# Tag-based routing, compiled at startup by utils/rule_engine.py. A rule
+# fires when any of its "when" tags is present; "first" tables return the
+# first firing rule's "then", "all" tables every firing rule's.
+ROUTING_RULES = {
+    # Supporting roles for a session, from mood tags
+    "roles": {
+        "mode": "all",
+        "rules": [
+            {"when": ["anxious", "stressed"], "then": "Calm_Guide"},
+            {"when": ["tired"], "then": "Energy_Coach"},
+            {"when": ["happy"], "then": "Joy_Amplifier"},
+            {"when": ["sad"], "then": "Comfort_Provider"},
+        ],
+        "default": ["General_Zen_Master"],
+    },
+    # Persona of the script writer, from needs and "session:<preferred_session>"
+    "coach_role": {
+        "mode": "first",
+        "rules": [
+            {"when": ["session:visualization"], "then": "Visualization Coach"},
+            {"when": ["focus", "calm"], "then": "Therapist"},
+            {"when": ["energy"], "then": "Motivational Coach"},
+        ],
+        "default": "Meditation Coach",
+    },
+    # Music style when the user did not pick one, from needs
+    "music_style": {
+        "mode": "first",
+        "rules": [
+            {"when": ["focus", "energy"], "then": "binaural beats"},
+            {"when": ["calm", "anxious"], "then": "nature sounds"},
+        ],
+        "default": "instrumental",
+    },
+    # Steps of /generate_plan and /generate_visualization_plan, from needs
+    "plan_steps": {
+        "mode": "all",
+        "rules": [
+            {"when": ["calm"], "then": "Begin with 5 minutes of mindful breathing."},
+            {"when": ["rest"], "then": "Do a 10-minute body scan meditation."},
+            {"when": ["focus"], "then": "Try 5-minute visualization of your goal."},
+        ],
+        "default": [],
+    },
+    "visualization_plan_steps": {
+        "mode": "all",
+        "rules": [
+            {"when": ["calm"], "then": "Begin with 5 minutes of mindful breathing."},
+            {"when": ["rest"], "then": "Do a 10-minute body scan meditation."},
+            {"when": ["focus"], "then": "Try a 5-minute visualization of your goal."},
+        ],
+        "default": ["Take a moment to focus on your breath and the feeling you want to cultivate."],
+    },
+    # Exercise slots of a template script (between intro and closing),
+    # from needs and "session:<preferred_session>"
+    "template_slots": {
+        "mode": "all",
+        "rules": [
+            {"when": ["calm", "session:breathing"], "then": "breathing"},
+            {"when": ["rest"], "then": "body_scan"},
+            {"when": ["focus", "session:visualization"], "then": "visualization"},
+            {"when": ["energy", "session:affirmation"], "then": "affirmation"},
+        ],
+        "default": ["breathing"],
+    },
+}
+
+QUIZ_CONFIG = {
+    "max_questions": 3,
+}
@@ -0,0 +1,202 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# --- Script splitting ---
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+def split_script(text: str, max_chars: int = 400) -> List[str]:
+    """
+    Split a script into chunks of at most `max_chars` characters, cutting at
+    paragraph boundaries first and sentence boundaries second. Sentences are
+    never cut unless a single sentence is longer than `max_chars`.
+    """
+    chunks: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+    return chunks
+
+# --- MP3 frame handling ---
+
+_BITRATES_KBPS = {
+    "mpeg1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "mpeg2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+def mp3_frame_length(data: bytes, offset: int) -> Optional[int]:
+    """Length in bytes of the Layer III frame starting at `offset`, or None if there is no valid header."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES_KBPS["mpeg1" if version == 3 else "mpeg2"][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    coefficient = 144 if version == 3 else 72
+    return coefficient * bitrate // sample_rate + padding
+
+def _skip_id3v2(data: bytes) -> int:
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+def _side_info_length(data: bytes, offset: int) -> int:
+    mpeg1 = (data[offset + 1] >> 3) & 0x03 == 3
+    mono = data[offset + 3] >> 6 == 3
+    return (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+
+def _info_tag_offset(data: bytes, offset: int) -> Optional[int]:
+    """Offset of the "Xing"/"Info" tag if the frame at `offset` is a Xing/Info header frame."""
+    tag = offset + 4 + _side_info_length(data, offset)
+    return tag if data[tag:tag + 4] in (b"Xing", b"Info") else None
+
+def mp3_split(data: bytes) -> Tuple[Optional[bytes], bytes]:
+    """
+    Split an MP3 file into (Xing/Info header frame or None, audio frames).
+    ID3v2/ID3v1 tags are dropped.
+    """
+    start = _skip_id3v2(data)
+    end = len(data) - 128 if len(data) >= 128 and data[-128:-125] == b"TAG" else len(data)
+
+    # Resync on the first valid frame header
+    while start < end and mp3_frame_length(data, start) is None:
+        start += 1
+
+    frame_length = mp3_frame_length(data, start)
+    if frame_length and _info_tag_offset(data, start) is not None:
+        return data[start:start + frame_length], data[start + frame_length:end]
+    return None, data[start:end]
+
+def mp3_frame_count(audio: bytes) -> int:
+    """Number of consecutive frames at the start of `audio` (the audio part of mp3_split)."""
+    count = offset = 0
+    while True:
+        length = mp3_frame_length(audio, offset)
+        if not length:
+            return count
+        count += 1
+        offset += length
+
+# Xing flags: which optional fields follow the tag
+_XING_FRAMES, _XING_BYTES, _XING_TOC, _XING_QUALITY = 0x1, 0x2, 0x4, 0x8
+
+def _xing_fields(frame: bytes) -> Tuple[Dict[str, int], Optional[int]]:
+    """Offsets of the Xing fields present in an Info header frame, and of its LAME tag (None without one)."""
+    position = _info_tag_offset(frame, 0)
+    flags = int.from_bytes(frame[position + 4:position + 8], "big")
+    position += 8
+    fields = {}
+    for flag, name, size in ((_XING_FRAMES, "frames", 4), (_XING_BYTES, "bytes", 4), (_XING_TOC, "toc", 100), (_XING_QUALITY, "quality", 4)):
+        if flags & flag:
+            fields[name] = position
+            position += size
+    # The LAME extension: 9-byte encoder string, then fixed fields up to a CRC at +34
+    lame = position if len(frame) >= position + 36 and frame[position:position + 4] in (b"LAME", b"Lavf", b"Lavc") else None
+    return fields, lame
+
+def lame_delay_padding(frame: bytes) -> Optional[Tuple[int, int]]:
+    """(encoder delay, end padding) in samples from an Info header frame's LAME tag, or None."""
+    _, lame = _xing_fields(frame)
+    if lame is None:
+        return None
+    packed = int.from_bytes(frame[lame + 21:lame + 24], "big")
+    return packed >> 12, packed & 0xFFF
+
+def _crc16(data: bytes) -> int:
+    """CRC-16 as used by the LAME tag (polynomial 0x8005, reflected)."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+class Mp3Joiner:
+    """
+    Joins MP3 pieces encoded with the same settings (e.g. TTS chunks) into
+    one stream under a single Info header frame.
+
+    `add` returns a piece's audio frames without its tags or header frame,
+    so the pieces play back to back. `header` then rebuilds the first
+    piece's header frame for the joined stream: frame and byte counts, a
+    linear seek table, and the LAME tag's encoder delay (the first piece's)
+    and end padding (the last piece's), so gapless-aware players trim the
+    start and end of the whole stream as they would for one file. Each
+    piece's own padding and the next piece's delay stay at the joins (a few
+    ms each); MP3's bit reservoir keeps them from being cut without
+    re-encoding. Without a LAME tag on the first piece `header` is empty.
+    """
+    def __init__(self):
+        self.template: Optional[bytes] = None
+        self.delay = 0
+        self.padding = 0
+        self.frames = 0
+        self.audio_bytes = 0
+        self._first = True
+
+    @property
+    def header_size(self) -> int:
+        """Bytes `header` will return; fixed once the first piece is added."""
+        return len(self.template) if self.template is not None else 0
+
+    def add(self, data: bytes) -> bytes:
+        info, audio = mp3_split(data)
+        gaps = lame_delay_padding(info) if info is not None else None
+        if self._first and gaps is not None:
+            self.template = info
+            self.delay = gaps[0]
+        self._first = False
+        self.padding = gaps[1] if gaps is not None else 0
+        self.frames += mp3_frame_count(audio)
+        self.audio_bytes += len(audio)
+        return audio
+
+    def header(self) -> bytes:
+        if self.template is None:
+            return b""
+        frame = bytearray(self.template)
+        fields, lame = _xing_fields(frame)
+        total_bytes = len(frame) + self.audio_bytes
+        if "frames" in fields:
+            frame[fields["frames"]:fields["frames"] + 4] = self.frames.to_bytes(4, "big")
+        if "bytes" in fields:
+            frame[fields["bytes"]:fields["bytes"] + 4] = total_bytes.to_bytes(4, "big")
+        if "toc" in fields:
+            frame[fields["toc"]:fields["toc"] + 100] = bytes(i * 256 // 100 for i in range(100))
+        frame[lame + 21:lame + 24] = ((min(self.delay, 0xFFF) << 12) | min(self.padding, 0xFFF)).to_bytes(3, "big")
+        # Music length; the music CRC is left as is, decoders do not check it
+        frame[lame + 28:lame + 32] = total_bytes.to_bytes(4, "big")
+        frame[lame + 34:lame + 36] = _crc16(frame[:lame + 34]).to_bytes(2, "big")
+        return bytes(frame)
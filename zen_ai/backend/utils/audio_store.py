@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiofiles
+from zen_ai.backend.settings import AUDIO_STORE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+def make_audio_key(text: str, voice_id: str, model_id: str, voice_settings: dict) -> str:
+    """Content address of a synthesized clip: everything that changes the audio."""
+    payload = json.dumps({
+        "text": text,
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "voice_settings": voice_settings,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AudioStore:
+    """
+    Content-addressed store for synthesized audio under one directory.
+
+    Files are named `<key><suffix>` and written atomically (temporary file +
+    rename). An in-memory LRU index of key -> size is loaded from
+    `index.json` at startup, so lookups never touch the directory. When the
+    total size goes over `max_bytes` the least recently used clips are
+    deleted. Files in the directory that are not named by a key are left
+    alone.
+    """
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ".mp3"):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- Index lifecycle ---
+
+    def load(self) -> None:
+        """Load the index, rebuilding it from the directory once if it is missing or unreadable."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_path = self.directory / INDEX_FILENAME
+        entries = None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Audio store index unreadable, rebuilding: {e}")
+
+        if entries is None:
+            entries = {}
+            files = [p for p in self.directory.glob(f"*{self.suffix}") if _KEY_PATTERN.match(p.stem)]
+            for path in sorted(files, key=lambda p: p.stat().st_mtime):
+                entries[path.stem] = path.stat().st_size
+            self._dirty = True
+
+        self._index = OrderedDict(entries)
+        self._total_bytes = sum(self._index.values())
+        self._evict()
+        logger.info(f"Audio store loaded: {len(self._index)} clips, {self._total_bytes} bytes")
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        index_path = self.directory / INDEX_FILENAME
+        tmp_path = index_path.with_name(f"{INDEX_FILENAME}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, index_path)
+        self._dirty = False
+
+    # --- Lookups and writes ---
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the stored clip for `key` (and mark it recently used), or None."""
+        if key not in self._index:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._index.move_to_end(key)
+        self._dirty = True
+        return self.path_for(key)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether `key` is stored, without counting a lookup or marking it used."""
+        return key in self._index
+
+    def temp_path(self, key: str) -> Path:
+        """A unique temporary path to stream a new clip into before `commit`."""
+        return self.directory / f"{key}.{uuid.uuid4().hex[:8]}.part"
+
+    async def commit(self, key: str, tmp_path: Path) -> Path:
+        """Atomically move a finished temporary file into place and index it."""
+        path = self.path_for(key)
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+        self._total_bytes += size - self._index.get(key, 0)
+        self._index[key] = size
+        self._index.move_to_end(key)
+        self._dirty = True
+        self._evict(keep=key)
+        await asyncio.to_thread(self.save)
+        return path
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = next(iter(self._index.items()))
+            if key == keep:
+                break
+            del self._index[key]
+            self._total_bytes -= size
+            self.evictions += 1
+            self._dirty = True
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+    async def read_chunks(self, key: str, chunk_size: int = 16384) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path_for(key), "rb") as f:
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def stats(self) -> dict:
+        return {
+            "clips": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+def audio_store_specs() -> Dict[str, Tuple[Path, str]]:
+    """Named stores: name -> (directory, file suffix)."""
+    voice_dir = Path(AUDIO_STORE_CONFIG["voice_dir"])
+    return {
+        "voice": (voice_dir, ".mp3"),
+        "voice_pcm": (voice_dir / "pcm", ".pcm"),
+        "mix": (Path(AUDIO_STORE_CONFIG["mix_dir"]), ".wav"),
+    }
+
+_stores: Dict[str, AudioStore] = {}
+
+def get_audio_store(name: str = "voice") -> AudioStore:
+    """Return a shared store by name ("voice", "voice_pcm", "mix"), loading its index on first use."""
+    store = _stores.get(name)
+    if store is None:
+        directory, suffix = audio_store_specs()[name]
+        store = AudioStore(str(directory), AUDIO_STORE_CONFIG["max_bytes"], suffix)
+        store.load()
+        _stores[name] = store
+    return store
+
+def get_voice_store() -> AudioStore:
+    """Return the shared voice clip (MP3) store."""
+    return get_audio_store("voice")
+
+def audio_store_stats() -> dict:
+    return {name: store.stats() for name, store in _stores.items()}
+
+async def init_audio_store() -> None:
+    """Load every store index at startup. Called from the FastAPI lifespan."""
+    for name in audio_store_specs():
+        await asyncio.to_thread(get_audio_store, name)
+
+async def close_audio_store() -> None:
+    for store in list(_stores.values()):
+        await asyncio.to_thread(store.save)
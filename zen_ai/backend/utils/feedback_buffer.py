@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from zen_ai.backend.settings import FEEDBACK_CONFIG
+from zen_ai.backend.utils.sqlite_db import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+# What to do with new feedback when the buffer is full
+OVERFLOW_POLICIES = ("reject", "drop_oldest", "block")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    user_id TEXT,
+    rating INTEGER,
+    comment TEXT NOT NULL DEFAULT '',
+    details TEXT NOT NULL DEFAULT '{}',
+    received_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_session ON feedback (session_id);
+CREATE INDEX IF NOT EXISTS feedback_user_received ON feedback (user_id, received_at);
+"""
+
+_INSERT = (
+    "INSERT INTO feedback (session_id, user_id, rating, comment, details, received_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+def feedback_row(record: dict) -> tuple:
+    details = {k: v for k, v in record.items() if k not in ("session_id", "user_id", "rating", "comment", "received_at")}
+    return (
+        record["session_id"],
+        record.get("user_id"),
+        record.get("rating"),
+        record.get("comment") or "",
+        json.dumps(details),
+        record.get("received_at") or time.time(),
+    )
+
+class FeedbackBuffer:
+    """
+    Bounded in-memory buffer in front of the feedback table.
+
+    `offer` only appends to a deque, so accepting feedback never touches the
+    disk. A background task writes the buffer out in batches of up to
+    `batch_size`, as soon as a batch is full or every `flush_interval`
+    seconds otherwise. When `capacity` records are waiting, `overflow`
+    decides: "reject" refuses the new record, "drop_oldest" evicts the
+    oldest unwritten one, and "block" makes `put` wait (up to
+    `block_timeout`) for the writer to make room. `close` writes out
+    everything still buffered (or spills it to a JSON-lines file next to
+    the database if the write fails).
+    """
+    def __init__(self, db_path: str, capacity: int = 10000, batch_size: int = 500, flush_interval: float = 1.0,
+                 overflow: str = "reject", block_timeout: float = 2.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown feedback overflow policy {overflow!r}; expected one of {OVERFLOW_POLICIES}")
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.db = SQLiteDB(db_path, _SCHEMA)
+        self._buffer: Deque[dict] = deque()
+        self._batch_ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.db.connect)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        # Let the writer drain the buffer rather than cancelling it mid-write.
+        if self._flusher is not None:
+            self._closing = True
+            self._batch_ready.set()
+            await self._flusher
+            self._flusher = None
+        if self._buffer:
+            await asyncio.to_thread(self._spill)
+        self.db.close()
+
+    def _spill(self) -> None:
+        """Last resort when the database refuses writes at shutdown: keep the records as JSON lines."""
+        spill_path = self.db.db_path + ".unwritten.jsonl"
+        with open(spill_path, "a") as f:
+            for record in self._buffer:
+                f.write(json.dumps(record) + "\n")
+        logger.error(f"Could not write {len(self._buffer)} feedback records; saved them to {spill_path}")
+        self._buffer.clear()
+
+    # --- Producer API ---
+
+    def offer(self, record: dict) -> bool:
+        """Buffer one record without waiting. False if it was refused because the buffer is full."""
+        if len(self._buffer) >= self.capacity:
+            if self.overflow != "drop_oldest":
+                self.rejected += 1
+                return False
+            self._buffer.popleft()
+            self.dropped += 1
+        record.setdefault("received_at", time.time())
+        self._buffer.append(record)
+        self.accepted += 1
+        if len(self._buffer) >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def put(self, record: dict) -> bool:
+        """Like `offer`, but with the "block" policy waits for room instead of refusing."""
+        if self.overflow == "block":
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._buffer) >= self.capacity:
+                self._batch_ready.set()
+                self._space.clear()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._space.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        return self.offer(record)
+
+    # --- Writer ---
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            while self._buffer:
+                if not await self._flush():
+                    break
+            if self._closing:
+                return
+
+    async def _flush(self) -> bool:
+        """Write the oldest batch; on failure the records stay buffered for the next attempt."""
+        count = min(len(self._buffer), self.batch_size)
+        batch = [self._buffer[i] for i in range(count)]
+        try:
+            await self.db.aexecutemany(_INSERT, [feedback_row(record) for record in batch])
+        except Exception as e:
+            logger.error(f"Failed to write {count} feedback records: {e}")
+            return False
+        # drop_oldest may have evicted some of these during the write; pop
+        # only what is still at the front.
+        for record in batch:
+            if self._buffer and self._buffer[0] is record:
+                self._buffer.popleft()
+        self.written += count
+        self._space.set()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "accepted": self.accepted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+_feedback_buffer: Optional[FeedbackBuffer] = None
+
+def get_feedback_buffer() -> Optional[FeedbackBuffer]:
+    return _feedback_buffer
+
+async def init_feedback_buffer() -> FeedbackBuffer:
+    """Open the feedback database and start the batch writer. Called from the FastAPI lifespan."""
+    global _feedback_buffer
+    buffer = FeedbackBuffer(
+        FEEDBACK_CONFIG["db_path"],
+        capacity=FEEDBACK_CONFIG["capacity"],
+        batch_size=FEEDBACK_CONFIG["batch_size"],
+        flush_interval=FEEDBACK_CONFIG["flush_interval"],
+        overflow=FEEDBACK_CONFIG["overflow"],
+        block_timeout=FEEDBACK_CONFIG["block_timeout"],
+    )
+    await buffer.start()
+    _feedback_buffer = buffer
+    return buffer
+
+async def close_feedback_buffer() -> None:
+    global _feedback_buffer
+    if _feedback_buffer is not None:
+        await _feedback_buffer.close()
+        _feedback_buffer = None
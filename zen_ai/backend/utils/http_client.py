@@ -0,0 +1,117 @@
+import asyncio
+import importlib.util
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+from zen_ai.backend.settings import HTTP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_http_client: Optional[httpx.AsyncClient] = None
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build the app-wide async HTTP client: pooled keep-alive connections,
+    explicit timeouts and HTTP/2 (`h2`, installed by httpx[http2] in
+    requirements.txt; without it the client falls back to HTTP/1.1).
+    """
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=HTTP_CONFIG["max_connections"],
+            max_keepalive_connections=HTTP_CONFIG["max_keepalive_connections"],
+            keepalive_expiry=HTTP_CONFIG["keepalive_expiry"],
+        ),
+        timeout=httpx.Timeout(HTTP_CONFIG["timeout"], connect=HTTP_CONFIG["connect_timeout"]),
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use (e.g. outside the API)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared client. Called from the FastAPI lifespan."""
+    return get_http_client()
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """Per-provider concurrency limit, sized from HTTP_CONFIG["provider_limits"]."""
+    semaphore = _provider_semaphores.get(provider)
+    if semaphore is None:
+        limit = HTTP_CONFIG["provider_limits"].get(provider, HTTP_CONFIG["max_connections"])
+        semaphore = _provider_semaphores[provider] = asyncio.Semaphore(limit)
+    return semaphore
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), HTTP_CONFIG["backoff_max"])
+    ceiling = min(HTTP_CONFIG["backoff_base"] * (2 ** attempt), HTTP_CONFIG["backoff_max"])
+    return random.uniform(0, ceiling)
+
+async def request_with_retry(method: str, url: str, provider: str, **kwargs) -> httpx.Response:
+    """
+    Send a request through the shared client under the provider's semaphore.
+    429/5xx responses and transport errors are retried up to
+    HTTP_CONFIG["max_retries"] times; the last response or error is returned/raised.
+    """
+    client = get_http_client()
+    max_retries = HTTP_CONFIG["max_retries"]
+    for attempt in range(max_retries + 1):
+        try:
+            async with get_provider_semaphore(provider):
+                response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt == max_retries:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"{provider} request failed ({e!r}), retrying in {delay:.2f}s")
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                return response
+            delay = _backoff_delay(attempt, response)
+            logger.warning(f"{provider} returned {response.status_code}, retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+@asynccontextmanager
+async def stream_with_retry(method: str, url: str, provider: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """
+    Streaming counterpart of request_with_retry. Retries only happen before
+    the response is handed to the caller; the provider slot is held until
+    the stream is closed, but not while backing off between attempts.
+    """
+    client = get_http_client()
+    max_retries = HTTP_CONFIG["max_retries"]
+    for attempt in range(max_retries + 1):
+        handed_out = False
+        try:
+            async with get_provider_semaphore(provider):
+                async with client.stream(method, url, **kwargs) as response:
+                    if response.status_code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                        handed_out = True
+                        yield response
+                        return
+                    delay = _backoff_delay(attempt, response)
+                    logger.warning(f"{provider} returned {response.status_code}, retrying in {delay:.2f}s")
+        except httpx.TransportError as e:
+            if handed_out or attempt == max_retries:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"{provider} request failed ({e!r}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
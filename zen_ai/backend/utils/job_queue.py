@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from zen_ai.backend.settings import JOB_CONFIG
+from zen_ai.backend.utils.sqlite_db import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+# Job states. A job moves queued -> running -> succeeded | failed, and back
+# to queued only if the worker holding it went away (expired lease).
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+StageCallback = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+JobHandler = Callable[[dict, StageCallback], Awaitable[dict]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stages TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+class JobQueue:
+    """
+    Durable job queue in one SQLite file, worked by in-process asyncio workers.
+
+    A worker claims the oldest queued job in a single UPDATE, which stores a
+    lease token unique to that claim, valid until `lease_seconds` from now;
+    the lease is renewed while the job runs. Progress and the final result
+    are written only while the token is still the job's lease owner, so a
+    finished job is never picked up again and a job's result is committed
+    once. Jobs whose worker died (lease expired) go back to the queue, up
+    to `max_attempts` runs in total; a worker that finds its lease gone
+    (e.g. its heartbeats were held up) stops the job at once and commits
+    nothing. Several processes can share the same database file.
+    """
+    def __init__(self, db_path: str, handler: JobHandler, kind: str = "meditation", workers: int = 2,
+                 lease_seconds: float = 30.0, max_attempts: int = 3, poll_interval: float = 1.0):
+        self.db_path = db_path
+        self.handler = handler
+        self.kind = kind
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self.db = SQLiteDB(db_path, _SCHEMA)
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    async def _db(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await self.db.aexecute(sql, params)
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.db.connect)
+        recovered = await self.recover_expired()
+        if recovered:
+            logger.info(f"Requeued {recovered} job(s) left behind by a stopped worker")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.db.close()
+
+    # --- Producer / status API ---
+
+    async def submit(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await self._db(
+            "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, self.kind, QUEUED, json.dumps(payload), now, now),
+        )
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        rows = await self._db("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "stages": json.loads(row["stages"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """Wait until this process updates the job, or `timeout` seconds (other processes are only seen by polling)."""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self, job_id: str) -> None:
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def stats(self) -> dict:
+        rows = await self._db("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status") if self.db.connected else []
+        return {"workers": len(self._tasks), **{row["status"]: row["n"] for row in rows}}
+
+    # --- Claiming and leases ---
+
+    async def recover_expired(self) -> int:
+        now = time.time()
+        failed = await self._db(
+            "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ? RETURNING id",
+            (FAILED, "Worker stopped too many times while running this job", now, RUNNING, now, self.max_attempts),
+        )
+        requeued = await self._db(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires < ? RETURNING id",
+            (QUEUED, now, RUNNING, now),
+        )
+        for row in failed + requeued:
+            self._notify(row["id"])
+        return len(requeued)
+
+    async def _claim(self) -> Optional[sqlite3.Row]:
+        """Claim the oldest queued job; the row has its id, payload and this claim's lease token."""
+        now = time.time()
+        # Unique per claim: workers of one process must not share a lease
+        lease = f"{self.owner}:{uuid.uuid4().hex}"
+        rows = await self._db(
+            "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE status = ? AND kind = ? ORDER BY created_at LIMIT 1) AND status = ? "
+            "RETURNING id, payload, lease_owner",
+            (RUNNING, lease, now + self.lease_seconds, now, QUEUED, self.kind, QUEUED),
+        )
+        return rows[0] if rows else None
+
+    async def _owned_update(self, job_id: str, lease: str, assignments: str, params: tuple) -> bool:
+        """Apply an UPDATE only while `lease` is still the job's lease owner."""
+        rows = await self._db(
+            f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ? RETURNING id",
+            params + (time.time(), job_id, lease, RUNNING),
+        )
+        self._notify(job_id)
+        return bool(rows)
+
+    async def _heartbeat(self, job_id: str, lease: str, job: asyncio.Task) -> None:
+        """Renew the lease while the job runs; cancel the job as soon as the lease is lost."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await self._owned_update(job_id, lease, "lease_expires = ?", (time.time() + self.lease_seconds,)):
+                logger.warning(f"Lost the lease on job {job_id}, stopping it")
+                job.cancel()
+                return
+
+    # --- Workers ---
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                await self.recover_expired()
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Job worker {index} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job["id"], job["lease_owner"], json.loads(job["payload"]))
+
+    async def _run(self, job_id: str, lease: str, payload: dict) -> None:
+        stages: Dict[str, dict] = {}
+
+        async def on_stage(name: str, status: str, info: Dict[str, Any]) -> None:
+            stages[name] = {"status": status, **info}
+            await self._owned_update(job_id, lease, "stages = ?", (json.dumps(stages),))
+
+        job = asyncio.ensure_future(self.handler(payload, on_stage))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, lease, job))
+        try:
+            # wait() rather than await: the job being cancelled for a lost
+            # lease must not look like this worker being cancelled.
+            await asyncio.wait({job})
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back instead of waiting for the lease to expire.
+            heartbeat.cancel()
+            job.cancel()
+            await asyncio.shield(self._owned_update(job_id, lease, "status = ?, lease_owner = NULL", (QUEUED,)))
+            raise
+        finally:
+            heartbeat.cancel()
+
+        if job.cancelled():
+            return
+        error = job.exception()
+        if error is not None:
+            logger.error(f"Job {job_id} failed: {error}", exc_info=error)
+            committed = await self._owned_update(job_id, lease, "status = ?, error = ?, lease_owner = NULL", (FAILED, str(error) or type(error).__name__))
+        else:
+            committed = await self._owned_update(job_id, lease, "status = ?, result = ?, lease_owner = NULL", (SUCCEEDED, json.dumps(job.result())))
+        if not committed:
+            logger.warning(f"Job {job_id} finished after losing its lease; its outcome was discarded")
+
+_job_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> Optional[JobQueue]:
+    return _job_queue
+
+async def init_job_queue(handler: JobHandler) -> JobQueue:
+    """Open the queue database and start the workers. Called from the FastAPI lifespan."""
+    global _job_queue
+    queue = JobQueue(
+        JOB_CONFIG["db_path"],
+        handler,
+        workers=JOB_CONFIG["workers"],
+        lease_seconds=JOB_CONFIG["lease_seconds"],
+        max_attempts=JOB_CONFIG["max_attempts"],
+    )
+    await queue.start()
+    _job_queue = queue
+    return queue
+
+async def close_job_queue() -> None:
+    global _job_queue
+    if _job_queue is not None:
+        await _job_queue.close()
+        _job_queue = None
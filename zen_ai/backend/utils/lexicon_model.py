@@ -0,0 +1,103 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?,;:]")
+_SUFFIXES = ("ness", "ing", "ful", "ed", "ly", "es", "s")
+_VOWELS = frozenset("aeiou")
+# Words that flip the meaning of what follows ("not tired", "can't focus")
+_NEGATORS = frozenset({"not", "no", "never", "nor", "without", "don't", "doesn't", "didn't", "isn't",
+                       "wasn't", "aren't", "can't", "cannot", "won't", "hardly"})
+NEGATION_SCOPE = 3
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Strip one common English suffix, keeping at least four letters
+    ("stressed" -> "stress", "stress" stays), then turn a final consonant
+    + "y" into "i". Keywords and text go through the same rules, so
+    "worry", "worried" and "worrying" all become "worri", and "happy" and
+    "happiness" both become "happi".
+    """
+    for suffix in _SUFFIXES:
+        if suffix == "s" and word.endswith("ss"):
+            continue  # "stress" keeps its "ss"
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    if len(word) >= 4 and word.endswith("y") and word[-2] not in _VOWELS:
+        word = word[:-1] + "i"
+    return word
+
+def features(text: str) -> List[str]:
+    """
+    Stemmed unigrams and bigrams of `text`. Words within NEGATION_SCOPE
+    words after a negator (up to the next punctuation) get a "!" prefix,
+    so "not tired" never matches "tired".
+    """
+    out: List[str] = []
+    previous = None
+    negated = 0
+    for token in _TOKEN_RE.findall(text.lower()):
+        if not token[0].isalpha():
+            previous, negated = None, 0
+            continue
+        if token in _NEGATORS:
+            previous, negated = None, NEGATION_SCOPE
+            continue
+        word = stem(token)
+        if negated:
+            word = "!" + word
+            negated -= 1
+        out.append(word)
+        if previous is not None:
+            out.append(f"{previous} {word}")
+        previous = word
+    return out
+
+class LexiconModel:
+    """
+    Multi-label tagger compiled from keyword lexicons.
+
+    `lexicons` is {group: {label: [keyword, ...]}}; keywords may be one or
+    two words. Every stemmed keyword becomes a row of a (features, labels)
+    weight matrix. A text is scored by summing the rows of the features it
+    contains, so a batch of texts is one gather plus one segmented sum
+    (`np.add.reduceat`) in NumPy; a label applies when its score is > 0.
+    Row 0 is all zeros and stands for every out-of-vocabulary feature.
+    """
+    def __init__(self, lexicons: Dict[str, Dict[str, List[str]]]):
+        self.groups = list(lexicons)
+        self.labels: List[str] = []
+        self.group_slices: Dict[str, slice] = {}
+        self.vocabulary: Dict[str, int] = {}
+        entries = []
+        for group, table in lexicons.items():
+            start = len(self.labels)
+            for label, keywords in table.items():
+                column = len(self.labels)
+                self.labels.append(label)
+                for keyword in keywords:
+                    feature = " ".join(stem(word) for word in keyword.lower().split())
+                    row = self.vocabulary.setdefault(feature, len(self.vocabulary) + 1)
+                    entries.append((row, column))
+            self.group_slices[group] = slice(start, len(self.labels))
+        self.weights = np.zeros((len(self.vocabulary) + 1, len(self.labels)), dtype=np.float32)
+        for row, column in entries:
+            self.weights[row, column] = 1.0
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), labels) keyword-hit counts."""
+        vocabulary = self.vocabulary
+        rows: List[int] = []
+        offsets = np.empty(len(texts), dtype=np.intp)
+        for i, text in enumerate(texts):
+            offsets[i] = len(rows)
+            # Leading 0 keeps every segment non-empty, which reduceat needs
+            rows.append(0)
+            rows.extend(vocabulary.get(feature, 0) for feature in features(text))
+        if not texts:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.add.reduceat(self.weights[np.asarray(rows, dtype=np.intp)], offsets, axis=0)
@@ -0,0 +1,186 @@
+import asyncio
+import concurrent.futures
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_SENTINEL = object()
+
+class LLMOverloadedError(Exception):
+    """Raised when the LLM client has too many requests queued to accept another one."""
+
+class LLMClient:
+    """
+    Process-wide wrapper around one blocking Bedrock runtime client.
+
+    The boto3 client is created once and shared. Every call runs on a
+    dedicated, bounded thread pool so the event loop never blocks.
+    `max_concurrency` caps in-flight calls. At most `max_queue` callers may
+    wait for a slot; beyond that, or after waiting `queue_timeout` seconds,
+    callers get LLMOverloadedError so the API can shed load.
+    """
+    def __init__(self, client_factory: Callable[[], Any], max_concurrency: int = 8, max_queue: int = 32, queue_timeout: float = 10.0):
+        self._client_factory = client_factory
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._client = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock = asyncio.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self.started:
+                return
+            executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+            loop = asyncio.get_running_loop()
+            try:
+                # Building a boto3 client is itself slow (credential and endpoint resolution).
+                client = await loop.run_in_executor(executor, self._client_factory)
+            except Exception:
+                executor.shutdown(wait=False)
+                raise
+            self._executor = executor
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._client = client
+        logger.info(f"LLM client started (max_concurrency={self.max_concurrency}, max_queue={self.max_queue})")
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._client = None
+        self._executor = None
+        self._semaphore = None
+
+    async def _acquire(self) -> asyncio.Semaphore:
+        """Take a slot; returns the semaphore to hand back to _release (it survives a close())."""
+        if not self.started:
+            await self.start()
+        semaphore = self._semaphore
+        if semaphore.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError("Too many LLM requests queued")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LLMOverloadedError("Timed out waiting for an LLM slot")
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        return semaphore
+
+    def _release(self, semaphore: asyncio.Semaphore) -> None:
+        self._in_flight -= 1
+        semaphore.release()
+
+    async def _run(self, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def invoke_model(self, **kwargs) -> bytes:
+        """Run `invoke_model` and return the raw response body."""
+        semaphore = await self._acquire()
+        try:
+            def call():
+                response = self._client.invoke_model(**kwargs)
+                return response.get("body").read()
+            return await self._run(call)
+        finally:
+            self._release(semaphore)
+
+    async def stream_model(self, **kwargs) -> AsyncIterator[dict]:
+        """
+        Run `invoke_model_with_response_stream` and yield its events.
+        The concurrency slot is held until the stream is exhausted or closed.
+        Closing it early (or cancelling a read) closes the Bedrock event
+        stream, so the model stops generating, and hands the slot back only
+        once the worker thread reading it has returned.
+        """
+        semaphore = await self._acquire()
+        # Submitted directly, not via _run: cancelling the awaiting task must
+        # not lose track of a call still running in its worker thread.
+        call = self._executor.submit(self._client.invoke_model_with_response_stream, **kwargs)
+        pending = call
+        exhausted = False
+        try:
+            events = iter((await asyncio.wrap_future(call)).get("body"))
+            while True:
+                pending = self._executor.submit(next, events, _SENTINEL)
+                event = await asyncio.wrap_future(pending)
+                if event is _SENTINEL:
+                    exhausted = True
+                    break
+                yield event
+        finally:
+            try:
+                if not exhausted:
+                    await asyncio.shield(asyncio.to_thread(_close_stream, call, pending))
+            except Exception as e:
+                logger.warning(f"Could not close an LLM response stream: {e}")
+            finally:
+                self._release(semaphore)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "rejected": self.rejected,
+        }
+
+def _close_stream(call: concurrent.futures.Future, pending: concurrent.futures.Future) -> None:
+    """Close the event stream `call` returned, then wait for `pending`, a read of it that closing unblocks."""
+    try:
+        body = call.result().get("body")
+    except (Exception, concurrent.futures.CancelledError):
+        return  # The call never ran or failed: there is no stream
+    close = getattr(body, "close", None)
+    if close is not None:
+        close()
+    concurrent.futures.wait([pending])
+
+_llm_client: Optional[LLMClient] = None
+
+def get_llm_client() -> LLMClient:
+    """Return the shared LLM client, creating it on first use (e.g. outside the API)."""
+    global _llm_client
+    if _llm_client is None:
+        from zen_ai.backend.agents.multi_role_agent import get_bedrock_client
+        from zen_ai.backend.settings import LLM_CONFIG
+        _llm_client = LLMClient(
+            get_bedrock_client,
+            max_concurrency=LLM_CONFIG["max_concurrency"],
+            max_queue=LLM_CONFIG["max_queue"],
+            queue_timeout=LLM_CONFIG["queue_timeout"],
+        )
+    return _llm_client
+
+async def init_llm_client() -> LLMClient:
+    """
+    Create and start the shared client. Called from the FastAPI lifespan.
+    A failed start is logged, not raised; the first request retries it.
+    """
+    client = get_llm_client()
+    try:
+        await client.start()
+    except Exception as e:
+        logger.error(f"Could not start LLM client: {e}")
+    return client
+
+async def close_llm_client() -> None:
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.close()
+        _llm_client = None
@@ -0,0 +1,174 @@
+import asyncio
+import importlib
+import json
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+from zen_ai.backend.utils.llm_client import get_llm_client
+
+# A canned script streamed by FakeProvider. Each sentence is emitted word by
+# word so the streaming path behaves like a real model.
+FAKE_SCRIPT = (
+    "Welcome. Find a comfortable position and let your eyes gently close. "
+    "Take a slow breath in through your nose, and let it out softly through your mouth.\n\n"
+    "Notice how you are feeling right now, without judging it. "
+    "With every breath out, let a little of that weight leave your shoulders. "
+    "Breathe in calm, breathe out tension.\n\n"
+    "Bring your attention to the space around your heart. "
+    "Imagine a warm light there, growing a little brighter with each breath.\n\n"
+    "When you are ready, slowly return to the room, carrying this calm with you."
+)
+
+class LLMProvider(ABC):
+    """
+    One LLM backend. `stream` yields the completion as text deltas; every
+    provider takes the same (system prompt, user prompt, max_tokens,
+    temperature) request, so the router can send it to any of them. When
+    given a `usage` dict, it fills in the "input_tokens" / "output_tokens"
+    the backend reports.
+    """
+    name = "provider"
+    model_id = ""
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def stream(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        ...
+
+def build_anthropic_body(system_prompt: str, user_prompt: str, max_tokens: int, temperature: float) -> str:
+    """Serialize an Anthropic messages request for Bedrock."""
+    return json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "system": system_prompt,
+        "messages": [
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": user_prompt}]
+            }
+        ]
+    })
+
+class BedrockProvider(LLMProvider):
+    """Anthropic models on Bedrock, through the shared bounded client (utils/llm_client.py)."""
+    name = "bedrock"
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+
+    async def start(self) -> None:
+        await get_llm_client().start()
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        events = get_llm_client().stream_model(
+            body=build_anthropic_body(system_prompt, user_prompt, max_tokens, temperature),
+            modelId=self.model_id,
+            accept='application/json',
+            contentType='application/json'
+        )
+        try:
+            async for event in events:
+                chunk = event.get("chunk")
+                if not chunk:
+                    continue
+                payload = json.loads(chunk.get("bytes"))
+                kind = payload.get("type")
+                if kind == "content_block_delta":
+                    text = payload.get("delta", {}).get("text", "")
+                    if text:
+                        yield text
+                elif usage is not None and kind == "message_start":
+                    usage.update(payload.get("message", {}).get("usage", {}))
+                elif usage is not None and kind == "message_delta":
+                    usage.update(payload.get("usage", {}))
+        finally:
+            # Closed now rather than whenever it is garbage collected: this stops the model
+            await events.aclose()
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini through google-generativeai, imported on first use so the
+    package is only needed when Gemini is configured.
+    """
+    name = "gemini"
+
+    def __init__(self, model_id: str, api_key: str, max_concurrency: int = 8):
+        self.model_id = model_id
+        self.api_key = api_key
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._genai = None
+
+    async def start(self) -> None:
+        if self._genai is not None:
+            return
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY must be set to use Gemini.")
+        # Imported in a worker thread: the SDK is slow to load
+        genai = await asyncio.to_thread(importlib.import_module, "google.generativeai")
+        genai.configure(api_key=self.api_key)
+        self._genai = genai
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        await self.start()
+        genai = self._genai
+        model = genai.GenerativeModel(self.model_id, system_instruction=system_prompt)
+        config = genai.types.GenerationConfig(max_output_tokens=max_tokens, temperature=temperature)
+        async with self._semaphore:
+            response = await model.generate_content_async(user_prompt, generation_config=config, stream=True)
+            try:
+                async for chunk in response:
+                    text = chunk.text
+                    if text:
+                        yield text
+                    metadata = getattr(chunk, "usage_metadata", None)
+                    if usage is not None and metadata is not None:
+                        usage["input_tokens"] = metadata.prompt_token_count
+                        usage["output_tokens"] = metadata.candidates_token_count
+            finally:
+                # A stream left unread stops when its response is garbage
+                # collected (the SDK has no public close); drop it before
+                # the slot is released.
+                del response
+
+class FakeProvider(LLMProvider):
+    """
+    Local stand-in: streams a canned script word by word after
+    `first_token_delay` seconds, `token_delay` seconds apart. No network.
+    """
+    name = "fake"
+    model_id = "fake"
+
+    def __init__(self, script: str = FAKE_SCRIPT, first_token_delay: float = 0.3, token_delay: float = 0.02, name: str = "fake"):
+        self.name = name
+        self.script = script
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_delay)
+        tokens = re.findall(r"\S+\s*", self.script)[:max_tokens]
+        if usage is not None:
+            usage["input_tokens"] = len(f"{system_prompt} {user_prompt}".split())
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield token
+        if usage is not None:
+            usage["output_tokens"] = len(tokens)
+
+def make_provider(name: str, config: dict) -> LLMProvider:
+    """Build the provider called `name` ("bedrock", "gemini" or "fake") from LLM_CONFIG."""
+    if name == "bedrock":
+        return BedrockProvider(config["model_id"])
+    if name == "gemini":
+        return GeminiProvider(config["gemini_model_id"], config["google_api_key"], config["max_concurrency"])
+    if name == "fake":
+        return FakeProvider(**config["fake"])
+    raise ValueError(f"Unknown LLM provider {name!r}")
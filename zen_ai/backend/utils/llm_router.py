@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+from zen_ai.backend.utils.llm_providers import LLMProvider, make_provider
+
+logger = logging.getLogger(__name__)
+
+class ProviderStats:
+    """Per-provider latency and error tracking: EWMAs for routing, a window of first-token times for the hedge delay."""
+    def __init__(self, window: int, alpha: float):
+        self.alpha = alpha
+        self.first_token: deque = deque(maxlen=window)
+        self.first_token_ewma: Optional[float] = None
+        self.total_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        return value if current is None else current + self.alpha * (value - current)
+
+    def record_first_token(self, seconds: float) -> None:
+        self.first_token.append(seconds)
+        self.first_token_ewma = self._ewma(self.first_token_ewma, seconds)
+        self.error_ewma = self._ewma(self.error_ewma, 0.0)
+
+    def record_total(self, seconds: float) -> None:
+        self.total_ewma = self._ewma(self.total_ewma, seconds)
+
+    def record_error(self) -> None:
+        self.errors += 1
+        self.error_ewma = self._ewma(self.error_ewma, 1.0)
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.first_token)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class _Attempt:
+    """One provider's stream in a hedged request, with the task fetching its first chunk."""
+    def __init__(self, provider: LLMProvider, stream: AsyncIterator[str], usage: dict):
+        self.provider = provider
+        self.stream = stream
+        self.usage = usage
+        self.started = time.monotonic()
+        self.first = asyncio.ensure_future(stream.__anext__())
+
+    async def discard(self) -> None:
+        self.first.cancel()
+        try:
+            await self.first
+        except BaseException:
+            pass
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+
+class LLMRouter:
+    """
+    Sends each request to the provider that currently answers fastest, with
+    hedging and failover across the others.
+
+    Providers are ranked by their EWMA time to first token plus
+    `error_penalty` seconds times their EWMA error rate; providers not seen
+    yet count as `hedge["default_delay"]`, and ties keep the configured
+    order. Every `explore_every`-th request goes to the runner-up instead,
+    so a provider that fell behind gets measured again. If the chosen provider has produced no token after its
+    `hedge["percentile"]` first-token latency (over the last
+    `hedge["window"]` requests; `default_delay` until `min_samples` are in),
+    the next provider is asked too and whichever answers first is streamed;
+    the other request is cancelled. A provider failing before its first
+    token is replaced by the next one at once. Errors after the first
+    token are raised, since the text already sent cannot be taken back.
+    """
+    def __init__(self, providers: List[LLMProvider], hedge: dict, ewma_alpha: float = 0.2, error_penalty: float = 10.0, explore_every: int = 20):
+        if not providers:
+            raise ValueError("At least one LLM provider is required.")
+        self.providers = providers
+        self.hedge = hedge
+        self.error_penalty = error_penalty
+        self.explore_every = explore_every
+        self._requests = 0
+        self._stats: Dict[str, ProviderStats] = {p.name: ProviderStats(hedge["window"], ewma_alpha) for p in providers}
+        self._discards: set = set()
+
+    async def start(self) -> None:
+        for provider in self.providers:
+            try:
+                await provider.start()
+            except Exception as e:
+                # Not fatal: the provider is retried (and ranked down) when requests fail.
+                logger.error(f"Could not start LLM provider {provider.name}: {e}")
+
+    async def close(self) -> None:
+        for task in list(self._discards):
+            task.cancel()
+        for provider in self.providers:
+            await provider.close()
+
+    # --- Routing ---
+
+    def score(self, provider: LLMProvider) -> float:
+        stats = self._stats[provider.name]
+        latency = stats.first_token_ewma if stats.first_token_ewma is not None else self.hedge["default_delay"]
+        return latency + self.error_penalty * stats.error_ewma
+
+    def ranked(self) -> List[LLMProvider]:
+        return sorted(self.providers, key=self.score)
+
+    def route(self) -> List[LLMProvider]:
+        """The providers to try for the next request, in order."""
+        self._requests += 1
+        order = self.ranked()
+        if self.explore_every and len(order) > 1 and self._requests % self.explore_every == 0:
+            order[0], order[1] = order[1], order[0]
+        return order
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        stats = self._stats[provider.name]
+        if len(stats.first_token) < self.hedge["min_samples"]:
+            return self.hedge["default_delay"]
+        return max(self.hedge["min_delay"], stats.percentile(self.hedge["percentile"]))
+
+    # --- Requests ---
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Yield the completion as text deltas from whichever provider answers
+        first. A `usage` dict is filled in with the winning provider's
+        reported token counts, its name and its latencies.
+        """
+        candidates = self.route()
+        attempts: List[_Attempt] = []
+        hedged = False
+        error: Optional[BaseException] = None
+
+        def launch() -> None:
+            provider = candidates.pop(0)
+            self._stats[provider.name].requests += 1
+            attempt_usage: dict = {}
+            attempts.append(_Attempt(provider, provider.stream(system_prompt, user_prompt, max_tokens, temperature, attempt_usage), attempt_usage))
+
+        launch()
+        winner: Optional[_Attempt] = None
+        first_text = ""
+        try:
+            while winner is None:
+                timeout = None
+                if self.hedge["enabled"] and not hedged and candidates:
+                    timeout = max(0.0, attempts[0].started + self.hedge_delay(attempts[0].provider) - time.monotonic())
+                done, _ = await asyncio.wait([a.first for a in attempts], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self._stats[attempts[0].provider.name].hedges += 1
+                    logger.info(f"LLM {attempts[0].provider.name} slow to first token, hedging with {candidates[0].name}")
+                    launch()
+                    continue
+                for attempt in [a for a in attempts if a.first in done]:
+                    exception = attempt.first.exception()
+                    if exception is None:
+                        winner, first_text = attempt, attempt.first.result()
+                        break
+                    if isinstance(exception, StopAsyncIteration):
+                        exception = ValueError(f"LLM {attempt.provider.name} returned an empty response.")
+                    logger.warning(f"LLM {attempt.provider.name} failed before its first token: {exception}")
+                    self._stats[attempt.provider.name].record_error()
+                    attempts.remove(attempt)
+                    error = exception
+                if winner is None and not attempts:
+                    if not candidates:
+                        raise error
+                    launch()
+        finally:
+            for attempt in attempts:
+                if attempt is not winner:
+                    if winner is not None and not attempt.first.done():
+                        # Still waiting for its first token: it took at least this long
+                        self._stats[attempt.provider.name].record_first_token(time.monotonic() - attempt.started)
+                    task = asyncio.ensure_future(attempt.discard())
+                    self._discards.add(task)
+                    task.add_done_callback(self._discards.discard)
+
+        stats = self._stats[winner.provider.name]
+        stats.wins += 1
+        first_token = time.monotonic() - winner.started
+        stats.record_first_token(first_token)
+        try:
+            yield first_text
+            async for text in winner.stream:
+                yield text
+        except Exception:
+            stats.record_error()
+            raise
+        finally:
+            await winner.stream.aclose()
+        total = time.monotonic() - winner.started
+        stats.record_total(total)
+        if usage is not None:
+            usage.update(winner.usage, provider=winner.provider.name, model_id=winner.provider.model_id, hedged=hedged, first_token_s=round(first_token, 4), total_s=round(total, 4))
+
+    async def complete(self, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float, usage: Optional[dict] = None) -> str:
+        parts = [text async for text in self.stream(system_prompt, user_prompt, max_tokens, temperature, usage)]
+        return "".join(parts).strip()
+
+    def stats(self) -> dict:
+        providers = {}
+        for provider in self.providers:
+            stats = self._stats[provider.name]
+            providers[provider.name] = {
+                "model_id": provider.model_id,
+                "score": round(self.score(provider), 4),
+                "first_token_ewma": round(stats.first_token_ewma, 4) if stats.first_token_ewma is not None else None,
+                "total_ewma": round(stats.total_ewma, 4) if stats.total_ewma is not None else None,
+                "error_ewma": round(stats.error_ewma, 4),
+                "hedge_delay": round(self.hedge_delay(provider), 4),
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "hedges": stats.hedges,
+                "wins": stats.wins,
+            }
+        return {"order": [p.name for p in self.ranked()], "providers": providers}
+
+_llm_router: Optional[LLMRouter] = None
+
+def get_llm_router() -> LLMRouter:
+    """Return the shared router over LLM_CONFIG["providers"], creating it on first use."""
+    global _llm_router
+    if _llm_router is None:
+        from zen_ai.backend.settings import LLM_CONFIG
+        _llm_router = LLMRouter(
+            [make_provider(name, LLM_CONFIG) for name in LLM_CONFIG["providers"]],
+            LLM_CONFIG["hedge"],
+            ewma_alpha=LLM_CONFIG["routing"]["ewma_alpha"],
+            error_penalty=LLM_CONFIG["routing"]["error_penalty"],
+            explore_every=LLM_CONFIG["routing"]["explore_every"],
+        )
+    return _llm_router
+
+async def init_llm_router() -> LLMRouter:
+    """Create the router and start its providers. Called from the FastAPI lifespan."""
+    router = get_llm_router()
+    await router.start()
+    return router
+
+async def close_llm_router() -> None:
+    global _llm_router
+    if _llm_router is not None:
+        await _llm_router.close()
+        _llm_router = None
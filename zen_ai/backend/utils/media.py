@@ -0,0 +1,79 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from zen_ai.backend.settings import MUSIC_CONFIG
+from zen_ai.backend.utils.audio_store import audio_store_specs
+
+# Every served file name is unique to its content (store key, bank
+# fingerprint or per-render uuid), so a URL never changes meaning.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav"}
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+def media_roots() -> Dict[str, Tuple[Path, str]]:
+    """URL kind -> (directory, file suffix) for everything under /media."""
+    stores = audio_store_specs()
+    return {
+        "voice": stores["voice"],
+        "mix": stores["mix"],
+        "music": (Path(MUSIC_CONFIG["bank_dir"]), ".wav"),
+        "tracks": (Path(MUSIC_CONFIG["output_dir"]), ".wav"),
+    }
+
+def media_url(file_path: str) -> str:
+    """The /media URL for a generated file, or "" if it is not servable."""
+    if not file_path:
+        return ""
+    path = Path(file_path)
+    for kind, (directory, suffix) in media_roots().items():
+        if path.suffix == suffix and path.parent.resolve() == directory.resolve():
+            return f"/media/{kind}/{path.name}"
+    return ""
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def media_response(request: Request, kind: str, filename: str) -> Response:
+    """
+    Serve one generated file. Answers conditional requests (If-None-Match /
+    If-Modified-Since) with 304, and leaves byte ranges (Range / If-Range,
+    206 / 416) and the transfer itself to FileResponse, which uses the
+    server's zero-copy `http.response.pathsend` when it offers one.
+    """
+    root = media_roots().get(kind)
+    if root is None or not _SAFE_NAME.match(filename):
+        raise HTTPException(status_code=404, detail="Not found")
+    directory, suffix = root
+    path = directory / filename
+    if path.suffix != suffix:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    etag = f'"{path.stem}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=MEDIA_TYPES[suffix], headers=headers, stat_result=stat_result)
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from zen_ai.backend.settings import MEMORY_CONFIG
+from zen_ai.backend.utils.sqlite_db import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER = "anonymous"
+
+# `memories` holds every entry; `sessions` is a per-(user, session) summary
+# kept up to date by the same transaction, so "latest sessions for a user"
+# is an index range scan instead of a GROUP BY over all of the user's rows.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memories_user_session ON memories (user_id, session_id, created_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    last_at REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    PRIMARY KEY (user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_user_last ON sessions (user_id, last_at DESC, session_id DESC);
+"""
+
+_INSERT_MEMORY = "INSERT INTO memories (user_id, session_id, created_at, entry) VALUES (?, ?, ?, ?)"
+_UPSERT_SESSION = (
+    "INSERT INTO sessions (user_id, session_id, started_at, last_at, entries) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, session_id) DO UPDATE SET "
+    "started_at = MIN(started_at, excluded.started_at), last_at = MAX(last_at, excluded.last_at), "
+    "entries = entries + excluded.entries"
+)
+
+def _entry_time(entry: dict) -> float:
+    value = entry.get("timestamp")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+def _row_for(entry: dict) -> Tuple[str, str, float, str]:
+    # Entries without a session id are sessions of their own.
+    user_id = str(entry.get("user_id") or DEFAULT_USER)
+    session_id = str(entry.get("session_id") or uuid.uuid4().hex)
+    return user_id, session_id, _entry_time(entry), json.dumps(entry)
+
+def encode_cursor(last_at: float, session_id: str) -> str:
+    return f"{last_at!r}|{session_id}"
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    last_at, _, session_id = cursor.partition("|")
+    return float(last_at), session_id
+
+class MemoryStore:
+    """
+    Session memory in one SQLite file (WAL), indexed by user, session and time.
+
+    `append` queues the entry and returns once it is committed. A single
+    writer task commits whatever has queued up since the last commit, up to
+    `batch_size` entries, in one transaction — so a burst of appends costs
+    one fsync instead of one each. Reads use their own connection in a
+    worker thread and, thanks to WAL, never wait for the writer.
+    """
+    def __init__(self, db_path: str, batch_size: int = 64):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        # Separate connections, so a read never queues behind a commit.
+        self.db = SQLiteDB(db_path, _SCHEMA)
+        self.reader = SQLiteDB(db_path)
+        self._pending: List[Tuple[tuple, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+        self.written = 0
+        self.batches = 0
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.db.connect)
+        await asyncio.to_thread(self.reader.connect)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self) -> None:
+        # Let the writer drain what is queued rather than cancelling it mid-commit.
+        if self._writer is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._writer
+            self._writer = None
+        self.reader.close()
+        self.db.close()
+
+    # --- Writes ---
+
+    async def append(self, entry: dict) -> None:
+        await self.append_many([entry])
+
+    async def append_many(self, entries: List[dict]) -> None:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for entry in entries:
+            future = loop.create_future()
+            self._pending.append((_row_for(entry), future))
+            futures.append(future)
+        self._wakeup.set()
+        await asyncio.gather(*futures)
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                await self._flush()
+            if self._closing:
+                return
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        sessions: Dict[Tuple[str, str], List] = {}
+        for (user_id, session_id, created_at, _), _future in batch:
+            summary = sessions.setdefault((user_id, session_id), [created_at, created_at, 0])
+            summary[0] = min(summary[0], created_at)
+            summary[1] = max(summary[1], created_at)
+            summary[2] += 1
+        statements = [(_INSERT_MEMORY, row) for row, _future in batch]
+        statements += [(_UPSERT_SESSION, key + tuple(summary)) for key, summary in sessions.items()]
+        try:
+            await self.db.atransaction(statements)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} memory entries: {e}")
+            for _row, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.written += len(batch)
+        self.batches += 1
+        for _row, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    # --- Reads ---
+
+    async def recent_sessions(self, user_id: str, limit: int = 10, cursor: Optional[str] = None) -> dict:
+        """
+        The user's sessions, most recently active first, each with its entries
+        in time order. Pass the returned `next_cursor` to get the next page.
+        """
+        if cursor:
+            last_at, session_id = decode_cursor(cursor)
+            rows = await self.reader.aexecute(
+                "SELECT * FROM sessions WHERE user_id = ? AND (last_at < ? OR (last_at = ? AND session_id < ?)) "
+                "ORDER BY last_at DESC, session_id DESC LIMIT ?",
+                (user_id, last_at, last_at, session_id, limit + 1),
+            )
+        else:
+            rows = await self.reader.aexecute(
+                "SELECT * FROM sessions WHERE user_id = ? ORDER BY last_at DESC, session_id DESC LIMIT ?",
+                (user_id, limit + 1),
+            )
+        page, more = rows[:limit], len(rows) > limit
+        entries = await self._entries_for(user_id, [row["session_id"] for row in page])
+        return {
+            "sessions": [
+                {
+                    "session_id": row["session_id"],
+                    "started_at": row["started_at"],
+                    "last_at": row["last_at"],
+                    "entries": entries.get(row["session_id"], []),
+                }
+                for row in page
+            ],
+            "next_cursor": encode_cursor(page[-1]["last_at"], page[-1]["session_id"]) if more else None,
+        }
+
+    async def session_entries(self, user_id: str, session_id: str) -> List[dict]:
+        return (await self._entries_for(user_id, [session_id])).get(session_id, [])
+
+    async def _entries_for(self, user_id: str, session_ids: List[str]) -> Dict[str, List[dict]]:
+        if not session_ids:
+            return {}
+        placeholders = ", ".join("?" * len(session_ids))
+        rows = await self.reader.aexecute(
+            f"SELECT session_id, entry FROM memories WHERE user_id = ? AND session_id IN ({placeholders}) "
+            "ORDER BY created_at, id",
+            (user_id, *session_ids),
+        )
+        entries: Dict[str, List[dict]] = {}
+        for row in rows:
+            entries.setdefault(row["session_id"], []).append(json.loads(row["entry"]))
+        return entries
+
+    # --- Migration ---
+
+    async def import_jsonl(self, path: str) -> int:
+        """Load a legacy one-JSON-object-per-line memory log, then rename it so it is imported once."""
+        log_path = Path(path)
+        if not log_path.exists():
+            return 0
+        entries = []
+        with open(log_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+        await self.append_many(entries)
+        log_path.rename(log_path.with_name(log_path.name + ".imported"))
+        return len(entries)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "written": self.written, "batches": self.batches}
+
+_memory_store: Optional[MemoryStore] = None
+
+def get_memory_store() -> Optional[MemoryStore]:
+    return _memory_store
+
+async def init_memory_store() -> MemoryStore:
+    """Open the memory database and start its writer. Called from the FastAPI lifespan."""
+    global _memory_store
+    store = MemoryStore(MEMORY_CONFIG["db_path"], batch_size=MEMORY_CONFIG["batch_size"])
+    await store.start()
+    try:
+        imported = await store.import_jsonl(MEMORY_CONFIG["legacy_log"])
+        if imported:
+            logger.info(f"Imported {imported} entries from {MEMORY_CONFIG['legacy_log']}")
+    except Exception as e:
+        logger.error(f"Could not import {MEMORY_CONFIG['legacy_log']}: {e}")
+    _memory_store = store
+    return store
+
+async def close_memory_store() -> None:
+    global _memory_store
+    if _memory_store is not None:
+        await _memory_store.close()
+        _memory_store = None
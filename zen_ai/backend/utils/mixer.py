@@ -0,0 +1,141 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from zen_ai.backend.settings import MIX_CONFIG
+from zen_ai.backend.utils.music_synth import (
+    CHANNELS, STYLE_PRESETS, encode_pcm16, render_blocks, resolve_style, style_rms_dbfs, wav_header,
+)
+
+# Raw PCM from ElevenLabs: 16-bit little-endian mono
+PCM_SAMPLE_WIDTH = 2
+
+def db_to_gain(db: float) -> float:
+    return float(10 ** (db / 20))
+
+def make_mix_key(voice_key: str, style: str) -> str:
+    """Content address of a mixdown: the voice clip, the bed preset and the mix settings."""
+    style = resolve_style(style)
+    payload = json.dumps({
+        "voice_key": voice_key,
+        "style": style,
+        "preset": STYLE_PRESETS[style],
+        "mix": MIX_CONFIG,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def pcm16_frames(path: Path) -> int:
+    return Path(path).stat().st_size // PCM_SAMPLE_WIDTH
+
+def read_pcm16(path: Path, frames: int) -> Iterator[np.ndarray]:
+    """Read a raw PCM16 mono file as float32 arrays of `frames` samples (the last one may be shorter)."""
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(frames * PCM_SAMPLE_WIDTH)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % PCM_SAMPLE_WIDTH]
+            yield np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+
+def _frame_rms_dbfs(samples: np.ndarray, frame: int) -> np.ndarray:
+    """RMS dBFS of each `frame`-sized slice (zero-padded at the end)."""
+    padded = np.zeros(-(-len(samples) // frame) * frame, dtype=np.float32)
+    padded[:len(samples)] = samples
+    rms = np.sqrt(np.mean(np.square(padded.reshape(-1, frame)), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-9))
+
+def speech_loudness_dbfs(path: Path, frame: int, gate_dbfs: float) -> float:
+    """
+    Gated RMS loudness of a PCM16 speech file: frames below `gate_dbfs`
+    (pauses between phrases) are ignored. One streaming pass.
+    """
+    energy, count = 0.0, 0
+    for samples in read_pcm16(path, frame * 64):
+        levels = _frame_rms_dbfs(samples, frame)
+        voiced = levels > gate_dbfs
+        energy += float(np.sum(10 ** (levels[voiced] / 10)))
+        count += int(np.count_nonzero(voiced))
+    return 10 * np.log10(energy / count) if count else gate_dbfs
+
+class Ducker:
+    """
+    Sidechain gain for the music bed, computed per frame from the voice
+    level with separate attack/release smoothing, and ramped linearly
+    within each frame so gain changes never click. State carries over
+    between blocks.
+    """
+    def __init__(self, sample_rate: int, frame: int, duck_db: float, gate_dbfs: float, attack_ms: float, release_ms: float):
+        self.frame = frame
+        self.ducked = db_to_gain(duck_db)
+        self.gate_dbfs = gate_dbfs
+        frame_ms = 1000 * frame / sample_rate
+        self.attack = float(np.exp(-frame_ms / attack_ms))
+        self.release = float(np.exp(-frame_ms / release_ms))
+        self.gain = 1.0
+        self._ramp = np.arange(1, frame + 1, dtype=np.float32) / frame
+
+    def process(self, voice: np.ndarray) -> np.ndarray:
+        """Per-sample bed gain for a block of voice samples."""
+        levels = _frame_rms_dbfs(voice, self.frame)
+        gains = np.empty(len(levels) + 1, dtype=np.float32)
+        gains[0] = gain = self.gain
+        for i, level in enumerate(levels):
+            target = self.ducked if level > self.gate_dbfs else 1.0
+            coefficient = self.attack if target < gain else self.release
+            gain = target + (gain - target) * coefficient
+            gains[i + 1] = gain
+        self.gain = gain
+        ramps = gains[:-1, None] + (gains[1:] - gains[:-1])[:, None] * self._ramp
+        return ramps.reshape(-1)[:len(voice)]
+
+def soft_limit(block: np.ndarray, knee: float = 0.9) -> np.ndarray:
+    """Leave samples below `knee` alone and bend anything above it smoothly under 1.0."""
+    over = np.abs(block) > knee
+    if over.any():
+        x = block[over]
+        block[over] = np.sign(x) * (knee + (1 - knee) * np.tanh((np.abs(x) - knee) / (1 - knee)))
+    return block
+
+def mix_blocks(voice_path: Path, style: str, sample_rate: int = None) -> Iterator[np.ndarray]:
+    """
+    Mix a PCM16 mono voice track over a procedurally rendered music bed of
+    the same length (plus MIX_CONFIG["tail_seconds"]). Yields stereo float32
+    blocks; memory use does not depend on the session length.
+
+    Levels: speech is normalized to MIX_CONFIG["voice_dbfs"] (gated RMS),
+    the bed to MIX_CONFIG["bed_dbfs"] and ducked by MIX_CONFIG["duck_db"]
+    under speech, and the sum goes through a soft limiter.
+    """
+    config = MIX_CONFIG
+    sample_rate = sample_rate or config["sample_rate"]
+    frame = config["frame"]
+
+    voice_level = speech_loudness_dbfs(voice_path, frame, config["gate_dbfs"])
+    # Never boost near-silence by more than 20 dB
+    voice_gain = db_to_gain(min(config["voice_dbfs"] - voice_level, 20.0))
+    bed_gain = db_to_gain(config["bed_dbfs"] - style_rms_dbfs(style, sample_rate))
+    ducker = Ducker(sample_rate, frame, config["duck_db"], config["gate_dbfs"], config["attack_ms"], config["release_ms"])
+
+    total_frames = pcm16_frames(voice_path) + int(config["tail_seconds"] * sample_rate)
+    with open(voice_path, "rb") as f:
+        for bed in render_blocks(style, total_frames / sample_rate, sample_rate):
+            n = bed.shape[1]
+            # Exactly n voice samples per block, silence after the voice ends
+            data = f.read(n * PCM_SAMPLE_WIDTH)
+            voice = np.zeros(n, dtype=np.float32)
+            count = len(data) // PCM_SAMPLE_WIDTH
+            voice[:count] = np.frombuffer(data, dtype="<i2", count=count) * np.float32(voice_gain / 32768)
+
+            block = bed * (bed_gain * ducker.process(voice))
+            block += voice
+            yield soft_limit(block)
+
+def stream_mix_wav(voice_path: Path, style: str, sample_rate: int = None) -> Iterator[bytes]:
+    """The mixdown as encoded WAV chunks: header first, then one chunk per block."""
+    sample_rate = sample_rate or MIX_CONFIG["sample_rate"]
+    total_frames = pcm16_frames(voice_path) + int(MIX_CONFIG["tail_seconds"] * sample_rate)
+    yield wav_header(total_frames, sample_rate, CHANNELS)
+    for block in mix_blocks(voice_path, style, sample_rate):
+        yield encode_pcm16(block)
@@ -0,0 +1,74 @@
+"""
+Local stand-in for the ElevenLabs text-to-speech API.
+
+Run it with:
+    uvicorn zen_ai.backend.utils.mock_tts_server:app --port 8055
+and point the backend at it:
+    ELEVENLABS_API_URL=http://127.0.0.1:8055/v1
+
+MOCK_TTS_LATENCY (seconds) adds a delay per request and MOCK_TTS_FAILURE_RATE
+(0-1) makes a share of requests answer 429/503, to exercise the retry path.
+`?output_format=pcm_<rate>` returns raw 16-bit mono PCM with a speech-like
+envelope (tones for words, silence at sentence ends) instead of MP3.
+"""
+import asyncio
+import os
+import random
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI, Header
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, ~26 ms of audio.
+SILENT_MP3_FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+# Roughly how many frames of speech one character of text produces.
+FRAMES_PER_CHAR = 2
+
+app = FastAPI(title="Mock TTS")
+
+class TTSRequest(BaseModel):
+    text: str
+    model_id: str = "eleven_monolingual_v1"
+    voice_settings: dict = {}
+
+# Seconds of audio per character, and the pause after sentence-ending punctuation
+SECONDS_PER_CHAR = 0.06
+SENTENCE_PAUSE = 0.5
+
+# Encoder delay and end padding (samples) the fake encoder reports, like LAME's
+ENCODER_DELAY = 576
+ENCODER_PADDING = 1000
+
+def info_frame(frames: int) -> bytes:
+    """A LAME-style Info header frame for `frames` silent frames (CBR, with delay and padding)."""
+    tag = b"Info" + (0x0F).to_bytes(4, "big") + frames.to_bytes(4, "big")
+    tag += ((frames + 1) * len(SILENT_MP3_FRAME)).to_bytes(4, "big") + bytes(i * 256 // 100 for i in range(100)) + bytes(4)
+    lame = bytearray(b"LAME3.100" + bytes(27))
+    lame[21:24] = ((ENCODER_DELAY << 12) | ENCODER_PADDING).to_bytes(3, "big")
+    frame = SILENT_MP3_FRAME[:4] + bytes(32) + tag + bytes(lame)
+    return frame + bytes(len(SILENT_MP3_FRAME) - len(frame))
+
+def fake_speech(text: str) -> bytes:
+    frames = max(1, len(text) * FRAMES_PER_CHAR)
+    return info_frame(frames) + SILENT_MP3_FRAME * frames
+
+def fake_speech_pcm(text: str, sample_rate: int) -> bytes:
+    per_char = int(SECONDS_PER_CHAR * sample_rate)
+    lengths = [int(SENTENCE_PAUSE * sample_rate) if c in ".!?" else per_char for c in text] or [per_char]
+    voiced = np.repeat([c not in ".!? " for c in text] or [False], lengths)
+    t = np.arange(len(voiced)) / sample_rate
+    tone = np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t)
+    syllables = np.abs(np.sin(2 * np.pi * 4 * t))
+    return (0.3 * tone * syllables * voiced * 32767).astype("<i2").tobytes()
+
+@app.post("/v1/text-to-speech/{voice_id}")
+async def text_to_speech(voice_id: str, request: TTSRequest, output_format: Optional[str] = None, xi_api_key: str = Header(default="")):
+    await asyncio.sleep(float(os.getenv("MOCK_TTS_LATENCY", "0.05")))
+    if random.random() < float(os.getenv("MOCK_TTS_FAILURE_RATE", "0")):
+        return Response(status_code=random.choice([429, 503]), headers={"Retry-After": "0"})
+    if output_format and output_format.startswith("pcm_"):
+        sample_rate = int(output_format.split("_")[1])
+        return Response(content=fake_speech_pcm(request.text, sample_rate), media_type="audio/pcm")
+    return Response(content=fake_speech(request.text), media_type="audio/mpeg")
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from zen_ai.backend.settings import MUSIC_CONFIG
+from zen_ai.backend.utils.music_synth import (
+    CHANNELS, STYLE_PRESETS, encode_pcm16, render_loop, wav_header,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+
+def _dbfs(value: float) -> float:
+    return round(20 * np.log10(max(value, 1e-9)), 2)
+
+class MusicBank:
+    """
+    Seamless background loops, one per canonical music style, rendered once
+    into `directory` and described by `manifest.json`:
+
+        {"<style>": {"file", "fingerprint", "sample_rate", "channels",
+                     "duration", "loop_start", "loop_end",
+                     "rms_dbfs", "peak_dbfs", "bytes"}}
+
+    `loop_start` / `loop_end` are in seconds. The fingerprint covers the
+    synth preset and render settings, so changing either re-renders that
+    style on the next build; it is also part of the file name, so a file
+    never changes once written. Lookups are a dict access.
+    """
+    def __init__(self, directory: str, sample_rate: int, loop_seconds: float, crossfade: float):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.loop_seconds = loop_seconds
+        self.crossfade = crossfade
+        self._assets: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, style: str) -> str:
+        payload = json.dumps({
+            "preset": STYLE_PRESETS[style],
+            "sample_rate": self.sample_rate,
+            "loop_seconds": self.loop_seconds,
+            "crossfade": self.crossfade,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    # --- Manifest lifecycle ---
+
+    def load(self) -> None:
+        """Load the manifest, keeping only assets that exist and match the current settings."""
+        try:
+            with open(self.directory / MANIFEST_FILENAME, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Music bank manifest unreadable, ignoring: {e}")
+            entries = {}
+
+        self._assets = {
+            style: entry for style, entry in entries.items()
+            if style in STYLE_PRESETS
+            and entry.get("fingerprint") == self.fingerprint(style)
+            and (self.directory / entry["file"]).exists()
+        }
+        logger.info(f"Music bank loaded: {sorted(self._assets)}")
+
+    def save(self) -> None:
+        manifest_path = self.directory / MANIFEST_FILENAME
+        tmp_path = manifest_path.with_name(f"{MANIFEST_FILENAME}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._assets, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+    def build(self, styles: Optional[List[str]] = None, force: bool = False) -> List[str]:
+        """Render every missing or outdated loop and rewrite the manifest. Returns the styles rendered."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        built = []
+        for style in styles or sorted(STYLE_PRESETS):
+            if not force and style in self._assets:
+                continue
+            self._assets[style] = self._render(style)
+            built.append(style)
+            logger.info(f"Music bank rendered '{style}'")
+        if built:
+            self.save()
+        return built
+
+    def _render(self, style: str) -> dict:
+        audio = render_loop(style, self.loop_seconds, self.crossfade, self.sample_rate, seed=0)
+        frames = audio.shape[1]
+        # The fingerprint in the name makes every rendering a new, immutable URL.
+        slug = style.replace(" ", "_")
+        fingerprint = self.fingerprint(style)
+        filename = f"{slug}-{fingerprint}.wav"
+        path = self.directory / filename
+        tmp_path = path.with_name(f"{filename}.{uuid.uuid4().hex[:8]}.part")
+        with open(tmp_path, "wb") as f:
+            f.write(wav_header(frames, self.sample_rate))
+            f.write(encode_pcm16(audio))
+        os.replace(tmp_path, path)
+        for stale in self.directory.glob(f"{slug}-*.wav"):
+            if stale != path:
+                stale.unlink()
+        return {
+            "file": filename,
+            "fingerprint": fingerprint,
+            "sample_rate": self.sample_rate,
+            "channels": CHANNELS,
+            "duration": frames / self.sample_rate,
+            "loop_start": 0.0,
+            "loop_end": frames / self.sample_rate,
+            "rms_dbfs": _dbfs(float(np.sqrt(np.mean(np.square(audio))))),
+            "peak_dbfs": _dbfs(float(np.max(np.abs(audio)))),
+            "bytes": path.stat().st_size,
+        }
+
+    # --- Lookups ---
+
+    def get(self, style: str) -> Optional[dict]:
+        """The manifest entry for `style` plus its absolute `path`, or None if it is not in the bank."""
+        entry = self._assets.get(style)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {**entry, "path": str(self.directory / entry["file"])}
+
+    def stats(self) -> dict:
+        return {
+            "styles": sorted(self._assets),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+_music_bank: Optional[MusicBank] = None
+
+def get_music_bank() -> MusicBank:
+    """Return the shared loop bank, loading its manifest on first use (never renders)."""
+    global _music_bank
+    if _music_bank is None:
+        bank = MusicBank(
+            MUSIC_CONFIG["bank_dir"],
+            MUSIC_CONFIG["sample_rate"],
+            MUSIC_CONFIG["loop_seconds"],
+            MUSIC_CONFIG["loop_crossfade"],
+        )
+        bank.load()
+        _music_bank = bank
+    return _music_bank
+
+async def init_music_bank() -> None:
+    """Load the bank and render any missing loops at startup. Called from the FastAPI lifespan."""
+    def load_and_build() -> None:
+        get_music_bank().build()
+
+    try:
+        await asyncio.to_thread(load_and_build)
+    except Exception as e:
+        # Not fatal: generate_music falls back to rendering per request.
+        logger.error(f"Music bank build failed: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render the background music loop bank.")
+    parser.add_argument("--force", action="store_true", help="re-render loops that are already up to date")
+    parser.add_argument("styles", nargs="*", help=f"styles to render (default: all of {sorted(STYLE_PRESETS)})")
+    args = parser.parse_args()
+    unknown = set(args.styles) - set(STYLE_PRESETS)
+    if unknown:
+        parser.error(f"unknown styles: {sorted(unknown)}")
+
+    logging.basicConfig(level=logging.INFO)
+    bank = get_music_bank()
+    built = bank.build(args.styles or None, force=args.force)
+    print(f"Rendered: {built or 'nothing, bank is up to date'}")
+    print(json.dumps(bank._assets, indent=2, sort_keys=True))
@@ -0,0 +1,190 @@
+import struct
+from functools import lru_cache
+from typing import Iterator, Optional
+
+import numpy as np
+
+# Render settings: 22.05 kHz stereo is plenty for ambient beds and keeps files small.
+SAMPLE_RATE = 22050
+CHANNELS = 2
+BLOCK_SECONDS = 2.0
+FADE_SECONDS = 3.0
+# Leaky-integrator rows: short enough that a ** -ROW_LENGTH stays well inside float range.
+ROW_LENGTH = 1024
+
+# Per-style synthesis parameters.
+STYLE_PRESETS = {
+    "binaural beats": {
+        "carrier_hz": 200.0,
+        "beat_hz": 6.0,        # theta range, relaxed focus
+        "noise_level": 0.06,
+        "tone_level": 0.30,
+    },
+    "nature sounds": {
+        "leak": 0.995,         # brown-noise integrator, sounds like surf / wind
+        "swell_hz": (0.07, 0.113),
+        "noise_level": 0.22,
+    },
+    "instrumental": {
+        "partials_hz": (110.0, 164.81, 220.0, 261.63, 329.63),
+        "detune_hz": 0.35,
+        "lfo_hz": 0.05,
+        "tone_level": 0.12,
+        "noise_level": 0.02,
+    },
+}
+DEFAULT_STYLE = "instrumental"
+
+class _OscillatorBank:
+    """
+    A bank of sine oscillators rendered block by block without calling sin()
+    per sample: sin/cos tables for one block are computed once, and each
+    block is those tables rotated to the block's absolute start phase
+    (sin(a + b) = sin(a)cos(b) + cos(a)sin(b)).
+    """
+    def __init__(self, freqs_hz, block_frames: int, sample_rate: int, phases=0.0):
+        self.omega = 2 * np.pi * np.asarray(freqs_hz, dtype=np.float64)[:, None] / sample_rate
+        self.phases = np.broadcast_to(np.asarray(phases, dtype=np.float64), (len(self.omega),))[:, None]
+        angle = self.omega * np.arange(block_frames)
+        self.sin_table = np.sin(angle).astype(np.float32)
+        self.cos_table = np.cos(angle).astype(np.float32)
+
+    def render(self, start: int, frames: int) -> np.ndarray:
+        phase = self.omega * start + self.phases
+        out = self.sin_table[:, :frames] * np.cos(phase).astype(np.float32)
+        out += self.cos_table[:, :frames] * np.sin(phase).astype(np.float32)
+        return out
+
+class _BrownNoise:
+    """
+    Stateful, vectorized leaky integrator over white noise:
+        y[n] = leak * y[n-1] + x[n]
+    Evaluated in closed form per row of ROW_LENGTH samples; only the row end
+    values are carried in a Python loop.
+    """
+    def __init__(self, leak: float, rng: np.random.Generator):
+        self.leak = leak
+        self.rng = rng
+        self.state = np.zeros(CHANNELS, dtype=np.float32)
+        k = np.arange(ROW_LENGTH, dtype=np.float64)
+        self._up = (leak ** k).astype(np.float32)               # leak^k
+        self._down = (leak ** -k).astype(np.float32)            # leak^-k
+        self._carry = (leak ** (k + 1)).astype(np.float32)      # weight of the previous row's last value
+        self._row_carry = np.float32(leak ** ROW_LENGTH)
+        # Uniform noise in [-0.5, 0.5) has variance 1/12; normalize the output to unit RMS.
+        self._gain = np.float32(np.sqrt(12 * (1 - leak ** 2)))
+
+    def render(self, frames: int) -> np.ndarray:
+        rows = -(-frames // ROW_LENGTH)
+        white = self.rng.random((CHANNELS, rows, ROW_LENGTH), dtype=np.float32) - np.float32(0.5)
+        white[:, :, :] *= self._down
+        local = np.cumsum(white, axis=2, out=white)
+        local *= self._up
+        # Value entering each row: only row ends need the sequential pass.
+        entering = np.empty((CHANNELS, rows), dtype=np.float32)
+        state = self.state
+        for r in range(rows):
+            entering[:, r] = state
+            state = self._row_carry * state + local[:, r, -1]
+        local += entering[:, :, None] * self._carry
+        out = local.reshape(CHANNELS, -1)[:, :frames]
+        # Padding past `frames` is discarded, so carry the state from the last real sample.
+        self.state = out[:, -1].copy()
+        return out * self._gain
+
+def resolve_style(style: str) -> str:
+    style = (style or "").lower()
+    return style if style in STYLE_PRESETS else DEFAULT_STYLE
+
+def render_blocks(style: str, duration: float, sample_rate: int = SAMPLE_RATE, seed: Optional[int] = None, fade: bool = True) -> Iterator[np.ndarray]:
+    """
+    Yield the track as float32 arrays of shape (CHANNELS, frames), one block
+    of BLOCK_SECONDS at a time. Oscillators and noise state run on absolute
+    sample positions, so blocks join without clicks, and only one block is
+    ever held in memory. `fade=False` skips the fade in/out (used for loops).
+    """
+    style = resolve_style(style)
+    preset = STYLE_PRESETS[style]
+    rng = np.random.default_rng(seed)
+    total_frames = int(round(duration * sample_rate))
+    block_frames = int(BLOCK_SECONDS * sample_rate)
+    fade_frames = min(int(FADE_SECONDS * sample_rate), total_frames // 2)
+    brown = _BrownNoise(preset.get("leak", 0.99), rng)
+
+    if style == "binaural beats":
+        carrier = preset["carrier_hz"]
+        tones = _OscillatorBank([carrier, carrier + preset["beat_hz"]], block_frames, sample_rate)
+    elif style == "nature sounds":
+        swells = _OscillatorBank(preset["swell_hz"], block_frames, sample_rate, phases=(0.0, 1.3))
+    else:
+        partials = np.asarray(preset["partials_hz"])
+        # Left partials, then slightly detuned right partials for a slow chorus shimmer.
+        tones = _OscillatorBank(np.concatenate([partials, partials + preset["detune_hz"]]), block_frames, sample_rate)
+        lfos = _OscillatorBank([preset["lfo_hz"]] * len(partials), block_frames, sample_rate, phases=np.arange(len(partials)))
+
+    for start in range(0, total_frames, block_frames):
+        frames = min(block_frames, total_frames - start)
+
+        if style == "binaural beats":
+            block = preset["tone_level"] * tones.render(start, frames)
+            block += preset["noise_level"] * brown.render(frames)
+        elif style == "nature sounds":
+            slow, slower = swells.render(start, frames)
+            swell = 0.6 + 0.25 * slow + 0.15 * slower
+            block = preset["noise_level"] * brown.render(frames) * swell
+        else:
+            sines = tones.render(start, frames)
+            lfo = 0.5 + 0.5 * lfos.render(start, frames)
+            sines *= np.concatenate([lfo, lfo])
+            block = preset["tone_level"] * sines.reshape(CHANNELS, len(partials), frames).sum(axis=1)
+            block += preset["noise_level"] * brown.render(frames)
+
+        # Fade in / fade out on absolute positions
+        if fade and (start < fade_frames or start + frames > total_frames - fade_frames):
+            position = np.arange(start, start + frames, dtype=np.float32)
+            envelope = np.minimum(position, total_frames - position) / max(fade_frames, 1)
+            block *= np.clip(envelope, 0.0, 1.0)
+
+        yield np.clip(block, -1.0, 1.0, out=block)
+
+def render_loop(style: str, seconds: float, crossfade: float = 2.0, sample_rate: int = SAMPLE_RATE, seed: Optional[int] = None) -> np.ndarray:
+    """
+    Render a seamless loop of `seconds` as one (CHANNELS, frames) array.
+    `crossfade` extra seconds are rendered past the loop end and blended
+    (equal power) into the head, so the last sample flows into the first.
+    """
+    loop_frames = int(round(seconds * sample_rate))
+    fade_frames = min(int(round(crossfade * sample_rate)), loop_frames)
+    blocks = render_blocks(style, (loop_frames + fade_frames) / sample_rate, sample_rate, seed, fade=False)
+    audio = np.concatenate(list(blocks), axis=1)
+    ramp = np.linspace(0, np.pi / 2, fade_frames, dtype=np.float32)
+    head = audio[:, :fade_frames]
+    tail = audio[:, loop_frames:loop_frames + fade_frames]
+    audio[:, :fade_frames] = head * np.sin(ramp) + tail * np.cos(ramp)
+    return np.clip(audio[:, :loop_frames], -1.0, 1.0)
+
+@lru_cache(maxsize=None)
+def style_rms_dbfs(style: str, sample_rate: int = SAMPLE_RATE) -> float:
+    """Nominal loudness of a style (RMS dBFS of a 10 s render), for level matching."""
+    audio = np.concatenate(list(render_blocks(style, 10.0, sample_rate, seed=0, fade=False)), axis=1)
+    return float(20 * np.log10(max(np.sqrt(np.mean(np.square(audio))), 1e-9)))
+
+def wav_header(total_frames: int, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> bytes:
+    """44-byte PCM16 WAV header for a stream whose length is known up front."""
+    data_size = total_frames * channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_size,
+    )
+
+def encode_pcm16(block: np.ndarray) -> bytes:
+    """Interleave a (channels, frames) float block into little-endian PCM16 bytes."""
+    return (block.T * 32767).astype("<i2").tobytes()
+
+def stream_wav(style: str, duration: float, sample_rate: int = SAMPLE_RATE, seed: Optional[int] = None) -> Iterator[bytes]:
+    """Yield a complete WAV file as encoded chunks: the header, then one chunk per block."""
+    yield wav_header(int(round(duration * sample_rate)), sample_rate)
+    for block in render_blocks(style, duration, sample_rate, seed):
+        yield encode_pcm16(block)
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from zen_ai.backend.settings import PREFERENCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# What a session's feedback teaches us about
+DIMENSIONS = ("voice", "music_style", "role")
+
+def rating_reward(rating: int) -> float:
+    """Map a 1-5 rating onto 0-1."""
+    return (min(max(rating, 1), 5) - 1) / 4
+
+class PreferenceModel:
+    """
+    Per-user running statistics over the voice, music style and coach role of
+    rated sessions.
+
+    For every (user, dimension, option) it keeps [ratings, reward sum], and
+    for every (user, dimension) the current favourite. A rating updates the
+    few options the session used and re-picks the favourite among the
+    options that user has rated (a handful), so both updates and lookups
+    cost the same however long the history is. Scores are shrunk towards a
+    neutral prior, `(sum + prior * w) / (n + w)`, so one lucky rating does
+    not outrank a consistently good option; a favourite is only returned
+    once its score clears `min_score`, and a share `explore_rate` of
+    lookups return None anyway, so the caller's default gets rated again
+    and an early favourite does not stick forever.
+
+    Sessions are remembered (bounded LRU) when they are generated; a rating
+    is attributed to the user recorded for its session, never to one the
+    request claims, and each session can be rated once. The
+    statistics are snapshotted to a JSON file every `snapshot_interval`
+    seconds when they changed, and on close.
+    """
+    def __init__(self, snapshot_path: str, prior: float = 0.5, prior_weight: float = 2.0, min_score: float = 0.6,
+                 explore_rate: float = 0.1, max_sessions: int = 10000, snapshot_interval: float = 30.0):
+        self.snapshot_path = Path(snapshot_path)
+        self.prior = prior
+        self.prior_weight = prior_weight
+        self.min_score = min_score
+        self.explore_rate = explore_rate
+        self.max_sessions = max_sessions
+        self.snapshot_interval = snapshot_interval
+        # user -> dimension -> option -> [ratings, reward sum]
+        self._stats: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+        # user -> dimension -> (option, score)
+        self._best: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        # Session ids whose rating has been taken (bounded like _sessions)
+        self._rated: "OrderedDict[str, None]" = OrderedDict()
+        self._dirty = False
+        self._snapshotter: Optional[asyncio.Task] = None
+        self.observed = 0
+        self.unattributed = 0
+
+    def score(self, count: float, total: float) -> float:
+        return (total + self.prior * self.prior_weight) / (count + self.prior_weight)
+
+    # --- Updates ---
+
+    def remember_session(self, session_id: str, user_id: str, choices: dict) -> None:
+        """Record what a session used, e.g. {"voice": ..., "music_style": ..., "role": ...}."""
+        self._sessions[session_id] = {"user_id": user_id, **choices}
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def session_user(self, session_id: str) -> Optional[str]:
+        """The user recorded for a session, or None if it is unknown (or forgotten)."""
+        return self._sessions.get(session_id, {}).get("user_id")
+
+    def claim_rating(self, session_id: str) -> bool:
+        """Mark the session as rated. Returns False if it already was."""
+        if session_id in self._rated:
+            return False
+        self._rated[session_id] = None
+        while len(self._rated) > self.max_sessions:
+            self._rated.popitem(last=False)
+        return True
+
+    def release_rating(self, session_id: str) -> None:
+        """Undo claim_rating, for a rating that was not accepted after all."""
+        self._rated.pop(session_id, None)
+
+    def observe(self, session_id: str, rating: int, choices: Optional[dict] = None) -> bool:
+        """
+        Learn from one rating. `choices` overrides what was remembered for the
+        session. Returns False if the session is unknown or has no choices.
+        """
+        session = self._sessions.get(session_id, {})
+        user_id = session.get("user_id")
+        merged = {**session, **(choices or {})}
+        if not user_id or not any(merged.get(dimension) for dimension in DIMENSIONS):
+            self.unattributed += 1
+            return False
+
+        reward = rating_reward(rating)
+        user_stats = self._stats.setdefault(user_id, {})
+        user_best = self._best.setdefault(user_id, {})
+        for dimension in DIMENSIONS:
+            value = merged.get(dimension)
+            if not value:
+                continue
+            options = user_stats.setdefault(dimension, {})
+            for option in (value if isinstance(value, list) else [value]):
+                entry = options.setdefault(option, [0, 0.0])
+                entry[0] += 1
+                entry[1] += reward
+            best = max(options.items(), key=lambda item: self.score(*item[1]))
+            user_best[dimension] = (best[0], self.score(*best[1]))
+        self.observed += 1
+        self._dirty = True
+        return True
+
+    # --- Lookups ---
+
+    def preferred(self, user_id: Optional[str], dimension: str) -> Optional[str]:
+        """The user's favourite option for `dimension`, or None if there is no confident one."""
+        if not user_id:
+            return None
+        best = self._best.get(user_id, {}).get(dimension)
+        if best is None or best[1] < self.min_score:
+            return None
+        if random.random() < self.explore_rate:
+            return None
+        return best[0]
+
+    def scores(self, user_id: Optional[str], dimension: str) -> Dict[str, float]:
+        """The user's score for every option of `dimension` they have rated."""
+        if not user_id:
+            return {}
+        options = self._stats.get(user_id, {}).get(dimension, {})
+        return {option: self.score(*entry) for option, entry in options.items()}
+
+    def profile(self, user_id: str) -> dict:
+        return {
+            dimension: {
+                option: {"ratings": count, "score": round(self.score(count, total), 3)}
+                for option, (count, total) in options.items()
+            }
+            for dimension, options in self._stats.get(user_id, {}).items()
+        }
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._stats),
+            "sessions": len(self._sessions),
+            "observed": self.observed,
+            "unattributed": self.unattributed,
+        }
+
+    # --- Snapshots ---
+
+    def load(self) -> None:
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                self._stats = json.load(f)
+        except FileNotFoundError:
+            self._stats = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Preference snapshot unreadable, starting empty: {e}")
+            self._stats = {}
+        self._best = {
+            user_id: {
+                dimension: max(((option, self.score(*entry)) for option, entry in options.items()), key=lambda item: item[1])
+                for dimension, options in user_stats.items() if options
+            }
+            for user_id, user_stats in self._stats.items()
+        }
+        logger.info(f"Preference model loaded for {len(self._stats)} users")
+
+    async def snapshot(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        # Serialize on the loop (a consistent copy), write in a thread
+        data = json.dumps(self._stats, separators=(",", ":"))
+        try:
+            await asyncio.to_thread(self._write_snapshot, data)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"Failed to snapshot preferences: {e}")
+
+    def _write_snapshot(self, data: str) -> None:
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_name(f"{self.snapshot_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.load)
+        self._snapshotter = asyncio.create_task(self._snapshot_loop())
+
+    async def close(self) -> None:
+        if self._snapshotter is not None:
+            self._snapshotter.cancel()
+            await asyncio.gather(self._snapshotter, return_exceptions=True)
+            self._snapshotter = None
+        await self.snapshot()
+
+_preference_model: Optional[PreferenceModel] = None
+
+def get_preference_model() -> Optional[PreferenceModel]:
+    return _preference_model
+
+def preferred_choice(user_id: Optional[str], dimension: str) -> Optional[str]:
+    """The user's learned favourite for `dimension`, or None (no model, no user or no confident favourite)."""
+    return _preference_model.preferred(user_id, dimension) if _preference_model else None
+
+def choice_scores(user_id: Optional[str], dimension: str) -> Dict[str, float]:
+    """The user's scores for the options of `dimension` they have rated ({} without a model or user)."""
+    return _preference_model.scores(user_id, dimension) if _preference_model else {}
+
+async def init_preference_model() -> PreferenceModel:
+    """Load the last snapshot and start periodic snapshots. Called from the FastAPI lifespan."""
+    global _preference_model
+    model = PreferenceModel(
+        PREFERENCE_CONFIG["snapshot_path"],
+        prior=PREFERENCE_CONFIG["prior"],
+        prior_weight=PREFERENCE_CONFIG["prior_weight"],
+        min_score=PREFERENCE_CONFIG["min_score"],
+        explore_rate=PREFERENCE_CONFIG["explore_rate"],
+        max_sessions=PREFERENCE_CONFIG["max_sessions"],
+        snapshot_interval=PREFERENCE_CONFIG["snapshot_interval"],
+    )
+    await model.start()
+    _preference_model = model
+    return model
+
+async def close_preference_model() -> None:
+    global _preference_model
+    if _preference_model is not None:
+        await _preference_model.close()
+        _preference_model = None
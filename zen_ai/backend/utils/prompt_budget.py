@@ -0,0 +1,44 @@
+import math
+import re
+
+from zen_ai.backend.settings import LLM_CONFIG, PROMPT_CONFIG
+
+_WORD_RE = re.compile(r"\S+")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate, no tokenizer call: the larger of characters /
+    PROMPT_CONFIG["chars_per_token"] and words x ["tokens_per_word"], which
+    agree on ordinary English prose and keep punctuation-heavy text from
+    being undercounted.
+    """
+    if not text:
+        return 0
+    by_chars = len(text) / PROMPT_CONFIG["chars_per_token"]
+    by_words = len(_WORD_RE.findall(text)) * PROMPT_CONFIG["tokens_per_word"]
+    return math.ceil(max(by_chars, by_words))
+
+def count_words(text: str) -> int:
+    return len(_WORD_RE.findall(text or ""))
+
+def session_minutes(minutes=None) -> int:
+    """The requested session length, clamped to the supported range."""
+    if not minutes:
+        return PROMPT_CONFIG["default_minutes"]
+    return max(PROMPT_CONFIG["min_minutes"], min(PROMPT_CONFIG["max_minutes"], int(minutes)))
+
+def script_budget(minutes=None) -> dict:
+    """
+    Length targets for a script read aloud over `minutes`:
+    {"minutes", "words", "paragraphs", "tokens", "max_tokens"}. Words come
+    from the speaking rate (pauses included), tokens are their estimate;
+    max_tokens adds headroom, so the model can finish its last sentence, capped by
+    LLM_CONFIG["model_kwargs"]["max_tokens"].
+    """
+    minutes = session_minutes(minutes)
+    words = minutes * PROMPT_CONFIG["words_per_minute"]
+    paragraphs = max(2, round(words / PROMPT_CONFIG["words_per_paragraph"]))
+    tokens = math.ceil(words * PROMPT_CONFIG["tokens_per_word"])
+    max_tokens = math.ceil(tokens * PROMPT_CONFIG["completion_headroom"])
+    max_tokens = max(PROMPT_CONFIG["min_completion_tokens"], min(LLM_CONFIG["model_kwargs"]["max_tokens"], max_tokens))
+    return {"minutes": minutes, "words": words, "paragraphs": paragraphs, "tokens": tokens, "max_tokens": max_tokens}
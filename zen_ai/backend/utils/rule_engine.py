@@ -0,0 +1,121 @@
+import json
+import logging
+from typing import Dict, Iterable, Optional, Sequence
+
+from zen_ai.backend.settings import ROUTING_RULES, settings
+
+logger = logging.getLogger(__name__)
+
+# Tables mentioning at most this many distinct tags get an answer
+# precomputed for every combination of them (2**n entries).
+MAX_PRECOMPUTED_TAGS = 16
+
+class RuleTable:
+    """
+    One routing table compiled from a declarative spec:
+
+        {"mode": "first" | "all",
+         "rules": [{"when": [tag, ...], "then": value}, ...],
+         "default": value}
+
+    A rule fires when any of its `when` tags is present. "first" returns the
+    `then` of the first rule that fires; "all" returns a tuple of the
+    `then`s of every rule that fires, in rule order without repeats. Either
+    returns `default` when nothing fires.
+
+    Compilation gives every tag the table mentions a bit, and decodes the
+    answer for every combination of those bits up front. Evaluating is then
+    one dict.get and OR per input tag plus one list index, whatever the
+    number of rules. Tables with more than MAX_PRECOMPUTED_TAGS tags keep a
+    per-tag bitmask of the rules it fires and decode that per call.
+    """
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.mode = spec.get("mode", "first")
+        if self.mode not in ("first", "all"):
+            raise ValueError(f"Rule table {name!r}: unknown mode {self.mode!r}")
+        rules = spec["rules"]
+        self.outcomes = [rule["then"] for rule in rules]
+        self.default = spec.get("default")
+        # tag -> bitmask of the rules it fires
+        self.rule_masks: Dict[str, int] = {}
+        for index, rule in enumerate(rules):
+            for tag in rule["when"]:
+                self.rule_masks[tag] = self.rule_masks.get(tag, 0) | (1 << index)
+
+        self._table: Optional[list] = None
+        if len(self.rule_masks) <= MAX_PRECOMPUTED_TAGS:
+            tags = list(self.rule_masks)
+            # tag -> its bit in the lookup key
+            self.key_bits = {tag: 1 << i for i, tag in enumerate(tags)}
+            self._table = []
+            for key in range(1 << len(tags)):
+                mask = 0
+                for i, tag in enumerate(tags):
+                    if key >> i & 1:
+                        mask |= self.rule_masks[tag]
+                self._table.append(self._decode(mask))
+        else:
+            self.key_bits = self.rule_masks
+
+    def _decode(self, mask: int):
+        if self.mode == "first":
+            return self.outcomes[(mask & -mask).bit_length() - 1] if mask else self.default
+        if not mask:
+            return tuple(self.default) if isinstance(self.default, list) else (self.default,)
+        values = []
+        while mask:
+            low = mask & -mask
+            value = self.outcomes[low.bit_length() - 1]
+            if value not in values:
+                values.append(value)
+            mask ^= low
+        return tuple(values)
+
+    def evaluate(self, tags: Iterable[str]):
+        bit = self.key_bits.get
+        key = 0
+        for tag in tags:
+            key |= bit(tag, 0)
+        return self._table[key] if self._table is not None else self._decode(key)
+
+    def evaluate_many(self, tag_sets: Sequence[Iterable[str]]) -> list:
+        bit = self.key_bits.get
+        table = self._table
+        answers = []
+        for tags in tag_sets:
+            key = 0
+            for tag in tags:
+                key |= bit(tag, 0)
+            answers.append(table[key] if table is not None else self._decode(key))
+        return answers
+
+_tables: Dict[str, RuleTable] = {}
+
+def load_rules() -> Dict[str, RuleTable]:
+    """
+    Compile every routing table: ROUTING_RULES from settings, with tables in
+    the JSON file at ROUTING_RULES_FILE (if set) replacing same-named ones.
+    """
+    specs = dict(ROUTING_RULES)
+    if settings.ROUTING_RULES_FILE:
+        with open(settings.ROUTING_RULES_FILE, "r", encoding="utf-8") as f:
+            specs.update(json.load(f))
+    tables = {name: RuleTable(name, spec) for name, spec in specs.items()}
+    _tables.clear()
+    _tables.update(tables)
+    logger.info(f"Compiled routing rules: {sorted(tables)}")
+    return tables
+
+def get_rule_table(name: str) -> RuleTable:
+    if not _tables:
+        load_rules()
+    return _tables[name]
+
+def route(name: str, tags: Iterable[str]):
+    """Evaluate the named table for one set of tags."""
+    return get_rule_table(name).evaluate(tags)
+
+def route_many(name: str, tag_sets: Sequence[Iterable[str]]) -> list:
+    """Evaluate the named table for many sets of tags."""
+    return get_rule_table(name).evaluate_many(tag_sets)
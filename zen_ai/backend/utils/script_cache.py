@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from zen_ai.backend.settings import DEGRADATION_CONFIG, SCRIPT_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(system_prompt: str, user_prompt: str, model_id: str, model_kwargs: dict) -> str:
+    """
+    Content address for a generation request: a hash of the whitespace- and
+    case-normalized prompts plus the model parameters that change the output.
+    """
+    def normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    payload = json.dumps({
+        "system": normalize(system_prompt),
+        "user": normalize(user_prompt),
+        "model_id": model_id,
+        "model_kwargs": model_kwargs,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CacheTier(ABC):
+    """Storage tier interface. A tier maps a key to the list of cached variants."""
+    name = "tier"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[List[str]]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, variants: List[str]) -> None:
+        ...
+
+class MemoryTier(CacheTier):
+    """In-process LRU with a per-entry TTL."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = 256, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, variants = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return variants
+
+    async def set(self, key: str, variants: List[str]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, list(variants))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class DiskTier(CacheTier):
+    """
+    One JSON file per key under `directory`, shared by every worker on the host.
+    Entries older than `ttl` seconds are treated as missing.
+    """
+    name = "disk"
+
+    def __init__(self, directory: str, ttl: float = 7 * 86400):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[List[str]]:
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("variants")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable script cache entry {path}: {e}")
+            return None
+
+    def _write(self, key: str, variants: List[str]) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"variants": variants}, f)
+        os.replace(tmp_path, path)
+
+    async def get(self, key: str) -> Optional[List[str]]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, variants: List[str]) -> None:
+        await asyncio.to_thread(self._write, key, variants)
+
+class ScriptCache:
+    """
+    Tiered cache for generated meditation scripts.
+
+    Tiers are checked in order and a hit in a slower tier is copied into the
+    faster ones. With `variety` > 1 a key only counts as a hit once it holds
+    `variety` generated scripts; until then callers generate a new variant,
+    and afterwards the stored variants are served round-robin. Each key thus
+    costs `variety` LLM calls before its first hit. The round-robin
+    positions are an LRU of at most `max_cursors` keys; a key that falls
+    out starts again from its first variant.
+    """
+    def __init__(self, tiers: List[CacheTier], variety: int = 1, max_cursors: int = 256):
+        self.tiers = tiers
+        self.variety = max(1, variety)
+        self.max_cursors = max_cursors
+        self._cursors: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.tier_hits: Dict[str, int] = {tier.name: 0 for tier in tiers}
+
+    async def _load(self, key: str, count: bool = True) -> List[str]:
+        for index, tier in enumerate(self.tiers):
+            variants = await tier.get(key)
+            if variants:
+                if count:
+                    self.tier_hits[tier.name] += 1
+                for faster in self.tiers[:index]:
+                    await faster.set(key, variants)
+                return variants
+        return []
+
+    async def get(self, key: str) -> Optional[str]:
+        variants = await self._load(key)
+        if len(variants) < self.variety:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if len(variants) == 1:
+            return variants[0]
+        cursor = self._cursors.pop(key, 0)
+        self._cursors[key] = (cursor + 1) % len(variants)
+        while len(self._cursors) > self.max_cursors:
+            self._cursors.popitem(last=False)
+        return variants[cursor % len(variants)]
+
+    async def put(self, key: str, script: str) -> None:
+        # Identical generations are kept too, so a deterministic model still
+        # fills its `variety` slots instead of missing forever.
+        variants = await self._load(key, count=False)
+        variants = (variants + [script])[-self.variety:]
+        for tier in self.tiers:
+            await tier.set(key, variants)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tier_hits": dict(self.tier_hits),
+            "variety": self.variety,
+        }
+
+_script_cache: Optional[ScriptCache] = None
+
+def get_script_cache() -> Optional[ScriptCache]:
+    """Return the shared script cache, or None when caching is disabled."""
+    global _script_cache
+    if not SCRIPT_CACHE_CONFIG["enabled"]:
+        return None
+    if _script_cache is None:
+        tiers: List[CacheTier] = [MemoryTier(SCRIPT_CACHE_CONFIG["max_entries"], SCRIPT_CACHE_CONFIG["ttl"])]
+        if SCRIPT_CACHE_CONFIG["disk_dir"]:
+            tiers.append(DiskTier(SCRIPT_CACHE_CONFIG["disk_dir"], SCRIPT_CACHE_CONFIG["disk_ttl"]))
+        _script_cache = ScriptCache(tiers, variety=SCRIPT_CACHE_CONFIG["variety"], max_cursors=SCRIPT_CACHE_CONFIG["max_entries"])
+    return _script_cache
+
+class RecentScripts:
+    """
+    The latest generated script per (mood tags, needs), whatever the
+    preferred session or coach role: a near-enough script to serve when
+    generating a new one would miss the request's deadline. In-process LRU.
+    """
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+
+    @staticmethod
+    def key(mood_tags: Iterable[str], needs: Iterable[str]) -> tuple:
+        return tuple(sorted(set(mood_tags))), tuple(sorted(set(needs)))
+
+    def remember(self, mood_tags: Iterable[str], needs: Iterable[str], script: str) -> None:
+        key = self.key(mood_tags, needs)
+        self._entries[key] = script
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def latest(self, mood_tags: Iterable[str], needs: Iterable[str]) -> Optional[str]:
+        return self._entries.get(self.key(mood_tags, needs))
+
+_recent_scripts: Optional[RecentScripts] = None
+
+def get_recent_scripts() -> RecentScripts:
+    global _recent_scripts
+    if _recent_scripts is None:
+        _recent_scripts = RecentScripts(DEGRADATION_CONFIG["recent_scripts"])
+    return _recent_scripts
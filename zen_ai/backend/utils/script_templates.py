@@ -0,0 +1,107 @@
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from zen_ai.backend.settings import TEMPLATE_CONFIG
+from zen_ai.backend.utils.rule_engine import route
+
+logger = logging.getLogger(__name__)
+
+# How much one matching tag adds to a segment's score for its slot
+TAG_WEIGHTS = {"mood": 2, "need": 1, "role": 1}
+
+class SegmentLibrary:
+    """
+    Reusable script segments, loaded from a JSON file:
+
+        {"segments": [{"id", "slot", "moods": [...], "needs": [...],
+                       "roles": [...], "text"}]}
+
+    A script is a fixed sequence of slots: "intro", the exercise slots the
+    "template_slots" routing table picks from the needs and preferred
+    session, then "closing". Each slot gets the segment whose tags best
+    match the request (mood matches count double); ties go to the one
+    listed first, so the same request always gets the same script, and
+    segment texts never change per request, so their audio can be
+    synthesized ahead of time.
+
+    Loading indexes every slot by tag, so scoring a slot only touches the
+    segments sharing a tag with the request.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.segments: List[dict] = []
+        self._by_slot: Dict[str, List[int]] = {}
+        # slot -> "<kind>:<tag>" -> [(segment index, weight)]
+        self._by_tag: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+
+    def load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            segments = json.load(f)["segments"]
+        by_slot: Dict[str, List[int]] = {}
+        by_tag: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        for index, segment in enumerate(segments):
+            slot = segment["slot"]
+            by_slot.setdefault(slot, []).append(index)
+            tags = by_tag.setdefault(slot, {})
+            for kind, weight in TAG_WEIGHTS.items():
+                for tag in segment.get(f"{kind}s", []):
+                    tags.setdefault(f"{kind}:{tag}", []).append((index, weight))
+        for slot in ("intro", "closing"):
+            if slot not in by_slot:
+                raise ValueError(f"Segment library {self.path} has no {slot!r} segment")
+        self.segments, self._by_slot, self._by_tag = segments, by_slot, by_tag
+        logger.info(f"Segment library loaded: {len(segments)} segments in {len(by_slot)} slots from {self.path}")
+
+    def slots_for(self, needs: Iterable[str], preferred_session: str) -> List[str]:
+        middle = route("template_slots", [*needs, f"session:{preferred_session}"])
+        return ["intro", *(slot for slot in middle if slot in self._by_slot), "closing"]
+
+    def pick(self, slot: str, keys: List[str]) -> dict:
+        """The best segment for `slot` given the request's "<kind>:<tag>" keys."""
+        candidates = self._by_slot[slot]
+        scores: Dict[int, int] = {}
+        tags = self._by_tag.get(slot, {})
+        for key in keys:
+            for index, weight in tags.get(key, ()):
+                scores[index] = scores.get(index, 0) + weight
+        # Ties, including no match at all, go to the segment listed first
+        best, best_score = None, -1
+        for index in candidates:
+            score = scores.get(index, 0)
+            if score > best_score:
+                best, best_score = index, score
+        return self.segments[best]
+
+    def compose(self, advice_input: dict, role: str) -> dict:
+        """
+        Fill every slot for an analysis result ({"mood_tags", "needs",
+        "preferred_session"}) and the coach role. Returns {"role",
+        "segments": [segment ids], "texts": [...], "text"}.
+        """
+        needs = sorted(set(advice_input.get("needs", [])))
+        keys = [f"mood:{tag}" for tag in sorted(set(advice_input.get("mood_tags", [])))]
+        keys += [f"need:{tag}" for tag in needs]
+        keys.append(f"role:{role}")
+        chosen = [self.pick(slot, keys) for slot in self.slots_for(needs, advice_input.get("preferred_session", "meditation"))]
+        texts = [segment["text"] for segment in chosen]
+        return {
+            "role": role,
+            "segments": [segment["id"] for segment in chosen],
+            "texts": texts,
+            "text": "\n\n".join(texts),
+        }
+
+_segment_library: Optional[SegmentLibrary] = None
+
+def get_segment_library() -> SegmentLibrary:
+    """The shared library, loaded on first use."""
+    global _segment_library
+    if _segment_library is None:
+        library = SegmentLibrary(TEMPLATE_CONFIG["library_path"])
+        library.load()
+        _segment_library = library
+    return _segment_library
+
+def segment_texts() -> List[str]:
+    return [segment["text"] for segment in get_segment_library().segments]
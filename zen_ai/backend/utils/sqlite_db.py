@@ -0,0 +1,78 @@
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+class SQLiteDB:
+    """
+    One SQLite connection in WAL mode, shared by threads behind a lock, with
+    async wrappers that run every statement in a worker thread so the event
+    loop never waits on disk. WAL lets other connections (and processes)
+    keep reading while this one writes.
+    """
+    def __init__(self, db_path: str, schema: str = ""):
+        self.db_path = db_path
+        self.schema = schema
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> None:
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        if self.schema:
+            conn.executescript(self.schema)
+        self._conn = conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None
+
+    # --- Blocking API (call from threads) ---
+
+    def execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def transaction(self, statements: Iterable[Tuple[str, tuple]]) -> None:
+        """Run several statements atomically (one commit, one fsync)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def executemany(self, sql: str, rows: List[tuple]) -> None:
+        """Run one statement for every row in a single transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(sql, rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # --- Async API ---
+
+    async def aexecute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await asyncio.to_thread(self.execute, sql, params)
+
+    async def atransaction(self, statements: Iterable[Tuple[str, tuple]]) -> None:
+        await asyncio.to_thread(self.transaction, list(statements))
+
+    async def aexecutemany(self, sql: str, rows: List[tuple]) -> None:
+        await asyncio.to_thread(self.executemany, sql, rows)
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import List, Optional
+
+from zen_ai.backend.settings import PROMPT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class TokenUsageLog:
+    """
+    Per-request LLM token usage: what the prompt builder estimated and what
+    the provider reported, with the request's latency. The latest
+    `max_records` are kept in memory for /metrics, along with running
+    totals; with a `path`, every record is also appended there as a JSON
+    line (written in a worker thread).
+    """
+    def __init__(self, max_records: int = 500, path: str = ""):
+        self.path = path
+        self._records: deque = deque(maxlen=max_records)
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.estimated_input_tokens = 0
+        self.truncated = 0
+        self._write_lock = asyncio.Lock()
+
+    async def record(self, entry: dict) -> None:
+        entry = {"timestamp": time.time(), **entry}
+        self._records.append(entry)
+        self.requests += 1
+        self.input_tokens += entry.get("input_tokens") or 0
+        self.output_tokens += entry.get("output_tokens") or 0
+        self.estimated_input_tokens += entry.get("estimated_input_tokens") or 0
+        if entry.get("output_tokens") and entry["output_tokens"] >= entry.get("max_tokens", float("inf")):
+            self.truncated += 1
+        if self.path:
+            line = json.dumps(entry) + "\n"
+            async with self._write_lock:
+                try:
+                    await asyncio.to_thread(self._append, line)
+                except OSError as e:
+                    logger.error(f"Could not write token usage to {self.path}: {e}")
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        return list(self._records)[-limit:]
+
+    def stats(self) -> dict:
+        records = [r for r in self._records if r.get("output_tokens") and r.get("output_words")]
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            # How far off the local prompt estimate runs (1.0 = exact)
+            "input_estimate_ratio": round(self.input_tokens / self.estimated_input_tokens, 3) if self.estimated_input_tokens else None,
+            # Measured on recent scripts; compare with PROMPT_CONFIG["tokens_per_word"]
+            "output_tokens_per_word": round(sum(r["output_tokens"] for r in records) / sum(r["output_words"] for r in records), 3) if records else None,
+            # Scripts that used their whole max_tokens budget (likely cut off)
+            "truncated": self.truncated,
+        }
+
+_token_usage: Optional[TokenUsageLog] = None
+
+def get_token_usage() -> TokenUsageLog:
+    global _token_usage
+    if _token_usage is None:
+        _token_usage = TokenUsageLog(PROMPT_CONFIG["usage_records"], PROMPT_CONFIG["usage_log_path"])
+    return _token_usage
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from zen_ai.backend.settings import VOICE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_NON_LETTERS = re.compile(r"[^a-z0-9]+")
+
+def normalize(text: str) -> str:
+    """Lowercase, with runs of anything but letters and digits turned into single spaces."""
+    return _NON_LETTERS.sub(" ", (text or "").lower()).strip()
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class VoiceCatalog:
+    """
+    The voices we offer, loaded from a JSON file:
+
+        {"default": "<name>",
+         "voices": [{"name", "voice_id", "description", "aliases": [...]}]}
+
+    Loading builds every index `resolve` needs: normalized names and
+    aliases, voice ids, name/alias prefixes and a trigram index for
+    misspellings. `resolve` results are memoized (LRU), and the memo is
+    dropped whenever the catalog is reloaded. The file is re-read when its
+    modification time changes, checked at most every `reload_interval`
+    seconds, so edits apply without a restart.
+    """
+    def __init__(self, path: str, cache_size: int = 1024, reload_interval: float = 5.0, min_similarity: float = 0.4):
+        self.path = path
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.min_similarity = min_similarity
+        self.voices: List[dict] = []
+        self.default: Optional[dict] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._by_id: Dict[str, dict] = {}
+        self._by_term: Dict[str, dict] = {}
+        self._by_prefix: Dict[str, dict] = {}
+        self._by_trigram: Dict[str, List[str]] = {}
+        self._trigram_counts: Dict[str, int] = {}
+        self._resolve = lru_cache(maxsize=cache_size)(self._lookup)
+
+    # --- Loading ---
+
+    def load(self) -> None:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        voices = spec["voices"]
+        by_id = {voice["voice_id"]: voice for voice in voices}
+        by_term: Dict[str, dict] = {}
+        by_prefix: Dict[str, dict] = {}
+        by_trigram: Dict[str, List[str]] = {}
+        trigram_counts: Dict[str, int] = {}
+        # Earlier voices win any name, alias or prefix they share with later ones
+        for voice in voices:
+            for term in [voice["name"], *voice.get("aliases", [])]:
+                term = normalize(term)
+                by_term.setdefault(term, voice)
+                for end in range(2, len(term)):
+                    by_prefix.setdefault(term[:end], voice)
+                if term in trigram_counts:
+                    continue
+                grams = trigrams(term)
+                trigram_counts[term] = len(grams)
+                for gram in grams:
+                    by_trigram.setdefault(gram, []).append(term)
+        names = {normalize(voice["name"]): voice for voice in voices}
+        default = names.get(normalize(spec.get("default", ""))) or voices[0]
+
+        self.voices, self.default = voices, default
+        self._by_id, self._by_term, self._by_prefix = by_id, by_term, by_prefix
+        self._by_trigram, self._trigram_counts = by_trigram, trigram_counts
+        self._resolve.cache_clear()
+        self._mtime = mtime
+        logger.info(f"Voice catalog loaded: {len(voices)} voices from {self.path}")
+
+    def reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.path).st_mtime != self._mtime:
+                self.load()
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.error(f"Voice catalog reload failed, keeping the previous one: {e}")
+
+    # --- Lookups ---
+
+    def resolve(self, preference: str) -> Optional[dict]:
+        """
+        The catalog voice meant by `preference`, or None. Tries, in order:
+        a voice id, an exact name or alias, a name or alias appearing as a
+        word ("bella please"), a prefix ("ant"), then the closest spelling
+        by trigram similarity ("rachal").
+        """
+        self.reload_if_changed()
+        return self._resolve((preference or "").strip())
+
+    def _lookup(self, preference: str) -> Optional[dict]:
+        if preference in self._by_id:
+            return self._by_id[preference]
+        text = normalize(preference)
+        if not text:
+            return None
+        if text in self._by_term:
+            return self._by_term[text]
+        words = text.split()
+        for size in (2, 1):
+            for i in range(len(words) - size + 1):
+                voice = self._by_term.get(" ".join(words[i:i + size]))
+                if voice is not None:
+                    return voice
+        if text in self._by_prefix:
+            return self._by_prefix[text]
+        return self._closest(text)
+
+    def _closest(self, text: str) -> Optional[dict]:
+        grams = trigrams(text)
+        shared = Counter(term for gram in grams for term in self._by_trigram.get(gram, ()))
+        best, best_score = None, self.min_similarity
+        for term, common in shared.items():
+            score = common / (len(grams) + self._trigram_counts[term] - common)
+            if score > best_score:
+                best, best_score = term, score
+        return self._by_term[best] if best else None
+
+    def voice_id(self, preference: str) -> str:
+        """The id of the voice meant by `preference`, falling back to the default voice."""
+        voice = self.resolve(preference)
+        return (voice or self.default)["voice_id"]
+
+    def names(self) -> List[str]:
+        self.reload_if_changed()
+        return [voice["name"] for voice in self.voices]
+
+    def stats(self) -> dict:
+        info = self._resolve.cache_info()
+        return {"voices": len(self.voices), "cache_hits": info.hits, "cache_misses": info.misses, "cache_size": info.currsize}
+
+_voice_catalog: Optional[VoiceCatalog] = None
+
+def get_voice_catalog() -> VoiceCatalog:
+    """The shared catalog, loaded on first use."""
+    global _voice_catalog
+    if _voice_catalog is None:
+        catalog = VoiceCatalog(
+            VOICE_CONFIG["catalog_path"],
+            cache_size=VOICE_CONFIG["catalog_cache_size"],
+            reload_interval=VOICE_CONFIG["catalog_reload_interval"],
+        )
+        catalog.load()
+        _voice_catalog = catalog
+    return _voice_catalog
@@ -0,0 +1,69 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """
+    Startup work that runs in the background once the server is up.
+
+    Each step is a function (sync ones run in a worker thread, async ones
+    are awaited); all steps run concurrently. Everything a step warms must
+    also load on first use, so requests that arrive earlier still work,
+    only slower. The process is ready once every `required` step has
+    finished without error; GET /ready reports that for load balancers.
+    """
+    def __init__(self):
+        self._steps: Dict[str, dict] = {}
+        self._functions: Dict[str, Callable[[], Any]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, fn: Callable[[], Any], required: bool = True) -> None:
+        self._functions[name] = fn
+        self._steps[name] = {"state": "pending", "required": required, "ms": None, "error": None}
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run(name)) for name in self._functions]
+
+    async def _run(self, name: str) -> None:
+        step = self._steps[name]
+        fn = self._functions[name]
+        step["state"] = "running"
+        start = time.monotonic()
+        try:
+            if inspect.iscoroutinefunction(fn):
+                await fn()
+            else:
+                await asyncio.to_thread(fn)
+        except Exception as e:
+            step["state"] = "failed"
+            step["error"] = str(e)
+            logger.error(f"Warm-up step {name} failed: {e}")
+        else:
+            step["state"] = "ready"
+        step["ms"] = round((time.monotonic() - start) * 1000, 1)
+        logger.info(f"Warm-up step {name} {step['state']} after {step['ms']} ms")
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def ready(self) -> bool:
+        return all(step["state"] == "ready" for step in self._steps.values() if step["required"])
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "steps": {name: dict(step) for name, step in self._steps.items()}}
+
+_warmup: Optional[Warmup] = None
+
+def get_warmup() -> Warmup:
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup
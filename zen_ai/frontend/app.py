@@ -6,6 +6,28 @@ import os
 
 # Constants
 BACKEND_URL = "http://127.0.0.1:8000"
+# Used when the backend's voice catalog cannot be fetched
+FALLBACK_VOICES = ["Rachel", "Domi", "Bella", "Antoni", "Elli", "Josh", "Arnold", "Adam", "Sam"]
+
+@st.cache_data(ttl=60)
+def voice_names():
+    """Voice names from the backend catalog (GET /voices), refreshed every minute."""
+    try:
+        response = requests.get(f"{BACKEND_URL}/voices", timeout=5)
+        response.raise_for_status()
+        return [voice["name"] for voice in response.json()["voices"]]
+    except (requests.RequestException, KeyError, ValueError):
+        return FALLBACK_VOICES
+
+def audio_source(response, url_key, path_key):
+    """Prefer the backend's /media URL; fall back to a local path when running on the same host."""
+    url = response.get(url_key)
+    if url:
+        return f"{BACKEND_URL}{url}"
+    path = response.get(path_key)
+    if path and os.path.exists(path):
+        return path
+    return None
 
 def main():
     st.set_page_config(
@@ -67,7 +89,7 @@ def main():
         with col1:
             voice_pref = st.selectbox(
                 "Voice Preference",
-                ["Rachel", "Domi", "Bella", "Antoni", "Elli", "Josh", "Arnold", "Adam", "Sam"]
+                voice_names()
             )
         
         with col2:
@@ -76,6 +98,8 @@ def main():
                 ["calm", "nature sounds", "binaural beats", "instrumental"]
             )
 
+        mix = st.checkbox("Mix voice and music into one track")
+
         if st.button("Get Meditation"):
             if all(answers):  # Check if all questions are answered
                 try:
@@ -84,7 +108,8 @@ def main():
                         "quiz_answers": answers,
                         "user_input": st.session_state.user_input,
                         "voice_pref": voice_pref,
-                        "music_pref": music_pref
+                        "music_pref": music_pref,
+                        "mix": mix
                     }
                     
                     response = requests.post(
@@ -111,24 +136,33 @@ def main():
             st.markdown("### Meditation Guide")
             st.write(response["meditation_text"])
             
-            # Display audio players if files exist
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("### Voice Guide")
-                voice_path = response["voice_output"]
-                if os.path.exists(voice_path):
-                    st.audio(voice_path)
+            # Display audio players (served by the backend's /media route)
+            mixed_source = audio_source(response, "mixed_url", "mixed_output")
+            if response.get("mixed_output"):
+                st.markdown("### Your Session")
+                if mixed_source:
+                    st.audio(mixed_source)
                 else:
-                    st.warning("Voice file not found")
-            
-            with col2:
-                st.markdown("### Background Music")
-                music_path = response["music_output"]
-                if os.path.exists(music_path):
-                    st.audio(music_path)
-                else:
-                    st.warning("Music file not found")
+                    st.warning("Session audio not found")
+            else:
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.markdown("### Voice Guide")
+                    voice_source = audio_source(response, "voice_url", "voice_output")
+                    if voice_source:
+                        st.audio(voice_source)
+                    else:
+                        st.warning("Voice file not found")
+                
+                with col2:
+                    st.markdown("### Background Music")
+                    music_source = audio_source(response, "music_url", "music_output")
+                    if music_source:
+                        # Bank tracks are short seamless loops
+                        st.audio(music_source, loop=response.get("music_loop", False))
+                    else:
+                        st.warning("Music file not found")
         
         if st.button("Start New Session"):
             # Reset session state
@@ -1,15 +1,21 @@
 import os
+import asyncio
 import uvicorn
-import google.generativeai as genai
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+from contextlib import asynccontextmanager
 import aiohttp
 import uuid
 from pathlib import Path
 import json
 from datetime import datetime
+from zen_ai.backend.settings import MUSIC_CONFIG as BACKEND_MUSIC_CONFIG
+from zen_ai.backend.utils.feedback_buffer import FeedbackBuffer
+from zen_ai.backend.utils.music_synth import STYLE_PRESETS, encode_pcm16, render_loop, resolve_style, wav_header
+from zen_ai.backend.utils.warmup import Warmup
 
 # ===== Configuration =====
 class Config:
@@ -17,8 +23,7 @@ class Config:
     ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "your_elevenlabs_api_key_here")
     SUNO_API_KEY = os.getenv("SUNO_API_KEY", "your_suno_api_key_here")
     
-    # Configure Google's Generative AI
-    genai.configure(api_key=GOOGLE_API_KEY)
+    # Google's Generative AI is imported and configured on first use (get_genai)
     MODEL = "gemini-pro"  # or "gemini-1.5-pro" if available
     
     VOICE_CONFIG = {
@@ -33,16 +38,24 @@ class Config:
     }
     
     MUSIC_CONFIG = {
-        "default_style": "nature sounds",
-        "styles": {
-            "happy": "upbeat_lofi.mp3",
-            "sad": "rain_ambience.mp3",
-            "anxious": "calming_waves.mp3",
-            "angry": "wind_flute.mp3",
-        },
+        # Mood -> synth style, shared with the backend (zen_ai/backend/settings.py)
+        "default_style": BACKEND_MUSIC_CONFIG["default_style"],
+        "styles": BACKEND_MUSIC_CONFIG["styles"],
+        # One seamless loop per synth style, rendered in the background at startup when missing
+        "asset_dir": "music_assets",
+        "loop_seconds": 60,
+        "crossfade": 2.0,
         "suno_api_url": "https://api.suno.ai/v1"
     }
 
+    FEEDBACK_CONFIG = {
+        "db_path": os.getenv("FEEDBACK_DB_PATH", "feedback.sqlite3"),
+        # Feedback waiting to be written; beyond this /feedback answers 503
+        "capacity": 10000,
+        "batch_size": 500,
+        "flush_interval": 1.0,
+    }
+
 # ===== Models =====
 class QuestionRequest(BaseModel):
     user_input: str
@@ -73,10 +86,50 @@ class FeedbackInput(BaseModel):
 class MeditationResponse(BaseModel):
     meditation_text: str
     voice_output: str
-    music_output: str
+    music_output: Optional[str] = None
+
+# ===== Feedback Buffer =====
+# The backend's buffer: batched SQLite writes, spilled to JSON lines if the
+# database refuses them at shutdown, so no accepted feedback is lost.
+feedback_buffer = FeedbackBuffer(**Config.FEEDBACK_CONFIG)
+
+# ===== Google Generative AI =====
+_genai = None
+
+def get_genai():
+    """google.generativeai, configured. Imported on first use: the SDK takes a while to load."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=Config.GOOGLE_API_KEY)
+        _genai = genai
+    return _genai
+
+# ===== Warm-up =====
+# Slow startup work runs in the background so the server answers at once;
+# GET /ready reports it. Without the SDK the quiz and meditation endpoints
+# answer with their fallbacks, so it is not required for readiness.
+warmup = Warmup()
+
+async def init_music_assets() -> None:
+    try:
+        await asyncio.to_thread(render_music_assets)
+    except Exception as e:
+        # Not fatal: /music/generate answers without a music file until a loop exists.
+        print(f"⚠️ Could not render music loops into {Config.MUSIC_CONFIG['asset_dir']}: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await feedback_buffer.start()
+    warmup.add("music_assets", init_music_assets)
+    warmup.add("genai", get_genai, required=False)
+    warmup.start()
+    yield
+    await warmup.close()
+    await feedback_buffer.close()
 
 # ===== Initialize FastAPI =====
-app = FastAPI(title="Zen Focus API", version="1.0.0")
+app = FastAPI(title="Zen Focus API", version="1.0.0", lifespan=lifespan)
 
 # CORS Middleware
 app.add_middleware(
@@ -96,18 +149,42 @@ def get_music_for_mood(mood: str) -> str:
     """Get appropriate music style for the given mood."""
     return Config.MUSIC_CONFIG["styles"].get(mood.lower(), Config.MUSIC_CONFIG["default_style"])
 
+def music_asset_path(style: str) -> Path:
+    return Path(Config.MUSIC_CONFIG["asset_dir"]) / f"{style.replace(' ', '_')}.wav"
+
+def render_music_assets() -> None:
+    """Render the loop for every synth style whose file is missing. Raises if one cannot be written."""
+    Path(Config.MUSIC_CONFIG["asset_dir"]).mkdir(parents=True, exist_ok=True)
+    for style in sorted(STYLE_PRESETS):
+        path = music_asset_path(style)
+        if path.exists():
+            continue
+        audio = render_loop(style, Config.MUSIC_CONFIG["loop_seconds"], Config.MUSIC_CONFIG["crossfade"], seed=0)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+        with open(tmp_path, "wb") as f:
+            f.write(wav_header(audio.shape[1]))
+            f.write(encode_pcm16(audio))
+        os.replace(tmp_path, path)
+        print(f"✅ Rendered music loop {path}")
+
 # ===== API Endpoints =====
 @app.get("/")
 async def read_root():
     """Health check endpoint."""
     return {"message": "Zen Focus API is running"}
 
+@app.get("/ready")
+async def read_ready():
+    """Readiness check: 200 once background warm-up is done, 503 (with per-step status) until then."""
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 # Quiz Agent Endpoints
 @app.post("/quiz/ask")
 async def ask_quiz_question(request: QuestionRequest):
     """Get quiz questions based on user input using Google's Generative AI."""
     try:
-        model = genai.GenerativeModel(Config.MODEL)
+        model = get_genai().GenerativeModel(Config.MODEL)
         prompt = f"""
         You are a mental wellness assistant. Generate 3 thoughtful questions to understand the user's emotional state.
         User's input: {request.user_input}
@@ -133,7 +210,7 @@ async def ask_quiz_question(request: QuestionRequest):
 async def submit_quiz_answers(request: QuizAnswerRequest):
     """Submit quiz answers and get a summary using Google's Generative AI."""
     try:
-        model = genai.GenerativeModel(Config.MODEL)
+        model = get_genai().GenerativeModel(Config.MODEL)
         prompt = f"""
         Analyze these quiz answers and provide a brief summary and recommendation:
         Answers: {request.answers}
@@ -188,18 +265,21 @@ async def generate_voice(input_data: VoiceInput):
 # Music Agent
 @app.post("/music/generate")
 async def generate_music(input_data: MusicInput):
-    """Generate music based on style and mood."""
-    # In a real implementation, this would call the Suno API
-    output_path = f"music_output/{uuid.uuid4()}.mp3"
-    os.makedirs("music_output", exist_ok=True)
-    
-    # Create empty file as placeholder
-    with open(output_path, 'wb') as f:
-        f.write(b'')  # Empty file for demo
+    """
+    Pick the loop rendered at startup for the mood or style. No file is
+    written per request; music_file is None (no music) while the loop is
+    not rendered.
+    """
+    style = Config.MUSIC_CONFIG["styles"].get((input_data.mood or "").lower())
+    if style is None:
+        style = input_data.style.lower() if input_data.style.lower() in STYLE_PRESETS else get_music_for_mood(input_data.style)
+    path = music_asset_path(resolve_style(style))
+    music_file = str(path) if path.exists() else None
     
     return {
         "status": "success",
-        "music_file": output_path,
+        "music_file": music_file,
+        "loop": True,
         "style": input_data.style,
         "mood": input_data.mood or "neutral"
     }
@@ -210,7 +290,7 @@ async def start_meditation(input_data: MeditationInput):
     """Start a meditation session with the given parameters using Google's Generative AI."""
     try:
         # Generate meditation script using Google's AI
-        model = genai.GenerativeModel(Config.MODEL)
+        model = get_genai().GenerativeModel(Config.MODEL)
         prompt = f"""
         Create a {input_data.duration if hasattr(input_data, 'duration') else 5}-minute guided meditation script.
         User's mood/needs: {input_data.quiz_answers}
@@ -248,12 +328,10 @@ async def start_meditation(input_data: MeditationInput):
 # Feedback Endpoint
 @app.post("/feedback")
 async def submit_feedback(feedback: FeedbackInput):
-    """Submit feedback for a meditation session."""
-    # In a real app, you would save this to a database
-    print(f"Feedback received for session {feedback.session_id}:")
-    print(f"Rating: {feedback.rating}/5")
-    print(f"Comments: {feedback.feedback}")
-    
+    """Submit feedback for a meditation session. It is buffered and saved in the background."""
+    if not feedback_buffer.offer({"session_id": feedback.session_id, "rating": feedback.rating, "comment": feedback.feedback}):
+        raise HTTPException(status_code=503, detail="Too much feedback right now, please retry shortly.", headers={"Retry-After": "1"})
+
     return {
         "status": "success",
         "message": "Thank you for your feedback!"
@@ -265,13 +343,5 @@ if __name__ == "__main__":
     for directory in ["voice_output", "music_output"]:
         os.makedirs(directory, exist_ok=True)
     
-    # Initialize Google's Generative AI
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
-        print("✅ Google Generative AI configured successfully")
-    except Exception as e:
-        print(f"⚠️ Error initializing Google AI: {str(e)}")
-    
-    # Start the server
-    uvicorn.run("single_file_app:app", host="0.0.0.0", port=8000, reload=True)
+    # Start the server (run from the repository root: python -m zen_ai.single_file_app)
+    uvicorn.run("zen_ai.single_file_app:app", host="0.0.0.0", port=8000, reload=True)